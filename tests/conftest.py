@@ -0,0 +1,35 @@
+# Os testes importam o interpretador como os scripts de vm/ (import main as vm)
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "vm"))
+
+import main as vm
+
+MODES = [("tree", False), ("tree", True), ("bytecode", False), ("bytecode", True)]
+
+@pytest.fixture(params=MODES, ids=["tree", "tree-trusted", "bytecode", "bytecode-trusted"])
+def mode(request):
+    return request.param
+
+def run_level(source, mode=("tree", False), globals=None):
+    # executa com relógio virtual; devolve (linhas ditas, globais finais)
+    engine, trusted = mode
+    program = vm.compile_level(source, engine, trusted)
+    out = io.StringIO()
+    final = program.run(globals=globals, output=out, clock=vm.VirtualClock())
+    return out.getvalue().splitlines(), final
+
+@pytest.fixture
+def copies(monkeypatch):
+    # conta as cópias de arrays feitas pela cópia na escrita
+    count = {"n": 0}
+    for cls in (vm.Array, vm.NumberArray, vm.BoolArray):
+        def copy(self, original=cls.copy):
+            count["n"] += 1
+            return original(self)
+        monkeypatch.setattr(cls, "copy", copy)
+    return count
@@ -0,0 +1,54 @@
+import io
+
+import pytest
+
+from conftest import run_level, vm
+
+def test_say_and_move_write_lines(mode):
+    lines, final = run_level('x: number = 2;\nsay(x * 21);\nmove(3);\n', mode)
+    assert lines == ["42", "Movendo 3 unidades"]
+    assert final["x"] == 2
+
+def test_gather_appends_to_inventory(mode):
+    lines, final = run_level('inventory: text[] = ["sword"];\ngather("potion");\ngather(shield);\n', mode)
+    assert final["inventory"] == ["sword", "potion", "shield"]
+    assert lines[0] == "Item 'potion' adicionado ao inventory"
+
+def test_gather_without_inventory_only_reports(mode):
+    lines, _ = run_level('gather("potion");\n', mode)
+    assert lines == ["Item coletado: potion"]
+
+def test_gather_into_number_inventory_is_an_error(mode):
+    with pytest.raises(Exception, match="'inventory' deve ser array ou text\\[\\], obtido number\\[\\]"):
+        run_level('inventory: number[] = [1];\ngather("potion");\n', mode)
+
+def test_use_potion_heals_and_consumes(mode):
+    source = 'health: number = 10;\nmax_health: number = 40;\ninventory: array = ["potion"];\nuse("potion");\n'
+    lines, final = run_level(source, mode)
+    assert final["health"] == 40
+    assert final["inventory"] == []
+    assert lines == ["Você usou uma potion. Vida agora = 40"]
+
+class SnapshotClock(vm.VirtualClock):
+    # guarda o que já chegou ao stream em cada wait
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+        self.seen = []
+
+    def wait(self, seconds):
+        self.seen.append(self.stream.getvalue())
+        super().wait(seconds)
+
+def test_wait_flushes_buffered_output_with_virtual_clock(mode):
+    program = vm.compile_level('say("antes");\nwait(2);\nsay("depois");\n', *mode)
+    stream = io.StringIO()
+    clock = SnapshotClock(stream)
+    program.run(output=vm.BufferedOutput(stream), clock=clock)
+    assert clock.seen == ["antes\n"]
+    assert clock.elapsed == 2
+    assert stream.getvalue() == "antes\ndepois\n"
+
+def test_null_output_discards(mode, capsys):
+    vm.compile_level('say("nada");\n', *mode).run(output=vm.NullOutput())
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import run_level, vm
+
+@pytest.mark.parametrize("source", [
+    "xs: number[] = [1, 2];\nxs[2] = 5;\n",
+    "xs: array = [1, 2];\nxs[0 - 1] = 5;\n",
+    "g: number[][] = [[1, 2], [3, 4]];\ng[1][5] = 9;\n",
+], ids=["typed", "negative", "nested"])
+def test_index_assign_out_of_bounds(source, mode):
+    with pytest.raises(Exception, match=r"\[Semantic\] Índice fora do intervalo \(linha 2, coluna 1\)"):
+        run_level(source, mode)
+
+@pytest.mark.parametrize("declared", ["number[]", "array"])
+def test_index_assign_keeps_the_element_type(declared, mode):
+    with pytest.raises(Exception, match="Tipo incompatível para elemento de xs: esperado number, obtido text"):
+        run_level(f'xs: {declared} = [1, 2];\nxs[0] = "a";\n', mode)
+
+def test_typed_arrays_use_compact_storage(mode):
+    _, final = run_level("xs: number[] = [3, 1];\nbs: boolean[] = [false, true];\nbs[0] = true;\n", mode)
+    assert final == {"xs": [3, 1], "bs": [True, True]}
+
+def test_typed_storage_classes():
+    assert type(vm.coerce(vm.Array([1, 2]), "number[]")) is vm.NumberArray
+    assert type(vm.coerce(vm.Array([True]), "boolean[]")) is vm.BoolArray
+    rows = vm.coerce(vm.Array([vm.Array([1]), vm.Array([2])]), "number[][]")
+    assert rows.element == "number[]" and all(type(row) is vm.NumberArray for row in rows)
+
+def test_coercion_copies_between_typed_and_untyped(mode):
+    source = """xs: number[] = [3, 1];
+ys: array = xs;
+ys[0] = 9;
+zs: array = [1, 2];
+ws: number[] = zs;
+ws[0] = 7;
+say(xs);
+say(ys);
+say(zs);
+say(ws);
+"""
+    lines, _ = run_level(source, mode)
+    assert lines == ["[3, 1]", "[9, 1]", "[1, 2]", "[7, 2]"]
+
+@pytest.mark.parametrize("source, message", [
+    ('xs: number[] = [1, "a"];\n', r"Tipo incompatível para number\[\]: elemento text"),
+    ("xs: number[] = [9223372036854775807 + 1];\n", r"Número fora do intervalo de number\[\]"),
+], ids=["element", "overflow"])
+def test_coercion_errors(source, message, mode):
+    with pytest.raises(Exception, match=message):
+        run_level(source, mode)
+
+def test_bulk_builtins(mode):
+    source = """h: number[] = [3, 1, 4];
+add(h, 1);
+say(h);
+say(sum(h));
+scale(h, 2);
+say(h);
+say(count(h, 4));
+say(index_of(h, 10));
+say(index_of(h, 99));
+fill(h, 7);
+add(h, [1, 2, 3]);
+say(h);
+"""
+    lines, _ = run_level(source, mode)
+    assert lines == ["[4, 2, 5]", "11", "[8, 4, 10]", "1", "2", "-1", "[8, 9, 10]"]
+
+def test_bulk_builtins_copy_on_write(mode):
+    lines, _ = run_level("h: number[] = [1, 2];\ng: number[] = h;\nfill(g, 0);\nsay(h);\nsay(g);\n", mode)
+    assert lines == ["[1, 2]", "[0, 0]"]
+
+def test_bulk_add_requires_same_length(mode):
+    with pytest.raises(Exception, match="'add' requer arrays do mesmo tamanho"):
+        run_level("h: number[] = [1, 2];\nadd(h, [1]);\n", mode)
+
+def test_declared_function_shadows_builtin(mode):
+    lines, _ = run_level("func sum(a: number[]): number {\n    return 0;\n}\nsay(sum([1, 2]));\n", mode)
+    assert lines == ["0"]
@@ -0,0 +1,113 @@
+import argparse
+import csv
+import io
+import json
+import sys
+
+import pytest
+
+from conftest import vm
+
+import batch
+
+SOURCE = """health: number = 40;
+damage: number = 10;
+name: text = "herói";
+turns: number = 0;
+until (health > 0) {
+    health = health - damage;
+    turns = turns + 1;
+}
+say(name);
+"""
+
+def args(runs=None, vary=(), repeat=1):
+    return argparse.Namespace(runs=runs, vary=list(vary), repeat=repeat)
+
+@pytest.mark.parametrize("text, value", [
+    ("10", 10), ("true", True), ('"a,b"', "a,b"), ("Aragorn", "Aragorn"), ("-3", -3),
+])
+def test_parse_value(text, value):
+    assert batch.parse_value(text) == value
+
+def test_vary_forms_the_cartesian_product():
+    runs = batch.load_runs(args(vary=["health=40,80", "damage=10,20,30"]))
+    assert runs == [{"health": h, "damage": d} for h in (40, 80) for d in (10, 20, 30)]
+
+def test_runs_file_combines_with_vary_and_repeat(tmp_path):
+    path = tmp_path / "runs.jsonl"
+    path.write_text('{"name": "Aragorn"}\n\n{"name": "Legolas", "health": 70}\n', encoding="utf-8")
+    runs = batch.load_runs(args(runs=str(path), vary=["damage=5,10"], repeat=2))
+    expected = [
+        {"name": "Aragorn", "damage": 5}, {"name": "Aragorn", "damage": 10},
+        {"name": "Legolas", "health": 70, "damage": 5}, {"name": "Legolas", "health": 70, "damage": 10},
+    ]
+    assert runs == expected * 2
+
+def test_runs_file_lines_must_be_objects(tmp_path):
+    path = tmp_path / "runs.jsonl"
+    path.write_text('{"health": 1}\n[1, 2]\n', encoding="utf-8")
+    with pytest.raises(Exception, match=r"\[Batch\] .*runs.jsonl:2: esperado um objeto JSON"):
+        batch.load_runs(args(runs=str(path)))
+
+def test_vary_needs_a_name():
+    with pytest.raises(Exception, match=r"\[Batch\] --vary espera NOME=V1,V2,...: =1,2"):
+        batch.load_runs(args(vary=["=1,2"]))
+
+def results(runs, jobs, engine="tree", with_output=False):
+    tree, st, _ = vm.analyze(SOURCE, True, ["health", "damage", "name"])
+    job = batch.Job(tree, st, engine, False, with_output)
+    return tree, list(batch.execute(job, runs, jobs))
+
+RUNS = [{"health": 40, "damage": 10}, {"health": 45, "damage": 20, "name": "Gimli"}, {"damage": 0, "health": -1}]
+
+def test_one_job_and_the_pool_give_the_same_results():
+    _, serial = results(RUNS, 1, "bytecode", True)
+    _, pooled = results(RUNS, 2, "bytecode", True)
+    assert serial == pooled
+    assert [r["final"]["turns"] for r in serial] == [4, 3, 0]
+    assert serial[1]["output"] == ["Gimli"]
+    assert [r["run"] for r in pooled] == [0, 1, 2]
+
+def test_runtime_errors_are_results():
+    tree, st, _ = vm.analyze("x: number = 1;\nsay(10 / x);\n", True, ["x"])
+    job = batch.Job(tree, st)
+    ok, failed = batch.execute(job, [{"x": 2}, {"x": 0}], 1)
+    assert ok["status"] == "ok" and ok["error"] is None
+    assert failed["status"] == "erro" and "Divisão por zero" in failed["error"]
+    assert failed["final"] == {"x": 0}
+
+def test_jsonl_writer():
+    _, out = results(RUNS[:1], 1)
+    stream = io.StringIO()
+    writer = batch.JsonlWriter(stream)
+    for result in out:
+        writer.write(result)
+    (line,) = stream.getvalue().splitlines()
+    data = json.loads(line)
+    assert data["init"] == {"health": 40, "damage": 10}
+    assert data["final"] == {"health": 0, "damage": 10, "name": "herói", "turns": 4}
+    assert data["status"] == "ok" and data["time"] == 0
+
+def test_csv_writer_has_init_and_final_columns():
+    tree, out = results(RUNS[:2], 1, with_output=True)
+    stream = io.StringIO()
+    writer = batch.CsvWriter(stream, tree, True)
+    for result in out:
+        writer.write(result)
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert list(rows[0]) == ["run", "status", "error", "time", "init.health", "init.damage", "init.name",
+                             "health", "damage", "name", "turns", "output"]
+    assert rows[1]["init.name"] == "Gimli" and rows[1]["turns"] == "3" and rows[1]["output"] == "Gimli"
+    assert rows[0]["init.name"] == ""
+
+def test_cli_writes_csv(tmp_path, monkeypatch, capsys):
+    source = tmp_path / "nivel.level"
+    source.write_text(SOURCE, encoding="utf-8")
+    out = tmp_path / "resultados.csv"
+    monkeypatch.setattr(sys, "argv", ["batch.py", str(source), "--vary", "health=40,80", "--jobs", "1",
+                                      "--out", str(out)])
+    batch.main()
+    rows = list(csv.DictReader(out.open(encoding="utf-8")))
+    assert [row["turns"] for row in rows] == ["4", "8"]
+    assert "2 execuções (0 com erro)" in capsys.readouterr().err
@@ -0,0 +1,62 @@
+import os
+import pickle
+
+from conftest import vm
+
+SOURCE = "x: number = 2;\nsay(x * 21);\n"
+
+def stored(tmp_path):
+    filename = str(tmp_path / "nivel.level")
+    cache = vm.ParseCache(filename, SOURCE)
+    tree, st, _ = vm.analyze(SOURCE)
+    cache.store(tree, st)
+    return filename, cache
+
+def test_load_returns_the_stored_tree(tmp_path):
+    filename, _ = stored(tmp_path)
+    tree, st = vm.ParseCache(filename, SOURCE).load()
+    assert isinstance(tree, vm.Block)
+
+def test_other_source_misses(tmp_path):
+    filename, _ = stored(tmp_path)
+    assert vm.ParseCache(filename, SOURCE + "say(1);\n").load() is None
+
+def test_store_evicts_stale_entries_of_the_same_file(tmp_path):
+    filename, old = stored(tmp_path)
+    changed = SOURCE + "say(1);\n"
+    tree, st, _ = vm.analyze(changed)
+    vm.ParseCache(filename, changed).store(tree, st)
+    assert not os.path.exists(old.path)
+
+def test_corrupt_entry_is_a_miss_and_removed(tmp_path):
+    filename, cache = stored(tmp_path)
+    with open(cache.path, "wb") as f:
+        f.write(b"\x80\x05 lixo")
+    assert vm.ParseCache(filename, SOURCE).load() is None
+    assert not os.path.exists(cache.path)
+
+def test_unexpected_pickle_is_a_miss(tmp_path):
+    filename, cache = stored(tmp_path)
+    with open(cache.path, "wb") as f:
+        pickle.dump({"tree": None}, f)
+    assert vm.ParseCache(filename, SOURCE).load() is None
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    filename, cache = stored(tmp_path)
+    os.remove(cache.path)
+    os.mkdir(cache.path)
+    assert vm.ParseCache(filename, SOURCE).load() is None
+
+def test_store_keeps_entries_of_files_with_longer_names(tmp_path):
+    _, longer = stored(tmp_path)
+    tree, st, _ = vm.analyze(SOURCE)
+    vm.ParseCache(str(tmp_path / "nivel"), SOURCE).store(tree, st)
+    assert os.path.exists(longer.path)
+
+def test_store_keeps_entries_with_other_options(tmp_path):
+    filename = str(tmp_path / "nivel.level")
+    tree, st, _ = vm.analyze(SOURCE)
+    optimized = vm.ParseCache(filename, SOURCE, "optimize")
+    optimized.store(tree, st)
+    vm.ParseCache(filename, SOURCE, "no-optimize").store(tree, st)
+    assert optimized.load() is not None
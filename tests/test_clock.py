@@ -0,0 +1,35 @@
+import re
+import sys
+
+import pytest
+
+from conftest import vm
+
+def run_main(monkeypatch, tmp_path, source, *argv):
+    path = tmp_path / "relogio.level"
+    path.write_text(source, encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["main.py", "--no-cache", *argv, str(path)])
+    vm.main()
+
+def test_virtual_clock_reports_game_and_cpu_time(tmp_path, monkeypatch, capsys):
+    run_main(monkeypatch, tmp_path, "wait(2);\nwait(3);\n", "--fast-forward")
+    assert re.search(r"^Tempo virtual: 5 s \| CPU: \d+\.\d{3} s$", capsys.readouterr().err, re.M)
+
+def test_time_is_reported_when_the_program_fails(tmp_path, monkeypatch, capsys):
+    with pytest.raises(SystemExit) as exit:
+        run_main(monkeypatch, tmp_path, "wait(2);\nx: number = 0;\nsay(1 / x);\n", "--headless")
+    assert exit.value.code == 1
+    captured = capsys.readouterr()
+    assert "Divisão por zero" in captured.out
+    assert "Tempo virtual: 2 s | CPU:" in captured.err
+
+def test_real_time_mode_also_reports(tmp_path, monkeypatch, capsys):
+    run_main(monkeypatch, tmp_path, 'say("oi");\n')
+    assert "Tempo de jogo: 0 s | CPU:" in capsys.readouterr().err
+
+def test_virtual_clock_does_not_sleep(monkeypatch):
+    monkeypatch.setattr(vm.time, "sleep", lambda seconds: pytest.fail("dormiu"))
+    clock = vm.VirtualClock()
+    clock.wait(10)
+    clock.wait(5)
+    assert clock.elapsed == 15
@@ -0,0 +1,44 @@
+import sys
+
+from conftest import vm
+
+CALL = """func pair(a: number, b: number): number {
+    return a * 10 + b;
+}
+func first(): number {
+    say(1);
+    return 1;
+}
+func second(): number {
+    say(2);
+    return 2;
+}
+say(pair(first(), second()));
+"""
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["main.py", "--no-cache", *argv])
+    vm.main()
+
+def test_call_arguments_follow_source_order(tmp_path, monkeypatch, capsys):
+    source = tmp_path / "call.level"
+    source.write_text(CALL, encoding="utf-8")
+    run_main(monkeypatch, "--fast-forward", str(source))
+    # o .asm avalia os argumentos na mesma ordem que a execução
+    assert capsys.readouterr().out == "1\n2\n12\n"
+    asm = (tmp_path / "call.asm").read_text(encoding="utf-8")
+    assert asm.index("call func_first") < asm.index("call func_second")
+    # o primeiro argumento fica em [esp], onde o cdecl o espera
+    after_first = asm[asm.index("call func_first"):]
+    assert "mov dword [esp + 0], eax" in after_first[:after_first.index("call func_second")]
+
+def test_normal_run_is_quiet_and_keeps_the_asm_without_support(tmp_path, monkeypatch, capsys):
+    source = tmp_path / "arrays.level"
+    source.write_text("xs: array = [1, 2];\nsay(xs);\n", encoding="utf-8")
+    stale = tmp_path / "arrays.asm"
+    stale.write_text("; versão antiga\n", encoding="utf-8")
+    run_main(monkeypatch, "--fast-forward", str(source))
+    captured = capsys.readouterr()
+    assert captured.out == "[1, 2]\n"
+    assert "Codegen" not in captured.err
+    assert stale.read_text(encoding="utf-8") == "; versão antiga\n"
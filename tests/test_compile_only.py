@@ -0,0 +1,38 @@
+import sys
+
+import pytest
+
+from conftest import vm
+
+def compile_only(monkeypatch, path):
+    monkeypatch.setattr(sys, "argv", ["main.py", "--no-cache", "--compile-only", str(path)])
+    vm.main()
+
+def test_writes_the_asm_without_running(tmp_path, monkeypatch, capsys):
+    source = tmp_path / "oi.level"
+    source.write_text('x: number = 2;\nsay(x * 21);\nsay("oi");\n', encoding="utf-8")
+    compile_only(monkeypatch, source)
+    assert capsys.readouterr().out == ""
+    asm = (tmp_path / "oi.asm").read_text(encoding="utf-8")
+    assert "call printf" in asm and 'db "oi", 0' in asm
+
+def test_unsupported_program_exits_1_without_running(tmp_path, monkeypatch, capsys):
+    # executado, o wait dormiria de verdade
+    source = tmp_path / "espera.level"
+    source.write_text('say("antes");\nwait(1000);\nxs: array = [1, 2];\n', encoding="utf-8")
+    with pytest.raises(SystemExit) as exit:
+        compile_only(monkeypatch, source)
+    assert exit.value.code == 1
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "[Codegen] Ação 'wait' não suportada" in captured.err
+    assert "espera.asm não gerado" in captured.err
+    assert not (tmp_path / "espera.asm").exists()
+
+def test_analysis_errors_still_fail(tmp_path, monkeypatch, capsys):
+    source = tmp_path / "erro.level"
+    source.write_text('x: number = "a";\n', encoding="utf-8")
+    with pytest.raises(SystemExit) as exit:
+        compile_only(monkeypatch, source)
+    assert exit.value.code == 1
+    assert "Tipo incompatível na declaração de x" in capsys.readouterr().out
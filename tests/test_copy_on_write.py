@@ -0,0 +1,165 @@
+from conftest import run_level
+
+ROW = 20000
+
+def literal(n):
+    return "[" + ", ".join(["0"] * n) + "]"
+
+def test_gather_after_passing_inventory_to_function_writes_in_place(mode, copies):
+    # o parâmetro é um segundo nome só durante a chamada
+    source = """func size(xs: array): number {
+    return len(xs);
+}
+inventory: array = [];
+i: number = 0;
+until (i < 50) {
+    gather("item");
+    i = size(inventory);
+}
+say(i);
+"""
+    lines, _ = run_level(source, mode)
+    assert lines[-1] == "50"
+    assert copies["n"] <= 1
+
+GATHERS = """func same(xs: array): array {
+    return xs;
+}
+inventory: array = ["sword"];
+before: array = inventory;
+gather("rope");
+kept: array = same(inventory);
+gather("potion");
+say(before);
+say(kept);
+say(inventory);
+"""
+
+def test_aliases_do_not_see_gathers(mode):
+    lines, _ = run_level(GATHERS, mode)
+    assert lines[-3:] == ["['sword']", "['sword', 'rope']", "['sword', 'rope', 'potion']"]
+
+def test_writes_into_grid_row_copy_once(mode, copies):
+    # ler grid[1][j] não pode marcar a linha como compartilhada
+    source = f"""grid: number[][] = [[0], {literal(ROW)}];
+i: number = 0;
+until (i < 1000) {{
+    grid[1][i] = grid[1][i] + i;
+    i = i + 1;
+}}
+say(grid[1][999]);
+"""
+    lines, _ = run_level(source, mode)
+    assert lines == ["999"]
+    assert copies["n"] <= 2
+
+def test_writes_into_untyped_row_copy_once(mode, copies):
+    source = f"""rows: array = [{literal(ROW)}];
+i: number = 0;
+until (i < 2000) {{
+    rows[0][i] = rows[0][i + 1] + 1;
+    i = i + 1;
+}}
+say(rows[0][0]);
+"""
+    lines, _ = run_level(source, mode)
+    assert lines == ["1"]
+    assert copies["n"] <= 3
+
+def test_passing_array_to_function_does_not_force_copies(mode, copies):
+    # o parâmetro é um segundo nome só durante a chamada
+    source = f"""func get(a: number[], j: number): number {{
+    return a[j];
+}}
+row: number[] = {literal(ROW)};
+i: number = 0;
+until (i < 500) {{
+    row[i] = get(row, i) + 1;
+    i = i + 1;
+}}
+say(row[499]);
+"""
+    lines, _ = run_level(source, mode)
+    assert lines == ["1"]
+    assert copies["n"] <= 1
+
+ALIASING = """g: array = [0];
+func keep(a: array) {
+    g = a;
+    a[0] = 7;
+}
+func poke(a: array): number {
+    a[1] = 99;
+    return a[1];
+}
+func same(a: array): array {
+    return a;
+}
+xs: array = [1, 2, 3];
+say(poke(xs));
+say(xs);
+keep(xs);
+xs[0] = 5;
+say(xs);
+say(g);
+ys: array = same(xs);
+ys[2] = 42;
+say(xs);
+say(ys);
+grid: number[][] = [[1, 2], [3, 4]];
+r: number[] = grid[0];
+grid[0][0] = 10;
+say(r);
+say(grid);
+"""
+
+def test_aliases_do_not_see_writes(mode):
+    lines, _ = run_level(ALIASING, mode)
+    assert lines == ["99", "[1, 2, 3]", "[5, 2, 3]", "[1, 2, 3]", "[5, 2, 3]", "[5, 2, 42]",
+                     "[1, 2]", "[[10, 2], [3, 4]]"]
+
+def test_owner_write_during_call_copies(mode):
+    # a global escrita no meio da chamada não muda o que o parâmetro vê
+    source = """data: number[] = [1, 2, 3];
+func touch(a: number[], depth: number): number {
+    if (depth > 0) {
+        data[0] = data[0] + 100;
+        return touch(a, depth - 1) + a[0];
+    }
+    a[1] = 50;
+    return a[1];
+}
+say(touch(data, 3));
+say(data);
+"""
+    lines, _ = run_level(source, mode)
+    assert lines == ["53", "[301, 2, 3]"]
+
+def test_method_argument_stored_in_field(mode):
+    source = """entity Box {
+    items: number[] = [0, 0];
+    func put(xs: number[]) {
+        items = xs;
+        xs[0] = 9;
+    }
+}
+b: Box = Box();
+v: number[] = [4, 5];
+b.put(v);
+v[1] = 6;
+say(v);
+say(b.items);
+"""
+    lines, _ = run_level(source, mode)
+    assert lines == ["[4, 6]", "[4, 5]"]
+
+def test_nested_typed_rows_are_not_written_through_an_alias(mode):
+    source = """g: number[][] = [[1, 2], [3, 4]];
+h: number[][] = g;
+h[0][1] = 9;
+g[1][0] = 8;
+say(g);
+say(h);
+"""
+    lines, _ = run_level(source, mode)
+    assert lines == ["[[1, 2], [8, 4]]", "[[1, 9], [3, 4]]"]
@@ -0,0 +1,51 @@
+import pytest
+
+from conftest import run_level, vm
+
+MONSTER = """entity Monster {
+    name: text = "orc";
+    hp: number = 10;
+    func hit(dmg: number) {
+        hp = hp - dmg;
+    }
+    loot: text[] = ["ouro"];
+}
+"""
+
+def instances(source, *names):
+    program = vm.compile_level(MONSTER + source)
+    frame = program.frame(output=vm.NullOutput(), clock=vm.VirtualClock())
+    program.execute(frame)
+    return program, [frame.slots[program.tree.global_names[name]].value for name in names]
+
+def test_fields_have_fixed_slots_in_declaration_order():
+    program, (m,) = instances('m: Monster = Monster("morcego");\n', "m")
+    entity = m.entity
+    assert entity.field_slots == {"name": 0, "hp": 1, "loot": 3}
+    assert entity.field_types == {"name": "text", "hp": "number", "loot": "text[]"}
+    assert len(m.slots) == entity.frame_size == 4
+    assert [m.slots[slot].value for slot in entity.field_slots.values()] == ["morcego", 10, ["ouro"]]
+
+def test_instances_share_methods_and_own_fields():
+    _, (a, b) = instances("a: Monster = Monster();\nb: Monster = Monster();\na.hit(4);\n", "a", "b")
+    method = a.entity.methods["hit"]
+    assert a.slots[2] is b.slots[2] and a.slots[2].value is method
+    assert a.slots[1] is not b.slots[1]
+    assert (a.field("hp").value, b.field("hp").value) == (6, 10)
+    assert not hasattr(a, "__dict__")
+
+def test_instances_are_references(mode):
+    source = MONSTER + "a: Monster = Monster();\nc: Monster = a;\nc.hit(1);\nsay(a.hp);\nsay(a);\n"
+    lines, final = run_level(source, mode)
+    assert lines == ["9", "Monster(name=orc, hp=9, loot=['ouro'])"]
+    assert final["a"] == {"name": "orc", "hp": 9, "loot": ["ouro"]}
+
+@pytest.mark.parametrize("source, message", [
+    ('m: Monster = Monster();\nm.hp = "x";\n', "Tipo incompatível para campo hp: esperado number, obtido text"),
+    ("m: Monster = Monster();\nsay(m.mana);\n", "Entidade Monster não tem campo mana"),
+    ('m: Monster = Monster("a", 1, ["b"], 2);\n', "Entidade Monster tem 3 campos, recebeu 4 argumentos"),
+    ("m: Monster = Monster(1);\n", "Tipo incompatível para campo name: esperado text, obtido number"),
+], ids=["field-type", "missing-field", "arity", "constructor-type"])
+def test_entity_errors(source, message, mode):
+    with pytest.raises(Exception, match=message):
+        run_level(MONSTER + source, mode)
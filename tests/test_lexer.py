@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from conftest import vm
+
+import bench
+
+LEVEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "level", "test.level")
+
+SOURCES = {
+    "url em string": 'site: text = "http://exemplo.com"; // comentário\nsay(site);\n',
+    "bloco em string": 'say("/* não é comentário */");\n',
+    "comentário de bloco": 'x: number = 1; /* várias\nlinhas // com barras\n*/ say(x);\n',
+    "operadores": 'if (a <= b && c != d || e > 0) { x = x / 2 - y * 3; }\n',
+    "arrays e entities": 'grid: number[][] = [[1, 2]];\nm.hp = m.hp - grid[0][1];\n',
+}
+
+def tokens(source):
+    return [(t.kind, t.value) for t in vm.tokenize(source)]
+
+@pytest.mark.parametrize("source", list(SOURCES.values()), ids=list(SOURCES))
+def test_tokenize_matches_the_reference_lexer(source):
+    assert tokens(source) == bench.token_stream(bench.CharLexer(bench.Prepro.filter(source)))
+
+def test_tokenize_matches_the_reference_lexer_on_test_level():
+    with open(LEVEL, encoding="utf-8") as f:
+        source = f.read()
+    assert tokens(source) == bench.token_stream(bench.CharLexer(bench.Prepro.filter(source)))
+
+def test_double_slash_inside_string_is_kept():
+    assert ("STRING", "a // b") in tokens('say("a // b"); // fim\n')
+
+def test_positions_count_lines_inside_comments():
+    first, second = [t for t in vm.tokenize('/* um\ndois */ x\n  y // z\n') if t.kind == "IDENTIFIER"]
+    assert (first.line, first.column) == (2, 9)
+    assert (second.line, second.column) == (3, 3)
+
+def test_unterminated_string_reports_position():
+    with pytest.raises(Exception, match=r"String não fechada \(linha 2, coluna 5\)"):
+        vm.tokenize('x: number = 1;\nsay("abc);\n')
@@ -0,0 +1,72 @@
+import sys
+
+from conftest import vm
+
+def optimized(source, inputs=()):
+    # devolve (relatório, programa reescrito)
+    tree, _, optimizer = vm.analyze(source, True, inputs)
+    return optimizer.report(), vm.to_source(tree)
+
+def test_folds_constant_expressions():
+    report, source = optimized('x: number = 2 * 3 + 1;\nsay(-(4) + 1);\nsay("a" == "a");\n')
+    assert source == "x: number = 7;\nsay(-3);\nsay(true);\n"
+    assert report.startswith("// otimizador: 5 expressões dobradas")
+
+def test_keeps_division_by_zero_for_the_runtime_error():
+    _, source = optimized("say(1 / 0);\n")
+    assert source == "say((1 / 0));\n"
+
+def test_removes_dead_branches():
+    report, source = optimized(
+        "if (1 < 2) {\n    say(1);\n} else {\n    say(2);\n}\n"
+        "until (false) {\n    say(3);\n}\n"
+        "if (false) {\n    say(4);\n}\n")
+    assert source == "say(1);\n"
+    assert report.endswith("5 comandos removidos")
+
+def test_removes_statements_after_return():
+    _, source = optimized("func f(): number {\n    return 1;\n    say(2);\n}\nsay(f());\n")
+    assert source == "func f(): number {\n    return 1;\n}\nsay(f());\n"
+
+def test_propagates_globals_never_written():
+    report, source = optimized(
+        "xs: number[] = [1, 2];\nlimit: number = 1;\nxs[limit] = 3;\nfill(xs, limit);\nsay(xs[limit - 1]);\n")
+    assert "xs[1] = 3;\nfill(xs, 1);\nsay(xs[0]);\n" in source
+    assert "3 constantes propagadas" in report
+
+def test_assigned_globals_are_not_propagated():
+    _, source = optimized("k: number = 5;\nm: number = 5;\nm = 6;\nsay(k + m);\n")
+    assert source.endswith("say((5 + m));\n")
+
+def test_attack_and_use_writes_are_not_propagated():
+    # attack escreve enemy_hp, use escreve health; max_health só é lido
+    _, source = optimized(
+        'enemy_hp: number = 10;\nattack();\nsay(enemy_hp);\n'
+        'health: number = 3;\nmax_health: number = 5;\ninventory: array = ["potion"];\n'
+        'use("potion");\nsay(health);\nsay(max_health);\n')
+    assert "say(enemy_hp);" in source
+    assert "say(health);" in source
+    assert "say(5);" in source
+
+def test_inputs_are_not_propagated():
+    source = "limit: number = 1;\nsay(limit);\n"
+    assert optimized(source)[1].endswith("say(1);\n")
+    assert optimized(source, None)[1].endswith("say(limit);\n")
+
+def test_dump_optimized(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "dobra.level"
+    path.write_text("x: number = 2 * 3;\nsay(x);\n", encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["main.py", "--dump-optimized", str(path)])
+    vm.main()
+    assert capsys.readouterr().out == (
+        "// otimizador: 1 expressões dobradas, 1 constantes propagadas, 0 comandos removidos\n"
+        "x: number = 6;\nsay(6);\n")
+    assert not (tmp_path / "dobra.asm").exists()
+    assert not (tmp_path / "__levelcache__").exists()
+
+def test_dump_without_optimizing(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "dobra.level"
+    path.write_text("x: number = 2 * 3;\nsay(x);\n", encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["main.py", "--dump-optimized", "--no-optimize", str(path)])
+    vm.main()
+    assert capsys.readouterr().out == "x: number = (2 * 3);\nsay(x);\n"
@@ -0,0 +1,37 @@
+import pytest
+
+from conftest import vm
+
+def optimize(lines):
+    # aplica as regras como Code.append, instrução por instrução
+    window = []
+    for code in lines:
+        window.append(f"  {code}")
+        while vm.peephole(window):
+            pass
+    return [code.strip() for code in window]
+
+def test_push_then_pop_becomes_mov():
+    assert optimize(["push dword [ebp-4]", "pop eax"]) == ["mov eax, dword [ebp-4]"]
+
+def test_push_mov_ecx_pop_keeps_operands():
+    assert optimize(["push dword [ebp-4]", "mov ecx, 7", "pop eax"]) == ["mov eax, dword [ebp-4]", "mov ecx, 7"]
+
+def test_push_eax_mov_ecx_pop_drops_the_stack():
+    assert optimize(["push eax", "mov ecx, dword [ebp-8]", "pop eax"]) == ["mov ecx, dword [ebp-8]"]
+
+@pytest.mark.parametrize("operand", ["eax", "dword [eax]", "dword [esp]", "dword [esp+4]"])
+def test_push_mov_ecx_pop_keeps_reads_of_eax_and_esp(operand):
+    # mov ecx, eax leria P em vez do eax original; [esp] muda sem o push
+    lines = ["push dword [ebp-4]", f"mov ecx, {operand}", "pop eax"]
+    assert optimize(lines) == lines
+
+def test_push_ecx_is_read_before_ecx_changes():
+    assert optimize(["push ecx", "mov ecx, 3", "pop eax"]) == ["mov eax, ecx", "mov ecx, 3"]
+
+def test_constant_divisor_skips_zero_check():
+    assert optimize(["mov ecx, 4", "cmp ecx, 0", "je level_div_zero"]) == ["mov ecx, 4"]
+
+def test_compare_and_branch_fuses():
+    lines = ["cmp eax, ecx", "setl al", "movzx eax, al", "cmp eax, 0", "je L1"]
+    assert optimize(lines) == ["cmp eax, ecx", "jge L1"]
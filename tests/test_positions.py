@@ -0,0 +1,32 @@
+import pytest
+
+from conftest import run_level, vm
+
+RUNTIME = {
+    "undeclared": ("x: number = 1;\nsay(y);\n", "Variável não declarada: y", (2, 5)),
+    "division": ("x: number = 0;\nif (true) {\n    say(10 / x);\n}\n", "Divisão por zero", (3, 12)),
+    "inside-function": ("func f(a: number[]): number {\n    return a[5];\n}\nxs: number[] = [1];\nsay(f(xs));\n",
+                        "Índice fora do intervalo", (2, 13)),
+    "after-comments": ('/* a\n b */ x: number = 1;\n// c\nsay(x + "a");\n', "Operação \\+ requer números", (4, 7)),
+    "declaration": ('x: number = "a";\n', "Tipo incompatível na declaração de x", (1, 1)),
+}
+
+@pytest.mark.parametrize("source, message, position", list(RUNTIME.values()), ids=list(RUNTIME))
+def test_errors_carry_the_source_position(source, message, position, mode):
+    with pytest.raises(Exception, match=f"{message}.* \\(linha {position[0]}, coluna {position[1]}\\)$") as error:
+        run_level(source, mode)
+    assert error.value.position == position
+
+@pytest.mark.parametrize("source, message", [
+    ("x: number = 1;\nsay(x +);\n", r"\[Parser\] Fator inválido: RPAREN \(linha 2, coluna 8\)"),
+    ("x: number = 1;\n  @\n", r"Caractere inválido: @ \(linha 2, coluna 3\)"),
+], ids=["parser", "lexer"])
+def test_syntax_errors_report_the_token_position(source, message):
+    with pytest.raises(Exception, match=message):
+        vm.compile_level(source)
+
+def test_positions_are_kept_in_a_side_table():
+    tree, _, _ = vm.analyze("x: number = 1;\nsay(x);\n")
+    say = tree.children[-1]
+    assert tree.positions.get(say.id) == (2, 1)
+    assert not hasattr(say, "line")
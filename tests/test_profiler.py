@@ -0,0 +1,109 @@
+import sys
+
+from conftest import vm
+
+SOURCE = """func spin(n: number): number {
+    i: number = 0;
+    until (i < n) {
+        wait(1);
+        i = i + 1;
+    }
+    return i;
+}
+entity Bat {
+    hp: number = 2;
+    func rest() {
+        wait(1);
+    }
+}
+b: Bat = Bat();
+say(spin(3));
+b.rest();
+"""
+
+class SamplingClock(vm.VirtualClock):
+    # uma amostra em cada wait, tirada da própria thread: pilhas determinísticas
+    def __init__(self, profiler):
+        super().__init__()
+        self.profiler = profiler
+
+    def wait(self, seconds):
+        self.profiler.sample(sys._getframe(1))
+        super().wait(seconds)
+
+def profiled(source, mode, clock=None, interval=0.001):
+    engine, trusted = mode
+    tree, _, _ = vm.analyze(source)
+    if trusted and engine == "tree":
+        vm.TypeChecker.trust(tree)
+    profiler = vm.Profiler(tree, source, interval)
+    frame = vm.Frame(tree.frame_size, names=tree.global_names, output=vm.NullOutput(),
+                     clock=clock(profiler) if clock else vm.VirtualClock())
+    if engine == "bytecode":
+        compiler = vm.Compiler(trusted=trusted, profiler=profiler)
+        code = compiler.compile_program(tree)
+        vm.GameVM(compiler).run(code, frame)
+    else:
+        tree.evaluate(frame)
+    return profiler
+
+def test_folded_stacks_are_the_same_on_both_engines(mode):
+    profiler = profiled(SOURCE, mode, SamplingClock)
+    assert profiler.collapsed() == ("<programa>;linha:16;spin:1;until:3;linha:4 3\n"
+                                    "<programa>;linha:17;rest:11;linha:12 1\n")
+
+def test_report_counts_calls_and_iterations(mode):
+    report = profiled(SOURCE, mode, SamplingClock).report()
+    assert "Perfil: 4 amostras" in report
+    assert "75.0%    75.0%          1  spin (linha 1)" in report
+    assert "25.0%    25.0%          1  rest (linha 11)" in report
+    assert "75.0%          3  linha 3" in report
+    assert "75.0%      4  wait(1);" in report
+
+def test_recursive_calls_are_counted(mode):
+    source = """func fib(n: number): number {
+    if (n < 2) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+say(fib(10));
+"""
+    profiler = profiled(source, mode)
+    assert [block.count for _, block in profiler.bodies] == [177]
+
+def test_a_failing_sample_is_lost_not_the_profile():
+    source = "i: number = 0;\nuntil (i < 300000) {\n    i = i + 1;\n}\n"
+    tree, _, _ = vm.analyze(source)
+    profiler = vm.Profiler(tree, source, 0.0005)
+    sample = profiler.sample
+    failed = []
+    def flaky(frame):
+        if not failed:
+            failed.append(True)
+            raise KeyError("pilha mudou")
+        sample(frame)
+    profiler.sample = flaky
+    switch = sys.getswitchinterval()
+    profiler.start()
+    tree.evaluate(vm.Frame(tree.frame_size, names=tree.global_names, output=vm.NullOutput(), clock=vm.VirtualClock()))
+    profiler.stop()
+    assert profiler.lost == 1
+    assert profiler.samples > 0
+    assert "1 amostras perdidas" in profiler.report()
+    assert sys.getswitchinterval() == switch
+
+def test_cli_writes_report_and_folded_file(tmp_path, monkeypatch, capsys):
+    source = tmp_path / "spin.level"
+    source.write_text(SOURCE, encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["main.py", "--no-cache", "--headless", "--profile",
+                                      "--engine", "bytecode", str(source)])
+    vm.main()
+    err = capsys.readouterr().err
+    assert "Perfil:" in err
+    # contadas mesmo sem amostras
+    assert "         1  spin (linha 1)" in err
+    folded = (tmp_path / "spin.folded").read_text(encoding="utf-8")
+    for line in folded.splitlines():
+        frames = line.rsplit(" ", 1)[0].split(";")
+        assert all(a != b for a, b in zip(frames, frames[1:]))
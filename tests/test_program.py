@@ -0,0 +1,60 @@
+import io
+import threading
+
+from conftest import vm
+
+FIB = """seed: number = 1;
+func fib(n: number): number {
+    if (n < 2) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+result: number = fib(seed);
+say(result);
+"""
+
+FIBS = {10: 55, 12: 144, 15: 610, 16: 987}
+
+def in_threads(target, count):
+    errors = []
+    def guarded(i):
+        try:
+            target(i)
+        except BaseException as e:
+            errors.append(e)
+    threads = [threading.Thread(target=guarded, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+def test_program_runs_from_many_threads(mode):
+    program = vm.compile_level(FIB, *mode)
+    seeds = list(FIBS) * 4
+    results = [None] * len(seeds)
+    def work(i):
+        out = io.StringIO()
+        final = program.run(globals={"seed": seeds[i]}, output=out, clock=vm.VirtualClock())
+        results[i] = (final["result"], out.getvalue())
+    in_threads(work, len(seeds))
+    assert results == [(FIBS[seed], f"{FIBS[seed]}\n") for seed in seeds]
+
+def test_call_frames_are_pooled_per_run():
+    program = vm.compile_level(FIB, "tree", True)
+    first = program.frame({"seed": 10}, vm.NullOutput(), vm.VirtualClock())
+    second = program.frame({"seed": 12}, vm.NullOutput(), vm.VirtualClock())
+    program.execute(first)
+    program.execute(second)
+    assert first.pools and second.pools
+    pooled = lambda frame: {id(f) for frames in frame.pools.values() for f in frames}
+    assert pooled(first).isdisjoint(pooled(second))
+
+def test_asm_generation_from_many_threads(tmp_path):
+    program = vm.compile_level(FIB.replace("fib(seed)", "fib(20)"))
+    program.generate(str(tmp_path / "serial.asm"))
+    expected = (tmp_path / "serial.asm").read_text(encoding="utf-8")
+    in_threads(lambda i: program.generate(str(tmp_path / f"t{i}.asm")), 8)
+    for i in range(8):
+        assert (tmp_path / f"t{i}.asm").read_text(encoding="utf-8") == expected
@@ -0,0 +1,98 @@
+import io
+import os
+import sys
+import threading
+
+import pytest
+
+from conftest import vm
+
+import client
+import server as vmserver
+
+@pytest.fixture
+def serving(tmp_path):
+    path = str(tmp_path / "s")
+    srv = vmserver.listen(path)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv, path
+    srv.shutdown()
+    srv.server_close()
+    thread.join()
+
+def level(tmp_path, name, source):
+    path = tmp_path / name
+    path.write_text(source, encoding="utf-8")
+    return str(path)
+
+def run(path, socket, **options):
+    out = io.StringIO()
+    message = dict({"cmd": "run", "path": path, "engine": "tree", "trusted": False, "optimize": True,
+                    "output": "terminal", "fast_forward": True}, **options)
+    return client.request(socket, message, out), out.getvalue()
+
+def test_output_lines_are_streamed(serving, tmp_path):
+    _, socket = serving
+    reply, out = run(level(tmp_path, "oi.level", 'say("oi");\nwait(3);\nsay(42);\n'), socket)
+    assert out == "oi\n42\n"
+    assert reply["exit"] == 0 and reply["error"] is None and reply["time"] == 3
+
+def test_program_cache_hits_until_the_file_changes(serving, tmp_path):
+    srv, socket = serving
+    path = level(tmp_path, "conta.level", "say(1);\n")
+    run(path, socket)
+    run(path, socket)
+    assert (srv.cache.hits, srv.cache.misses) == (1, 1)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("say(2);\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    _, out = run(path, socket)
+    assert out == "2\n"
+    assert (srv.cache.hits, srv.cache.misses) == (1, 2)
+    assert len(srv.cache.entries) == 1
+
+def test_program_cache_evicts_least_recently_used(tmp_path):
+    cache = vmserver.ProgramCache(size=2)
+    paths = [level(tmp_path, f"p{i}.level", f"say({i});\n") for i in range(3)]
+    for path in paths[:2] + paths[:1] + paths[2:]:
+        cache.get(path, "tree", False, True)
+    assert [key[0] for key in cache.entries] == [paths[0], paths[2]]
+
+def test_missing_file_is_an_error_reply(serving, tmp_path):
+    _, socket = serving
+    reply, out = run(str(tmp_path / "nada.level"), socket)
+    assert out == ""
+    assert reply["exit"] == 1 and reply["error"].startswith("Erro ao abrir arquivo")
+
+def test_program_errors_come_with_time(serving, tmp_path):
+    _, socket = serving
+    reply, out = run(level(tmp_path, "erro.level", "x: number = 0;\nsay(1);\nsay(1 / x);\n"), socket)
+    assert out == "1\n"
+    assert reply["exit"] == 1 and "Divisão por zero (linha 3, coluna 7)" in reply["error"]
+    assert "time" in reply
+
+def test_stop_shuts_the_server_down(tmp_path):
+    path = str(tmp_path / "s")
+    srv = vmserver.listen(path)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    assert client.request(path, {"cmd": "stop"}) == {"exit": 0, "error": None}
+    thread.join(5)
+    assert not thread.is_alive()
+    srv.server_close()
+
+def test_client_main_prints_output_and_time(serving, tmp_path, monkeypatch, capsys):
+    _, socket = serving
+    path = level(tmp_path, "cli.level", 'say("oi");\nwait(2);\n')
+    monkeypatch.setattr(sys, "argv", ["client.py", "--socket", socket, "--headless", path])
+    client.main()
+    captured = capsys.readouterr()
+    assert captured.out == "oi\n"
+    assert "Tempo virtual: 2 s | CPU:" in captured.err
+
+def test_second_server_on_the_same_socket_is_refused(serving):
+    _, socket = serving
+    with pytest.raises(OSError, match="já há um servidor"):
+        vmserver.listen(socket)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# Execução em lote: o mesmo .level rodado muitas vezes, cada vez com outros valores
+# iniciais para globais, em paralelo. Uso: python3 vm/batch.py <arquivo> [opções]
+import sys
+import os
+import csv
+import json
+import time
+import pickle
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import main as vm
+
+class ListOutput(vm.NullOutput):
+    # --with-output: guarda as linhas para o resultado da execução
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def line(self, text: str):
+        self.lines.append(text)
+
+class Job:
+    # Árvore já analisada e otimizada uma vez. Viaja para cada processo em um
+    # único pickle e lá vira um Program (as classes Trusted* e o bytecode não
+    # vão no pickle); cada execução passa os seus valores iniciais em globals.
+    def __init__(self, tree, st, engine="tree", trusted=False, with_output=False):
+        self.tree = tree
+        self.st = st
+        self.engine = engine
+        self.trusted = trusted
+        self.with_output = with_output
+        self.program = None
+
+    def prepare(self):
+        self.program = vm.Program(self.tree, self.st, self.engine, self.trusted)
+        return self
+
+    def run(self, index, overrides):
+        program = self.program
+        output = ListOutput() if self.with_output else vm.NullOutput()
+        clock = vm.VirtualClock()
+        frame = program.frame(overrides, output, clock)
+        result = {"run": index, "status": "ok", "error": None, "init": overrides}
+        try:
+            program.execute(frame)
+        except Exception as e:
+            result["status"] = "erro"
+            result["error"] = str(e)
+        result["time"] = clock.elapsed
+        result["final"] = program.globals_of(frame)
+        if self.with_output:
+            result["output"] = output.lines
+        return result
+
+def parse_value(text):
+    # --vary aceita literais JSON (10, true, "a,b"); o resto é text
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def load_runs(args) -> list:
+    runs = []
+    if args.runs:
+        with open(args.runs, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                run = json.loads(line)
+                if not isinstance(run, dict):
+                    raise Exception(f"[Batch] {args.runs}:{number}: esperado um objeto JSON")
+                runs.append(run)
+    else:
+        runs.append({})
+    names = []
+    choices = []
+    for spec in args.vary:
+        name, sep, values = spec.partition("=")
+        if not sep or not name:
+            raise Exception(f"[Batch] --vary espera NOME=V1,V2,...: {spec}")
+        names.append(name)
+        choices.append([parse_value(v) for v in values.split(",")])
+    if names:
+        runs = [dict(run, **dict(zip(names, combo))) for run in runs for combo in itertools.product(*choices)]
+    return runs * args.repeat
+
+# estado de cada processo do pool: o Job chega uma vez, pelo initializer
+_job = None
+
+def init_worker(payload):
+    global _job
+    _job = pickle.loads(payload).prepare()
+
+def run_in_worker(task):
+    return _job.run(*task)
+
+def execute(job, runs, jobs):
+    tasks = list(enumerate(runs))
+    if jobs <= 1:
+        job.prepare()
+        for task in tasks:
+            yield job.run(*task)
+        return
+    payload = pickle.dumps(job, protocol=pickle.HIGHEST_PROTOCOL)
+    # lotes grandes amortizam a ida e volta entre processos; vários lotes por
+    # processo equilibram execuções de durações diferentes
+    chunksize = max(1, len(tasks) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(payload,)) as pool:
+        yield from pool.map(run_in_worker, tasks, chunksize=chunksize)
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self.stream = stream
+    def write(self, result):
+        self.stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+class CsvWriter:
+    # uma coluna por global sobrescrita (init.<nome>) e por global final
+    def __init__(self, stream, tree, with_output):
+        final = list(dict.fromkeys(node.children[0].name for node in tree.children if isinstance(node, vm.VarDec)))
+        columns = ["run", "status", "error", "time"] + [f"init.{name}" for name in tree.inputs] + final
+        if with_output:
+            columns.append("output")
+        self.writer = csv.DictWriter(stream, columns, restval="", extrasaction="ignore")
+        self.writer.writeheader()
+    def write(self, result):
+        row = {key: result[key] for key in ("run", "status", "error", "time")}
+        for name, value in result["init"].items():
+            row[f"init.{name}"] = value
+        for name, value in result["final"].items():
+            row[name] = json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+        if "output" in result:
+            row["output"] = "\n".join(result["output"])
+        self.writer.writerow(row)
+
+def main():
+    argp = argparse.ArgumentParser(prog="batch.py", description="Execuções em lote de um programa Level")
+    argp.add_argument("arquivo", help="arquivo .level")
+    argp.add_argument("--runs", metavar="ARQUIVO.jsonl",
+                      help="um objeto JSON por linha com os valores iniciais das globais de cada execução")
+    argp.add_argument("--vary", action="append", default=[], metavar="NOME=V1,V2,...",
+                      help="valores de uma global; vários --vary (e cada linha de --runs) formam o produto cartesiano")
+    argp.add_argument("--repeat", type=int, default=1, help="executa cada combinação N vezes")
+    argp.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="processos em paralelo")
+    argp.add_argument("--out", metavar="ARQUIVO",
+                      help="resultados em .csv ou .jsonl (padrão: JSONL na saída padrão)")
+    argp.add_argument("--engine", choices=("tree", "bytecode"), default="tree")
+    argp.add_argument("--trusted", action="store_true")
+    argp.add_argument("--no-optimize", action="store_true")
+    argp.add_argument("--with-output", action="store_true", help="inclui nos resultados o que o programa disse")
+    args = argp.parse_args()
+    try:
+        with open(args.arquivo, "r", encoding="utf-8") as f:
+            source = f.read()
+    except Exception as e:
+        print(f"Erro ao abrir arquivo {args.arquivo}: {e}")
+        sys.exit(1)
+    try:
+        runs = load_runs(args)
+        names = list(dict.fromkeys(name for run in runs for name in run))
+        tree, st, _ = vm.analyze(source, not args.no_optimize, names)
+        # confere os valores antes de distribuir: a árvore ainda não foi tocada
+        checker = vm.Program(tree, st)
+        for run in runs:
+            checker.check_globals(run)
+    except Exception as e:
+        print(e)
+        sys.exit(1)
+    job = Job(tree, st, args.engine, args.trusted, args.with_output)
+    stream = open(args.out, "w", encoding="utf-8", newline="") if args.out else sys.stdout
+    if args.out and args.out.endswith(".csv"):
+        writer = CsvWriter(stream, tree, args.with_output)
+    else:
+        writer = JsonlWriter(stream)
+    start = time.perf_counter()
+    failed = 0
+    for result in execute(job, runs, max(1, args.jobs)):
+        writer.write(result)
+        failed += result["status"] != "ok"
+    elapsed = time.perf_counter() - start
+    if stream is not sys.stdout:
+        stream.close()
+    print(f"{len(runs)} execuções ({failed} com erro) em {elapsed:.3f} s com {max(1, args.jobs)} processo(s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
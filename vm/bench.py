@@ -0,0 +1,745 @@
+#!/usr/bin/env python3
+# Benchmarks da GameVM. Uso: python3 vm/bench.py <benchmark> [opções]
+import sys
+import re
+import time
+import argparse
+import os
+import tempfile
+import shutil
+import subprocess
+import threading
+import tracemalloc
+
+import main as vm
+import batch
+import client
+import server
+
+class Prepro:
+    # Pré-processador original: o Lexer de main.py já ignora comentários, o filtro
+    # serve ao CharLexer. Uma única passada: strings são copiadas intactas e cada
+    # comentário vira as quebras de linha que continha, preservando a numeração.
+    pattern = re.compile(r'"[^"]*"|//[^\n]*|/\*.*?\*/', re.DOTALL)
+    def filter(code: str) -> str:
+        def keep(m):
+            text = m.group()
+            if text[0] == '"':
+                return text
+            return "\n" * text.count("\n")
+        return Prepro.pattern.sub(keep, code)
+
+class CharLexer():
+    # Lexer original, caractere a caractere, mantido só como referência: os
+    # benchmarks e os testes conferem que vm.tokenize() produz os mesmos tokens.
+    def __init__(self, source):
+        self.source = source
+        self.position = 0
+        self.next = None
+        self.selectNext()
+    def peek(self, k=1):
+        # lookahead antigo do Parser: salva o estado, re-lexa e restaura
+        saved_pos = self.position
+        saved_next = self.next
+        for _ in range(k):
+            self.selectNext()
+        token = self.next
+        self.position = saved_pos
+        self.next = saved_next
+        return token
+    def selectNext(self):
+        while self.position < len(self.source) and self.source[self.position] in ' \t\r\n':
+            self.position += 1
+        if self.position >= len(self.source):
+            self.next = vm.Token("EOF", "")
+            return
+        c_atual = self.source[self.position]
+        if c_atual.isalpha() or c_atual == '_':
+            ident = ''
+            while self.position < len(self.source) and (self.source[self.position].isalnum() or self.source[self.position] == '_'):
+                ident += self.source[self.position]
+                self.position += 1
+            keywords = {
+                "text": "TEXT_TYPE", "number": "NUMBER_TYPE", "boolean": "BOOLEAN_TYPE",
+                "array": "ARRAY_TYPE", "func": "FUNC", "entity": "ENTITY", "if": "IF",
+                "else": "ELSE", "until": "UNTIL", "during": "DURING", "return": "RETURN",
+                "move": "MOVE", "attack": "ATTACK", "gather": "GATHER", "use": "USE",
+                "say": "SAY", "wait": "WAIT", "true": "TRUE", "false": "FALSE", "len": "LEN"
+            }
+            if ident in keywords:
+                self.next = vm.Token(keywords[ident], ident)
+            else:
+                self.next = vm.Token("IDENTIFIER", ident)
+            return
+        elif c_atual.isdigit():
+            num = ''
+            while self.position < len(self.source) and self.source[self.position].isdigit():
+                num += self.source[self.position]
+                self.position += 1
+            self.next = vm.Token("NUMBER", int(num))
+            return
+        elif c_atual == '"':
+            string_val = ''
+            self.position += 1
+            while self.position < len(self.source) and self.source[self.position] != '"':
+                string_val += self.source[self.position]
+                self.position += 1
+            if self.position >= len(self.source) or self.source[self.position] != '"':
+                raise Exception("String não fechada")
+            self.position += 1
+            self.next = vm.Token("STRING", string_val)
+            return
+        elif c_atual == '&' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '&':
+            self.next = vm.Token("AND", "&&"); self.position += 2
+        elif c_atual == '|' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '|':
+            self.next = vm.Token("OR", "||"); self.position += 2
+        elif c_atual == '=' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
+            self.next = vm.Token("EQ", "=="); self.position += 2
+        elif c_atual == '!' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
+            self.next = vm.Token("NE", "!="); self.position += 2
+        elif c_atual == '<' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
+            self.next = vm.Token("LE", "<="); self.position += 2
+        elif c_atual == '>' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
+            self.next = vm.Token("GE", ">="); self.position += 2
+        elif c_atual == '<':
+            self.next = vm.Token("LT", "<"); self.position += 1
+        elif c_atual == '>':
+            self.next = vm.Token("GT", ">"); self.position += 1
+        elif c_atual == '=':
+            self.next = vm.Token("ASSIGN", "="); self.position += 1
+        elif c_atual == '+':
+            self.next = vm.Token("PLUS", "+"); self.position += 1
+        elif c_atual == '-':
+            self.next = vm.Token("MINUS", "-"); self.position += 1
+        elif c_atual == '*':
+            self.next = vm.Token("TIMES", "*"); self.position += 1
+        elif c_atual == '/':
+            self.next = vm.Token("DIVIDE", "/"); self.position += 1
+        elif c_atual == '(':
+            self.next = vm.Token("LPAREN", "("); self.position += 1
+        elif c_atual == ')':
+            self.next = vm.Token("RPAREN", ")"); self.position += 1
+        elif c_atual == '{':
+            self.next = vm.Token("LBRACE", "{"); self.position += 1
+        elif c_atual == '}':
+            self.next = vm.Token("RBRACE", "}"); self.position += 1
+        elif c_atual == '[':
+            self.next = vm.Token("LBRACKET", "["); self.position += 1
+        elif c_atual == ']':
+            self.next = vm.Token("RBRACKET", "]"); self.position += 1
+        elif c_atual == ':':
+            self.next = vm.Token("COLON", ":"); self.position += 1
+        elif c_atual == ';':
+            self.next = vm.Token("SEMICOLON", ";"); self.position += 1
+        elif c_atual == ',':
+            self.next = vm.Token("COMMA", ","); self.position += 1
+        elif c_atual == '.':
+            self.next = vm.Token("DOT", "."); self.position += 1
+        else:
+            raise Exception(f"Caractere inválido: {c_atual}")
+
+def best_of(fn, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+def synthetic_source(lines: int) -> str:
+    # programa Level sintético, no estilo de level/test.level, com ~`lines` linhas
+    template = '''enemy_{i}_name: text = "Inimigo {i}";
+enemy_{i}_hp: number = {hp};
+enemy_{i}_damage: number = {dmg};
+
+// encontro {i}: luta até o inimigo ou o jogador cair
+func encounter_{i}(bonus: number): number {{
+    say("Um inimigo aparece! Veja http://level.example/{i}");
+    total: number = 0;
+    until (enemy_{i}_hp > 0 && health > 0) {{
+        attack(enemy_{i}_hp, player_damage + bonus);
+        if (enemy_{i}_hp <= 0) {{
+            say("Inimigo derrotado!");
+        }} else {{
+            /* contra-ataque
+               com dano reduzido */
+            health = health - enemy_{i}_damage * 2 / 3;
+            total = total + 1;
+        }}
+    }}
+    gather("loot_{i}");
+    return total;
+}}
+'''
+    header = '''health: number = 100000;
+player_damage: number = 7;
+inventory: array = ["knife", "rope"];
+'''
+    per_block = template.count("\n")
+    blocks = max(1, (lines - header.count("\n")) // per_block)
+    parts = [header]
+    for i in range(blocks):
+        parts.append(template.format(i=i, hp=10 + i % 50, dmg=1 + i % 7))
+    return "".join(parts)
+
+def token_stream(lexer):
+    tokens = []
+    while True:
+        tokens.append((lexer.next.kind, lexer.next.value))
+        if lexer.next.kind == "EOF":
+            return tokens
+        lexer.selectNext()
+
+def drain(lexer):
+    # consome todos os tokens como o Parser faria
+    while lexer.next.kind != "EOF":
+        lexer.selectNext()
+
+def bench_lexer(args):
+    # o CharLexer precisa do fonte filtrado pelo Prepro; o Lexer trata comentários sozinho
+    source = synthetic_source(args.lines)
+    print(f"fonte sintética: {source.count(chr(10))} linhas, {len(source)} caracteres")
+    char_tokens = token_stream(CharLexer(Prepro.filter(source)))
+    if char_tokens != token_stream(vm.Lexer(source)):
+        raise SystemExit("ERRO: os lexers produziram tokens diferentes")
+    print(f"{len(char_tokens)} tokens idênticos")
+    t_char, _ = best_of(lambda: drain(CharLexer(Prepro.filter(source))), args.repeat)
+    t_regex, _ = best_of(lambda: drain(vm.Lexer(source)), args.repeat)
+    t_tokenize, _ = best_of(lambda: vm.tokenize(source), args.repeat)
+    print(f"Prepro + CharLexer (original): {t_char * 1000:9.1f} ms")
+    print(f"Lexer (regex):                 {t_regex * 1000:9.1f} ms  ({t_char / t_regex:.1f}x)")
+    print(f"  só tokenize():               {t_tokenize * 1000:9.1f} ms  ({t_char / t_tokenize:.1f}x)")
+
+def bench_parser(args):
+    source = synthetic_source(args.lines)
+    print(f"fonte sintética: {source.count(chr(10))} linhas")
+    t_char, _ = best_of(lambda: vm.Parser(CharLexer(Prepro.filter(source))).run(), args.repeat)
+    t_buffer, _ = best_of(lambda: vm.Parser(vm.Lexer(source)).run(), args.repeat)
+    print(f"Parser + CharLexer (salva/restaura): {t_char * 1000:9.1f} ms")
+    print(f"Parser + Lexer (buffer com peek):    {t_buffer * 1000:9.1f} ms  ({t_char / t_buffer:.1f}x)")
+
+def analyze(source):
+    arvore = vm.Parser(vm.Lexer(source)).run()
+    st = vm.Resolver().resolve(arvore)
+    vm.TypeChecker().check(arvore)
+    vm.Optimizer().optimize(arvore, st)
+    return arvore, st
+
+def bench_cache(args):
+    source = synthetic_source(args.lines)
+    print(f"fonte sintética: {source.count(chr(10))} linhas")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = vm.ParseCache(os.path.join(tmp, "bench.level"), source, "optimize")
+        t_cold, (arvore, st) = best_of(lambda: analyze(source), args.repeat)
+        cache.store(arvore, st)
+        t_warm, _ = best_of(cache.load, args.repeat)
+        size = os.path.getsize(cache.path)
+    print(f"análise completa (frio):   {t_cold * 1000:9.1f} ms")
+    print(f"árvore do cache (quente):  {t_warm * 1000:9.1f} ms  ({t_cold / t_warm:.1f}x)  [{size // 1024} KiB]")
+
+def loop_source(iterations: int) -> str:
+    return f'''i: number = 0;
+total: number = 0;
+until (i < {iterations}) {{
+    if (i / 2 * 2 == i) {{
+        total = total + i * 3;
+    }} else {{
+        total = total - 1;
+    }}
+    i = i + 1;
+}}
+say(total);
+'''
+
+def prepare(source, trusted):
+    arvore, _ = analyze(source)
+    if trusted:
+        vm.TypeChecker.trust(arvore)
+    return arvore
+
+def run_tree(arvore):
+    arvore.evaluate(vm.Frame(arvore.frame_size, names=arvore.global_names, output=vm.NullOutput()))
+
+def count_variables(fn):
+    # conta as construções de Variable durante fn()
+    original = vm.Variable.__init__
+    count = 0
+    def counting_init(self, *args, **kwargs):
+        nonlocal count
+        count += 1
+        original(self, *args, **kwargs)
+    vm.Variable.__init__ = counting_init
+    try:
+        fn()
+    finally:
+        vm.Variable.__init__ = original
+    return count
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_values(args):
+    source = loop_source(args.iterations)
+    print(f"laço until com {args.iterations} iterações")
+
+    class DictVariable:
+        # representação anterior, com __dict__, só para comparar o tamanho
+        def __init__(self, value, v_type, shift=None, is_function=False):
+            self.value = value
+            self.type = v_type
+            self.shift = shift
+            self.is_function = is_function
+    boxed = DictVariable(1, "number")
+    print(f"Variable com __dict__: {sys.getsizeof(boxed) + sys.getsizeof(boxed.__dict__)} bytes; "
+          f"com __slots__: {sys.getsizeof(vm.Variable(1, 'number'))} bytes")
+
+    for label, trusted in (("árvore (checado)", False), ("árvore (--trusted)", True)):
+        arvore = prepare(source, trusted)
+        t, _ = best_of(lambda: run_tree(arvore), args.repeat)
+        allocs = count_variables(lambda: run_tree(arvore))
+        peak = peak_memory(lambda: run_tree(arvore))
+        print(f"{label:20} {t * 1000:9.1f} ms  {allocs:9d} Variables "
+              f"({allocs / args.iterations:.2f}/iteração)  pico {peak // 1024} KiB")
+
+def calls_sources(iterations: int):
+    recursive = '''func fib(n: number): number {
+    if (n < 2) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+say(fib(%d));
+''' % fib_argument(iterations)
+    tight = f'''func add(a: number, b: number): number {{
+    return a + b;
+}}
+acc: number = 0;
+k: number = 0;
+until (k < {iterations}) {{
+    acc = add(acc, k);
+    k = k + 1;
+}}
+say(acc);
+'''
+    return (("recursiva (fib)", recursive), ("laço de chamadas", tight))
+
+def fib_argument(calls: int) -> int:
+    # maior n cuja fib(n) recursiva faz no máximo `calls` chamadas
+    n, prev, cur = 1, 1, 1
+    while prev + cur + 1 <= calls:
+        n, prev, cur = n + 1, cur, prev + cur + 1
+    return n
+
+def run_bytecode(arvore, trusted):
+    compiler = vm.Compiler(trusted=trusted)
+    program = compiler.compile_program(arvore)
+    vm.GameVM(compiler).run(program, vm.Frame(arvore.frame_size, names=arvore.global_names, output=vm.NullOutput()))
+
+def bench_calls(args):
+    for label, source in calls_sources(args.iterations):
+        print(label)
+        for mode, trusted in (("checado", False), ("--trusted", True)):
+            arvore = prepare(source, trusted)
+            t_tree, _ = best_of(lambda: run_tree(arvore), args.repeat)
+            t_vm, _ = best_of(lambda: run_bytecode(arvore, trusted), args.repeat)
+            print(f"  {mode:10} árvore {t_tree * 1000:9.1f} ms   bytecode {t_vm * 1000:9.1f} ms")
+
+def narrative_source(iterations: int) -> str:
+    return f'''enemy_hp: number = {iterations};
+inventory: array = ["knife"];
+i: number = 0;
+until (i < {iterations}) {{
+    say("O herói avança pela masmorra");
+    move(1);
+    attack(enemy_hp);
+    if (i / 100 * 100 == i) {{
+        gather("coin");
+    }}
+    i = i + 1;
+}}
+'''
+
+def bench_output(args):
+    source = narrative_source(args.iterations)
+    arvore = prepare(source, True)
+    print(f"{args.iterations} iterações com say/move/attack; saída em {os.devnull}")
+    sinks = (
+        ("terminal (linha a linha)", lambda devnull: vm.Output(devnull)),
+        ("buffered", lambda devnull: vm.BufferedOutput(devnull)),
+        ("null", lambda devnull: vm.NullOutput()),
+    )
+    base = None
+    with open(os.devnull, "w") as devnull:
+        for label, make in sinks:
+            def run():
+                output = make(devnull)
+                arvore.evaluate(vm.Frame(arvore.frame_size, names=arvore.global_names, output=output))
+                output.flush()
+            t, _ = best_of(run, args.repeat)
+            base = base or t
+            print(f"{label:25} {t * 1000:9.1f} ms  ({base / t:.1f}x)")
+
+def growing_source(size: int) -> str:
+    # inventory cresce item a item; `snapshot` força uma cópia no meio do caminho
+    return f'''inventory: array = [];
+i: number = 0;
+until (i < {size}) {{
+    gather("item");
+    if (i == {size // 2}) {{
+        snapshot: array = inventory;
+    }}
+    i = i + 1;
+}}
+say(len(inventory));
+'''
+
+def grid_source(size: int) -> str:
+    # lê linhas inteiras de um array de arrays (antes, cada leitura copiava a linha)
+    return f'''inventory: array = [];
+i: number = 0;
+until (i < {size}) {{
+    gather("x");
+    i = i + 1;
+}}
+grid: array = [inventory, inventory, inventory, inventory];
+total: number = 0;
+j: number = 0;
+until (j < {size}) {{
+    line: array = grid[j - j / 4 * 4];
+    total = total + len(line);
+    j = j + 1;
+}}
+say(total);
+'''
+
+def grid_update_source(side: int, passes: int) -> str:
+    # mapa side x side; cada passada soma um valor em todas as células
+    row = "[" + ", ".join("0" for _ in range(side)) + "]"
+    rows = ",\n    ".join(row for _ in range(side))
+    return f'''grid: array = [
+    {rows}
+];
+p: number = 0;
+until (p < {passes}) {{
+    i: number = 0;
+    until (i < {side}) {{
+        j: number = 0;
+        until (j < {side}) {{
+            grid[i][j] = grid[i][j] + i + j;
+            j = j + 1;
+        }}
+        i = i + 1;
+    }}
+    p = p + 1;
+}}
+say(grid[{side - 1}][{side - 1}]);
+'''
+
+def bench_arrays(args):
+    size = args.iterations
+    cases = (
+        (f"inventory crescendo até {size} itens", growing_source(size)),
+        (f"{size} leituras de linha em um array 4x{size}", grid_source(size)),
+        (f"{size} escritas grid[i][j] = x em um mapa 100x100",
+         grid_update_source(100, max(1, size // 10000))),
+    )
+    for label, source in cases:
+        print(label)
+        for mode, trusted in (("checado", False), ("--trusted", True)):
+            arvore = prepare(source, trusted)
+            t_tree, _ = best_of(lambda: run_tree(arvore), args.repeat)
+            t_vm, _ = best_of(lambda: run_bytecode(arvore, trusted), args.repeat)
+            print(f"  {mode:10} árvore {t_tree * 1000:9.1f} ms   bytecode {t_vm * 1000:9.1f} ms")
+
+def typed_source(size: int, numbers: str, flags: str) -> str:
+    # preenche os arrays com valores calculados (ints distintos, não os do literal)
+    # e depois os percorre somando
+    zeros = ", ".join("0" for _ in range(size))
+    falses = ", ".join("false" for _ in range(size))
+    return f'''values: {numbers} = [{zeros}];
+flags: {flags} = [{falses}];
+i: number = 0;
+until (i < {size}) {{
+    values[i] = i * 7919;
+    flags[i] = i / 3 * 3 == i;
+    i = i + 1;
+}}
+total: number = 0;
+hits: number = 0;
+i = 0;
+until (i < {size}) {{
+    total = total + values[i];
+    if (flags[i]) {{
+        hits = hits + 1;
+    }}
+    i = i + 1;
+}}
+say(total);
+say(hits);
+'''
+
+def storage_bytes(value) -> int:
+    # memória do array e dos elementos que só ele guarda (ints pequenos e bools
+    # são objetos únicos do Python)
+    size = sys.getsizeof(value)
+    if isinstance(value, list):
+        size += sum(sys.getsizeof(e) for e in value if type(e) is int and not -5 <= e <= 256)
+    return size
+
+def bench_typed(args):
+    size = max(1, args.iterations // 4)
+    print(f"number[]/boolean[] contra array (lista) com {size} elementos")
+    for label, numbers, flags in (("array (lista)", "array", "array"),
+                                  ("number[]/boolean[]", "number[]", "boolean[]")):
+        print(label)
+        for mode, trusted in (("checado", False), ("--trusted", True)):
+            arvore = prepare(typed_source(size, numbers, flags), trusted)
+            frame = None
+            def run():
+                nonlocal frame
+                frame = vm.Frame(arvore.frame_size, names=arvore.global_names, output=vm.NullOutput())
+                arvore.evaluate(frame)
+            t_tree, _ = best_of(run, args.repeat)
+            t_vm, _ = best_of(lambda: run_bytecode(arvore, trusted), args.repeat)
+            print(f"  {mode:10} árvore {t_tree * 1000:9.1f} ms   bytecode {t_vm * 1000:9.1f} ms")
+        values = frame.get("values").value
+        flags_value = frame.get("flags").value
+        print(f"  memória: values {storage_bytes(values) // 1024} KiB, flags {storage_bytes(flags_value) // 1024} KiB")
+
+def bulk_sources(size: int, passes: int):
+    # a mesma atualização em massa (somar 1 a todos e totalizar), com laço
+    # interpretado e com as operações em lote
+    header = f'''xs: number[] = [{", ".join(str(i) for i in range(size))}];
+total: number = 0;
+p: number = 0;
+'''
+    loop = header + f'''until (p < {passes}) {{
+    i: number = 0;
+    until (i < {size}) {{
+        xs[i] = xs[i] + 1;
+        i = i + 1;
+    }}
+    i = 0;
+    until (i < {size}) {{
+        total = total + xs[i];
+        i = i + 1;
+    }}
+    p = p + 1;
+}}
+say(total);
+'''
+    bulk = header + f'''until (p < {passes}) {{
+    add(xs, 1);
+    total = total + sum(xs);
+    p = p + 1;
+}}
+say(total);
+'''
+    return (("laço until", loop), ("add/sum", bulk))
+
+def bench_bulk(args):
+    size = 1000
+    passes = max(1, args.iterations // size)
+    print(f"{passes} passadas de add + sum em um number[] de {size} elementos")
+    for label, source in bulk_sources(size, passes):
+        print(label)
+        for mode, trusted in (("checado", False), ("--trusted", True)):
+            arvore = prepare(source, trusted)
+            t_tree, _ = best_of(lambda: run_tree(arvore), args.repeat)
+            t_vm, _ = best_of(lambda: run_bytecode(arvore, trusted), args.repeat)
+            print(f"  {mode:10} árvore {t_tree * 1000:9.1f} ms   bytecode {t_vm * 1000:9.1f} ms")
+
+def horde_sources(size: int, passes: int):
+    # o mesmo bando de monstros como instâncias de entity e como arrays paralelos
+    entity = f'''entity Monster {{
+    hp: number = 1000000;
+    damage: number = 3;
+    alive: boolean = true;
+    func hit(d: number) {{
+        hp = hp - d;
+        if (hp <= 0) {{
+            alive = false;
+        }}
+    }}
+}}
+horde: Monster[] = [{", ".join("Monster()" for _ in range(size))}];
+p: number = 0;
+until (p < {passes}) {{
+    i: number = 0;
+    until (i < {size}) {{
+        horde[i].hit(1);
+        i = i + 1;
+    }}
+    p = p + 1;
+}}
+'''
+    flat = f'''hp: number[] = [{", ".join("1000000" for _ in range(size))}];
+damage: number[] = [{", ".join("3" for _ in range(size))}];
+alive: boolean[] = [{", ".join("true" for _ in range(size))}];
+p: number = 0;
+until (p < {passes}) {{
+    i: number = 0;
+    until (i < {size}) {{
+        hp[i] = hp[i] - 1;
+        if (hp[i] <= 0) {{
+            alive[i] = false;
+        }}
+        i = i + 1;
+    }}
+    p = p + 1;
+}}
+'''
+    return (("entity", entity), ("arrays paralelos", flat))
+
+def bench_entities(args):
+    size = 1000
+    passes = max(1, args.iterations // size)
+    print(f"{passes} passadas de dano em {size} monstros")
+    for label, source in horde_sources(size, passes):
+        print(label)
+        for mode, trusted in (("checado", False), ("--trusted", True)):
+            arvore = prepare(source, trusted)
+            t_tree, _ = best_of(lambda: run_tree(arvore), args.repeat)
+            t_vm, _ = best_of(lambda: run_bytecode(arvore, trusted), args.repeat)
+            print(f"  {mode:10} árvore {t_tree * 1000:9.1f} ms   bytecode {t_vm * 1000:9.1f} ms")
+    # custo de criar instâncias: tempo e memória por monstro
+    arvore = prepare(horde_sources(size, 0)[0][1], True)
+    t_new, _ = best_of(lambda: run_tree(arvore), args.repeat)
+    peak = peak_memory(lambda: run_tree(arvore))
+    print(f"criação: {t_new / size * 1e6:.2f} µs e {peak // size} bytes por instância")
+
+def text_instructions(path) -> int:
+    # instruções da seção .text (sem rótulos, extern e global)
+    count = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("section .data"):
+                break
+            if line.startswith("  ") and not line.startswith(("  extern", "  global")):
+                count += 1
+    return count
+
+def native(asm):
+    # monta e liga com nasm/ld; None se as ferramentas não estão disponíveis
+    if shutil.which("nasm") is None or shutil.which("ld") is None:
+        return None
+    obj = asm[:-4] + ".o"
+    exe = asm[:-4]
+    subprocess.run(["nasm", "-f", "elf32", asm, "-o", obj], check=True)
+    subprocess.run(["ld", "-m", "elf_i386", "-dynamic-linker", "/lib/ld-linux.so.2", obj, "-lc", "-o", exe], check=True)
+    return exe
+
+def bench_asm(args):
+    sources = (("laço aritmético", loop_source(args.iterations)),) + calls_sources(args.iterations)
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, source in sources:
+            print(label)
+            base = None
+            for mode, optimize in (("ingênuo", False), ("peephole", True)):
+                arvore, st = analyze(source)
+                asm = os.path.join(tmp, f"{'opt' if optimize else 'naive'}.asm")
+                t_gen, _ = best_of(lambda: vm.Code.generate(arvore, asm, optimize), args.repeat)
+                count = text_instructions(asm)
+                base = base or count
+                line = f"  {mode:9} {count:6d} instruções ({count / base:.2f})  geração {t_gen * 1000:7.1f} ms"
+                exe = native(asm)
+                if exe is not None:
+                    t_run, _ = best_of(lambda: subprocess.run([exe], stdout=subprocess.DEVNULL), args.repeat)
+                    line += f"  execução {t_run * 1000:7.1f} ms"
+                print(line)
+        if shutil.which("nasm") is None:
+            print("nasm não encontrado: só a contagem de instruções")
+
+def duel_source(turns: int) -> str:
+    # simulação com parâmetros nas globais: o lote varia hp e dano
+    return f'''hp: number = 1000000;
+damage: number = 3;
+turns: number = 0;
+until (turns < {turns} && hp > 0) {{
+    hp = hp - damage;
+    if (hp / 7 * 7 == hp) {{
+        hp = hp + 1;
+    }}
+    turns = turns + 1;
+}}
+say(turns);
+'''
+
+def bench_batch(args):
+    runs = 32
+    tree, st, _ = vm.analyze(duel_source(max(1, args.iterations // runs)), True, ["hp", "damage"])
+    overrides = [{"hp": 1000000 + i, "damage": 1 + i % 5} for i in range(runs)]
+    jobs = 1
+    base = None
+    print(f"{runs} execuções de {args.iterations // runs} turnos ({os.cpu_count()} CPUs)")
+    while True:
+        job = batch.Job(tree, st)
+        t, _ = best_of(lambda: list(batch.execute(job, overrides, jobs)), args.repeat)
+        base = base or t
+        print(f"  {jobs:3d} processo(s) {t * 1000:9.1f} ms  {runs / t:8.1f} execuções/s  aceleração {base / t:.2f}x")
+        if jobs >= (os.cpu_count() or 1):
+            break
+        jobs = min(jobs * 2, os.cpu_count())
+
+def bench_daemon(args):
+    # latência por script curto: processo novo a cada execução contra o cliente
+    # leve do servidor (a partida do Python ainda conta) e a ida e volta pelo socket
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = 20
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, "curto.level")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(synthetic_source(200))
+        path = os.path.join(tmp, "vm.sock")
+        daemon = server.listen(path)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        message = {"cmd": "run", "path": script, "output": "null", "fast_forward": True}
+        client.request(path, message)
+        commands = (
+            ("main.py", [sys.executable, os.path.join(here, "main.py"), script, "--headless", "--no-cache", "--output", "null"]),
+            ("client.py", [sys.executable, "-S", os.path.join(here, "client.py"), script, "--socket", path, "--headless", "--output", "null"]),
+        )
+        for label, command in commands:
+            t, _ = best_of(lambda: [subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for _ in range(runs)], args.repeat)
+            print(f"{label:10} {t / runs * 1000:8.1f} ms por execução")
+        t, _ = best_of(lambda: [client.request(path, message) for _ in range(runs)], args.repeat)
+        print(f"{'socket':10} {t / runs * 1000:8.1f} ms por execução (sem a partida do Python)")
+        daemon.shutdown()
+        daemon.server_close()
+
+BENCHMARKS = {
+    "daemon": bench_daemon,
+    "batch": bench_batch,
+    "entities": bench_entities,
+    "asm": bench_asm,
+    "arrays": bench_arrays,
+    "bulk": bench_bulk,
+    "typed": bench_typed,
+    "output": bench_output,
+    "calls": bench_calls,
+    "values": bench_values,
+    "cache": bench_cache,
+    "lexer": bench_lexer,
+    "parser": bench_parser,
+}
+
+def main():
+    argp = argparse.ArgumentParser(prog="bench.py", description="Benchmarks da GameVM")
+    argp.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    argp.add_argument("--lines", type=int, default=50000, help="tamanho das entradas sintéticas")
+    argp.add_argument("--iterations", type=int, default=200000, help="iterações dos laços")
+    argp.add_argument("--repeat", type=int, default=3, help="repetições (vale o melhor tempo)")
+    args = argp.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+if __name__ == "__main__":
+    main()
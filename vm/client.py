@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Cliente leve do servidor da GameVM (vm/server.py). Só usa a biblioteca padrão:
+# cada execução custa a partida do Python e uma ida e volta pelo socket, sem o
+# import do interpretador nem a análise do programa.
+#   python3 -S vm/client.py arquivo.level [opções]
+#   python3 vm/client.py --stop
+#
+# Protocolo: o cliente envia uma linha JSON com o pedido; o servidor responde com
+# uma linha JSON {"out": texto} para cada linha das ações e termina com
+# {"exit": código, "error": mensagem ou null, "time": tempo virtual, "cpu": s}.
+import os
+import sys
+import json
+import socket
+import argparse
+
+def default_socket() -> str:
+    # LEVEL_SOCKET, ou um socket por usuário no diretório de runtime
+    path = os.environ.get("LEVEL_SOCKET")
+    if path:
+        return path
+    return os.path.join(os.environ.get("XDG_RUNTIME_DIR") or "/tmp", f"level-vm-{os.getuid()}.sock")
+
+def connect(path: str) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        print(f"Servidor da GameVM não encontrado em {path}; inicie com python3 vm/server.py", file=sys.stderr)
+        sys.exit(2)
+    return sock
+
+def request(path: str, message: dict, out=None) -> dict:
+    # envia o pedido e repassa as linhas de saída até a resposta final
+    sock = connect(path)
+    with sock:
+        sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        for raw in sock.makefile("rb"):
+            reply = json.loads(raw)
+            if "out" not in reply:
+                return reply
+            if out is not None:
+                out.write(reply["out"] + "\n")
+                if message.get("output") == "terminal":
+                    out.flush()
+    return {"exit": 1, "error": "Conexão com o servidor encerrada sem resposta"}
+
+def main():
+    argp = argparse.ArgumentParser(prog="client.py", description="Executa um programa Level no servidor da GameVM")
+    argp.add_argument("arquivo", nargs="?", help="arquivo .level")
+    argp.add_argument("--socket", default=default_socket(), help="socket Unix do servidor")
+    argp.add_argument("--stop", action="store_true", help="encerra o servidor")
+    argp.add_argument("--engine", choices=("tree", "bytecode"), default="tree")
+    argp.add_argument("--trusted", action="store_true")
+    argp.add_argument("--no-optimize", action="store_true")
+    argp.add_argument("--output", choices=("terminal", "buffered", "null"))
+    argp.add_argument("--fast-forward", action="store_true")
+    argp.add_argument("--headless", action="store_true")
+    args = argp.parse_args()
+    if args.stop:
+        request(args.socket, {"cmd": "stop"})
+        return
+    if args.arquivo is None:
+        argp.error("informe o arquivo .level")
+    virtual = args.fast_forward or args.headless
+    if args.output is None:
+        args.output = "buffered" if args.headless else "terminal"
+    reply = request(args.socket, {
+        "cmd": "run",
+        "path": os.path.abspath(args.arquivo),
+        "engine": args.engine,
+        "trusted": args.trusted,
+        "optimize": not args.no_optimize,
+        "output": args.output,
+        "fast_forward": virtual,
+    }, sys.stdout)
+    sys.stdout.flush()
+    if reply.get("error"):
+        print(reply["error"])
+    if "time" in reply:
+        # como em main.py: ao fim, também quando há erro
+        kind = "virtual" if virtual else "de jogo"
+        print(f"Tempo {kind}: {reply['time']} s | CPU: {reply['cpu']:.3f} s", file=sys.stderr)
+    if reply.get("error"):
+        sys.exit(reply.get("exit", 1))
+
+if __name__ == "__main__":
+    main()
@@ -1,125 +1,722 @@
 #!/usr/bin/env python3
 import sys
 import re
+import argparse
+import operator
+import hashlib
+import pickle
 import os
 import time
+import array
+import itertools
+import threading
+
+class CodegenUnsupported(Exception):
+    # o programa usa algo que o backend NASM ainda não traduz (arrays, ações
+    # além de say...): a execução vale, só o .asm não é gerado
+    pass
 
 class Code:
-    instructions = []
-    @staticmethod
-    def append(code: str) -> None:
-        Code.instructions.append(code)
+    # Um gerador por tradução: as instruções vão direto para o .asm (em buffer) à
+    # medida que a árvore é gerada (Node.generate recebe o gerador); a seção
+    # .data, que depende do programa inteiro, fecha o arquivo. A escrita é feita
+    # em ARQUIVO.tmp e só substitui o .asm ao fim (ver finish). Nada fica na
+    # classe nem na árvore: traduções em threads diferentes não se misturam.
+    buffering = 1 << 16
+
+    def __init__(self, filename: str, optimize: bool = True):
+        self.path = filename
+        self.file = None
+        # com optimize, as últimas instruções passam por uma janela antes de ir
+        # para o arquivo (ver peephole) e BinOp guarda temporários em registradores
+        self.optimize = optimize
+        self.window = []
+        self.registers = list(X86_TEMPORARIES)
+        # linhas da seção .data: textos literais do programa
+        self.data = []
+        # FuncDecs em geração, da mais externa à atual (vazio no programa principal)
+        self.functions = []
+        # globais (quadro do programa principal) ficam em memória estática, visíveis
+        # de qualquer função; locais ficam no quadro da função, abaixo de ebp
+        self.global_slots = 0
+
+    def begin(self) -> None:
+        self.file = open(self.path + ".tmp", "w", encoding="utf-8", buffering=self.buffering)
+        self.file.write("section .text\n"
+                        "  extern printf\n"
+                        "  extern scanf\n"
+                        "  extern fflush\n"
+                        "  global _start\n"
+                        "\n"
+                        "_start:\n"
+                        "  push ebp\n"
+                        "  mov ebp, esp\n"
+                        "\n")
+
+    def append(self, code: str) -> None:
+        if not self.optimize:
+            self.file.write(code)
+            self.file.write("\n")
+            return
+        window = self.window
+        if window and not code.endswith(":") and unconditional(window[-1]):
+            # depois de jmp/ret, só um rótulo volta a ser alcançável
+            return
+        window.append(code)
+        while peephole(window):
+            pass
+        while len(window) > PEEPHOLE_WINDOW:
+            self.file.write(window.pop(0))
+            self.file.write("\n")
+
+    def flush(self) -> None:
+        for code in self.window:
+            self.file.write(code)
+            self.file.write("\n")
+        self.window = []
+
+    def string(self, label: str, text: str) -> None:
+        # terminado em 0; quebras de linha e afins vão como bytes, fora das aspas
+        if text.isprintable() and '"' not in text:
+            self.data.append(f"  {label}: db \"{text}\", 0")
+        else:
+            self.data.append(f"  {label}: db {''.join(f'{b}, ' for b in text.encode('utf-8'))}0")
+
+    def address(self, ident) -> str:
+        level = len(self.functions) - ident.depth
+        if level == 0:
+            self.global_slots = max(self.global_slots, ident.slot + 1)
+            return f"dword [level_globals + {ident.slot * 4}]"
+        if ident.depth == 0:
+            return f"dword [ebp - {(ident.slot + 1) * 4}]"
+        raise CodegenUnsupported(f"[Codegen] Variável {ident.name} de uma função externa não suportada")
+
+    def finish(self) -> None:
+        self.flush()
+        file = self.file
+        file.write("level_end:\n"
+                   "  xor ebx, ebx\n"
+                   "level_exit:\n"
+                   # printf guarda a saída em buffer; sem o fflush ela se perde no int 0x80
+                   "  push ebx\n"
+                   "  push 0\n"
+                   "  call fflush\n"
+                   "  add esp, 4\n"
+                   "  pop ebx\n"
+                   "  mov esp, ebp\n"
+                   "  pop ebp\n"
+                   "  mov eax, 1\n"
+                   "  int 0x80\n"
+                   "\n"
+                   "level_div_zero:\n"
+                   "  push level_div_zero_msg\n"
+                   "  push format_str\n"
+                   "  call printf\n"
+                   "  mov ebx, 1\n"
+                   "  jmp level_exit\n"
+                   "\n"
+                   "section .data\n"
+                   "  format_out: db \"%d\", 10, 0\n"
+                   "  format_in: db \"%d\", 0\n"
+                   "  format_str: db \"%s\", 10, 0\n"
+                   "  scan_int: dd 0\n"
+                   "  level_true: db \"True\", 0\n"
+                   "  level_false: db \"False\", 0\n"
+                   "  level_div_zero_msg: db \"[Semantic] Divisão por zero\", 0\n")
+        file.write(f"  level_globals: times {max(1, self.global_slots)} dd 0\n")
+        for line in self.data:
+            file.write(line + "\n")
+        file.close()
+        self.file = None
+        os.replace(self.path + ".tmp", self.path)
+
+    def discard(self) -> None:
+        # geração interrompida: o .asm anterior (se houver) fica como estava
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.remove(self.path + ".tmp")
+
     @staticmethod
-    def dump(filename: str) -> None:
-        with open(filename, 'w') as file:
-            file.write("section .data\n")
-            file.write("  format_out: db \"%d\", 10, 0\n")
-            file.write("  format_in: db \"%d\", 0\n")
-            file.write("  scan_int: dd 0\n")
-            file.write("\n")
-            file.write("section .text\n")
-            file.write("  extern printf\n")
-            file.write("  extern scanf\n")
-            file.write("  global _start\n")
-            file.write("\n")
-            file.write("_start:\n")
-            file.write("  push ebp\n")
-            file.write("  mov ebp, esp\n")
-            file.write("\n")
-            file.write("\n".join(Code.instructions))
-            file.write("\n")
-            file.write("  mov esp, ebp\n")
-            file.write("  pop ebp\n")
-            file.write("  mov eax, 1\n")
-            file.write("  xor ebx, ebx\n")
-            file.write("  int 0x80\n")
+    def generate(tree, filename: str, optimize: bool = True) -> None:
+        asm = Code(filename, optimize)
+        asm.begin()
+        try:
+            tree.generate(asm)
+        except BaseException:
+            asm.discard()
+            raise
+        asm.finish()
+
+# registradores para temporários de expressões; nenhuma função gerada os usa
+# através de uma chamada, então não precisam ser salvos (ver BinOp.generate)
+X86_TEMPORARIES = ("edi", "esi", "ebx")
+X86_REGISTERS = frozenset(("eax", "ebx", "ecx", "edx", "esi", "edi", "ebp", "esp", "al"))
+# salto tomado quando a comparação do setcc é falsa
+X86_JUMP_UNLESS = {"sete": "jne", "setne": "je", "setl": "jge", "setg": "jle", "setle": "jg", "setge": "jl"}
+PEEPHOLE_WINDOW = 6
+
+def instruction(code: str):
+    # "  mov eax, 5" -> ("mov", "eax", "5"); rótulos -> (":", nome)
+    code = code.strip()
+    if code.endswith(":"):
+        return (":", code[:-1])
+    op, _, rest = code.partition(" ")
+    if not rest:
+        return (op,)
+    return (op, *rest.split(", "))
+
+def unconditional(code: str) -> bool:
+    op = code.split(None, 1)[0]
+    return op == "ret" or op == "jmp"
+
+def is_immediate(operand: str) -> bool:
+    return operand.lstrip("-").isdigit()
+
+def registers(operand: str) -> set:
+    # registradores lidos pelo operando: "dword [esp+4]" -> {"esp"}
+    return set(re.findall(r"[a-z]+", operand)) & X86_REGISTERS
+
+def peephole(window: list) -> bool:
+    # Reescreve o fim da janela e devolve True se algo mudou. As regras contam
+    # com o padrão do gerador: toda expressão começa escrevendo eax, ecx só
+    # carrega o operando direito de BinOp e, depois do je de If/Until, eax
+    # não é mais lido.
+    tail = [instruction(code) for code in window[-5:]]
+    last = tail[-1]
+    if len(tail) >= 2:
+        prev = tail[-2]
+        # mov eax, X / push eax -> push X
+        if last == ("push", "eax") and prev[0] == "mov" and prev[1] == "eax" and prev[2] not in X86_REGISTERS:
+            window[-2:] = [f"  push {prev[2]}"]
+            return True
+        # mov eax, X / mov ecx, eax -> mov ecx, X (idem para os temporários)
+        if (last[0] == "mov" and last[2:] == ("eax",) and (last[1] == "ecx" or last[1] in X86_TEMPORARIES)
+                and prev[0] == "mov" and prev[1] == "eax" and prev[2] not in X86_REGISTERS):
+            window[-2:] = [f"  mov {last[1]}, {prev[2]}"]
+            return True
+        # mov ecx, X / add eax, ecx -> add eax, X (idiv não aceita imediato)
+        if (len(last) == 3 and last[0] in ("add", "sub", "imul", "and", "or", "cmp") and last[1:] == ("eax", "ecx")
+                and prev[0] == "mov" and prev[1] == "ecx" and prev[2] not in X86_REGISTERS):
+            window[-2:] = [f"  {last[0]} eax, {prev[2]}"]
+            return True
+        # mov M, eax / mov eax, M -> mov M, eax
+        if last[0] == "mov" and prev[0] == "mov" and len(last) == 3 and last[1] == "eax" and prev[1:] == (last[2], "eax"):
+            del window[-1]
+            return True
+        # mov eax, [M] / cmp eax, 0 -> cmp [M], 0
+        if last == ("cmp", "eax", "0") and prev[0] == "mov" and prev[1] == "eax" and prev[2].startswith("dword ["):
+            window[-2:] = [f"  cmp {prev[2]}, 0"]
+            return True
+        # push X / pop eax -> mov eax, X
+        if last == ("pop", "eax") and prev[0] == "push":
+            window[-2:] = [] if prev[1] == "eax" else [f"  mov eax, {prev[1]}"]
+            return True
+        # jmp L / L: -> L:
+        if last[0] == ":" and prev == ("jmp", last[1]):
+            del window[-2]
+            return True
+    if len(tail) >= 3:
+        first, prev = tail[-3], tail[-2]
+        # push P / mov ecx, X / pop eax -> mov eax, P / mov ecx, X. X não pode ler
+        # eax (que agora já recebeu P) nem esp (que não desce mais pelo push); P é
+        # lido antes de ecx mudar, como no original
+        if (last == ("pop", "eax") and first[0] == "push" and prev[0] == "mov" and prev[1] == "ecx"
+                and not registers(prev[2]) & {"eax", "esp"}):
+            window[-3:] = [window[-2]] if first[1] == "eax" else [f"  mov eax, {first[1]}", window[-2]]
+            return True
+        # divisor constante diferente de zero dispensa a checagem
+        if (last == ("je", "level_div_zero") and prev == ("cmp", "ecx", "0") and first[0] == "mov"
+                and first[1] == "ecx" and is_immediate(first[2]) and int(first[2]) != 0):
+            del window[-2:]
+            return True
+        # condição constante: o salto sempre ou nunca acontece
+        if (last[0] == "je" and prev == ("cmp", "eax", "0") and first[0] == "mov" and first[1] == "eax"
+                and is_immediate(first[2])):
+            window[-3:] = [f"  jmp {last[1]}"] if int(first[2]) == 0 else []
+            return True
+    if len(tail) == 5:
+        # cmp / setcc / movzx / cmp eax, 0 / je L -> cmp / jncc L
+        cmp, setcc, movzx, test = tail[:4]
+        if (last[0] == "je" and test == ("cmp", "eax", "0") and movzx == ("movzx", "eax", "al")
+                and setcc[0] in X86_JUMP_UNLESS and cmp[0] == "cmp"):
+            window[-4:] = [f"  {X86_JUMP_UNLESS[setcc[0]]} {last[1]}"]
+            return True
+    return False
 
 class Token():
-    def __init__(self, kind, value):
+    __slots__ = ("kind", "value", "line", "column")
+    def __init__(self, kind, value, line=0, column=0):
         self.kind = kind
         self.value = value
+        self.line = line
+        self.column = column
+
+class Array(list):
+    # Valor de array da Level, compartilhado por referência. shared vira True quando
+    # o valor é ligado a mais um lugar (variável, parâmetro, elemento de outro
+    # array); quem vai alterá-lo no lugar copia antes (ver owned). borrowed conta
+    # as chamadas em curso que o receberam como argumento (ver lend).
+    shared = False
+    borrowed = 0
+    # tipo do armazenamento e dos elementos: o array sem tipo decide elemento a
+    # elemento; text[] e arrays aninhados (T[][]) guardam os seus na instância
+    type = "array"
+    element = None
+    def copy(self):
+        copy = Array(self)
+        copy.type = self.type
+        copy.element = self.element
+        return copy
+
+class NumberArray(array.array):
+    # number[]: inteiros de 64 bits contíguos (array('q')), 8 bytes por elemento
+    # contra o ponteiro e o int Python de cada elemento de uma lista
+    shared = False
+    borrowed = 0
+    type = "number[]"
+    element = "number"
+    def copy(self):
+        return NumberArray("q", self)
+    def __repr__(self):
+        return repr(self.tolist())
+    __str__ = __repr__
+
+class BoolArray(bytearray):
+    # boolean[]: um byte por elemento; quem lê converte 0/1 de volta para bool
+    shared = False
+    borrowed = 0
+    type = "boolean[]"
+    element = "boolean"
+    def copy(self):
+        return BoolArray(self)
+    def __repr__(self):
+        return repr([b == 1 for b in self])
+    __str__ = __repr__
+
+ARRAY_CLASSES = frozenset((Array, NumberArray, BoolArray))
+
+def is_array_type(v_type) -> bool:
+    return v_type == "array" or v_type.endswith("[]")
+
+def compatible(expected, actual) -> bool:
+    # checagem de execução: arrays cabem em qualquer tipo de array, e coerce
+    # confere os elementos; o TypeChecker é mais estrito (ver assignable)
+    return expected == actual or (is_array_type(expected) and is_array_type(actual))
+
+def coerce(value, v_type):
+    # liga um array a um lugar de tipo v_type: um array sem tipo é convertido
+    # para o armazenamento de T[], conferindo cada elemento; os demais passam
+    if v_type == "array" or value.type == v_type:
+        return value
+    if value.type != "array":
+        raise Exception(f"[Semantic] Tipo incompatível para {v_type}: obtido {value.type}")
+    element = v_type[:-2]
+    if is_array_type(element):
+        for e in value:
+            if e.__class__ not in ARRAY_CLASSES:
+                raise Exception(f"[Semantic] Tipo incompatível para {v_type}: elemento {type_of(e)}")
+        # cada linha fica também no array original: é um segundo lugar, como em
+        # ArrayLiteral, e a primeira escrita por um dos dois a copia
+        converted = Array(share(coerce(e, element)) for e in value)
+    else:
+        for e in value:
+            if type_of(e) != element:
+                raise Exception(f"[Semantic] Tipo incompatível para {v_type}: elemento {type_of(e)}")
+        if element == "number":
+            try:
+                return NumberArray("q", value)
+            except OverflowError:
+                raise Exception("[Semantic] Número fora do intervalo de number[]")
+        if element == "boolean":
+            return BoolArray(value)
+        converted = Array(value)
+    converted.type = v_type
+    converted.element = element
+    return converted
+
+def share(value):
+    if value.__class__ in ARRAY_CLASSES:
+        value.shared = True
+    return value
+
+def lend(value, frame):
+    # argumento de uma chamada: o parâmetro é um segundo nome só enquanto ela
+    # dura. Escritas pelo parâmetro ou pelo dono no meio da chamada copiam; na
+    # volta (release) o dono torna a escrever no lugar. Um parâmetro guardado em
+    # outro lugar passa por share e fica compartilhado de vez.
+    if value.__class__ in ARRAY_CLASSES:
+        value.borrowed += 1
+        if frame.loans is None:
+            frame.loans = [value]
+        else:
+            frame.loans.append(value)
+    return value
+
+def release(frame):
+    # fim da chamada: devolve os arrays emprestados aos parâmetros do quadro
+    for value in frame.loans:
+        value.borrowed -= 1
+    frame.loans = None
 
 class Variable:
+    # Só guarda o valor: quem liga um array a um nome (declaração, atribuição,
+    # parâmetro, campo) o marca com share(). Caixas temporárias (box, resultados)
+    # não contam como um segundo nome e não forçam cópia na próxima escrita.
+    __slots__ = ("value", "type", "shift", "is_function")
     def __init__(self, value, v_type, shift=None, is_function=False):
         self.value = value
         self.type = v_type
         self.shift = shift
         self.is_function = is_function
 
+    @property
+    def slot(self) -> int:
+        # posição no quadro da função, derivada do deslocamento na pilha
+        return self.shift // 4 - 1
+
+def owned(var: Variable):
+    # cópia na escrita: devolve o array de var pronto para ser alterado no lugar
+    array = var.value
+    if array.shared or array.borrowed:
+        array = var.value = array.copy()
+    return array
+
+def store_element(array, idx, value, name):
+    # escrita de um elemento já dentro do intervalo, comum às duas engines: o
+    # array sem tipo mantém o tipo do elemento antigo, o tipado o seu T
+    expected = array.element
+    if expected is None:
+        expected = type_of(array[idx])
+    actual = type_of(value)
+    if actual != expected:
+        if not compatible(expected, actual):
+            raise Exception(f"[Semantic] Tipo incompatível para elemento de {name}: esperado {expected}, obtido {actual}")
+        value = coerce(value, expected)
+    try:
+        array[idx] = value
+    except OverflowError:
+        raise Exception("[Semantic] Número fora do intervalo de number[]")
+
+def box(elem) -> Variable:
+    # empacota um elemento cru de array no Variable do seu tipo
+    t = type_of(elem)
+    if t == "boolean":
+        return boolean(elem)
+    if t == "void" or t == "func":
+        # fallback: stringify
+        t = "text"
+    return Variable(elem, t)
+
+# Resultados imutáveis compartilhados: comparações, literais booleanos e chamadas
+# void não alocam um Variable novo. Nunca são guardados em slots (VarDec, parâmetros
+# e Frame.set copiam o valor), então ninguém os altera.
+TRUE = Variable(True, "boolean")
+FALSE = Variable(False, "boolean")
+VOID = Variable(None, "void")
+
+def boolean(value) -> Variable:
+    return TRUE if value else FALSE
+
+def default_value(v_type: str):
+    if v_type == "number":
+        return 0
+    elif v_type == "text":
+        return ""
+    elif v_type == "boolean":
+        return False
+    elif v_type == "array":
+        return Array()
+    elif v_type.endswith("[]"):
+        return coerce(Array(), v_type)
+    elif v_type == "void":
+        return None
+    # entity: sem valor padrão, a declaração sempre tem inicializador (o
+    # TypeChecker já recusou nomes que não são entities)
+    return None
+
 class SymbolTable:
-    def __init__(self, parent=None):
+    # Tabela de símbolos de compilação: o Resolver a usa para dar a cada declaração
+    # um deslocamento (shift) dentro do quadro da função; blocos aninhados continuam
+    # o mesmo quadro (same_frame=True) e reaproveitam os slots ao sair do escopo.
+    def __init__(self, parent=None, same_frame=False):
         self._table = {}
-        self.current_shift = 4
         self.parent = parent
+        self.same_frame = same_frame
+        if same_frame:
+            self.frame = parent.frame
+            self.current_shift = parent.current_shift
+        else:
+            self.frame = self
+            self.current_shift = 4
+            self.frame_shift = 4
 
     def create_variable(self, name: str, v_type: str, value=None, is_function=False):
         if name in self._table:
             raise Exception(f"[Semantic] Variável já declarada: {name}")
 
         if value is None and not is_function:
-            if v_type == "number":
-                value = 0
-            elif v_type == "text":
-                value = ""
-            elif v_type == "boolean":
-                value = False
-            elif v_type == "array":
-                value = []
-            elif v_type == "void":
-                value = None
-            else:
-                raise Exception(f"[Semantic] Tipo desconhecido na declaração: {v_type}")
+            value = default_value(v_type)
 
         shift = self.current_shift
         self.current_shift += 4
-        self._table[name] = Variable(value, v_type, shift, is_function=is_function)
+        if self.current_shift > self.frame.frame_shift:
+            self.frame.frame_shift = self.current_shift
+        var = Variable(value, v_type, shift, is_function=is_function)
+        self._table[name] = var
+        return var
 
-    def set(self, name: str, value: Variable):
+    def frame_size(self) -> int:
+        return self.frame.frame_shift // 4 - 1
+
+    def resolve(self, name: str):
+        # retorna (depth, Variable): depth conta quantos quadros de função subir
         tbl = self
+        depth = 0
         while tbl is not None:
             if name in tbl._table:
-                target = tbl._table[name]
-                if target.is_function:
-                    raise Exception(f"[Semantic] Não é possível atribuir a função {name}")
-                if target.type != value.type:
-                    raise Exception(f"[Semantic] Tipo incompatível para variável {name}: esperado {target.type}, obtido {value.type}")
-                target.value = value.value
-                return
+                return depth, tbl._table[name]
+            if not tbl.same_frame:
+                depth += 1
             tbl = tbl.parent
         raise Exception(f"[Semantic] Variável não declarada: {name}")
 
+class Output:
+    # Destino do texto das ações say/move/attack/gather/use. Este escreve cada
+    # linha assim que ela é produzida, como print(); sem stream, usa o sys.stdout
+    # do momento da escrita.
+    def __init__(self, stream=None):
+        self._stream = stream
+
+    @property
+    def stream(self):
+        return self._stream if self._stream is not None else sys.stdout
+
+    def line(self, text: str):
+        self.stream.write(text + "\n")
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+        if self._stream is not None and self._stream not in (sys.stdout, sys.stderr):
+            self._stream.close()
+
+class BufferedOutput(Output):
+    # Junta as linhas e escreve de uma vez em flush(): chamado por wait, ao fim do
+    # programa e quando o buffer passa de `limit` linhas.
+    def __init__(self, stream=None, limit=4096):
+        super().__init__(stream)
+        self.lines = []
+        self.limit = limit
+
+    def line(self, text: str):
+        self.lines.append(text)
+        if len(self.lines) >= self.limit:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.lines.append("")
+            self.stream.write("\n".join(self.lines))
+            self.lines = []
+        self.stream.flush()
+
+class NullOutput(Output):
+    # descarta tudo: simulações e benchmarks sem custo de E/S
+    def line(self, text: str):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class Clock:
+    # Relógio do wait. Em tempo real dorme de verdade, mantendo o ritmo do jogo;
+    # elapsed acumula o tempo de jogo decorrido.
+
+    def __init__(self):
+        self.elapsed = 0
+
+    def wait(self, seconds):
+        time.sleep(seconds)
+        self.elapsed += seconds
+
+class VirtualClock(Clock):
+    # --fast-forward/--headless: wait só avança o tempo simulado
+
+    def wait(self, seconds):
+        if seconds < 0:
+            raise ValueError("sleep length must be non-negative")
+        self.elapsed += seconds
+
+def make_output(mode: str = "terminal", path: str = None) -> Output:
+    if mode == "null":
+        return NullOutput()
+    stream = open(path, "w", encoding="utf-8") if path else None
+    if mode == "buffered" or path:
+        return BufferedOutput(stream)
+    return Output(stream)
+
+class Frame:
+    # Quadro de execução: slots indexados pelo Resolver; parent é o quadro onde a
+    # função foi declarada. Só o quadro global guarda nomes (usados por gather/use),
+    # o Output/Clock das ações e os valores iniciais de globais vindos de fora.
+    __slots__ = ("slots", "parent", "names", "result", "output", "clock", "inputs", "loans", "pools")
+    def __init__(self, size, parent=None, names=None, output=None, clock=None, inputs=None):
+        self.slots = [None] * size
+        self.parent = parent
+        self.names = names
+        # valor do return executado neste quadro (ver RETURN)
+        self.result = None
+        # arrays recebidos como argumento, devolvidos na volta da chamada (ver lend)
+        self.loans = None
+        if parent is None:
+            if output is None:
+                output = Output()
+            if clock is None:
+                clock = Clock()
+            # só o quadro global tem inputs (ver GlobalInput) e os quadros de
+            # chamadas encerradas por FuncDec, reaproveitados pela chamada confiável:
+            # um estoque por execução, nunca compartilhado entre threads
+            self.inputs = inputs
+            self.pools = {}
+        self.output = output
+        self.clock = clock
+
+    def root(self):
+        frame = self
+        while frame.parent is not None:
+            frame = frame.parent
+        return frame
+
+    def up(self, depth):
+        frame = self
+        while depth:
+            frame = frame.parent
+            depth -= 1
+        return frame
+
+    def load(self, depth, slot, name) -> Variable:
+        var = self.up(depth).slots[slot]
+        if var is None:
+            raise Exception(f"[Semantic] Variável não declarada: {name}")
+        return var
+
+    def find(self, name: str):
+        # global pelo nome, ou None se não foi declarada (gather/use)
+        frame = self.root()
+        slot = frame.names.get(name) if frame.names else None
+        return None if slot is None else frame.slots[slot]
+
     def get(self, name: str) -> Variable:
-        tbl = self
-        while tbl is not None:
-            if name in tbl._table:
-                return tbl._table[name]
-            tbl = tbl.parent
-        raise Exception(f"[Semantic] Variável não declarada: {name}")
+        var = self.find(name)
+        if var is None:
+            raise Exception(f"[Semantic] Variável não declarada: {name}")
+        return var
+
+    def set(self, name: str, value: Variable):
+        target = self.get(name)
+        if target.is_function:
+            raise Exception(f"[Semantic] Não é possível atribuir a função {name}")
+        if target.type != value.type:
+            raise Exception(f"[Semantic] Tipo incompatível para variável {name}: esperado {target.type}, obtido {value.type}")
+        target.value = share(value.value)
+
+class Instance(Frame):
+    # Instância de uma entity: o próprio quadro dos métodos. Os campos ocupam os
+    # slots que o Resolver deu a eles e os métodos já estão nos seus (os mesmos
+    # Variables para todas as instâncias, ver EntityDec.template); parent é o
+    # quadro onde a entity foi declarada.
+    __slots__ = ("entity",)
+    def __init__(self, entity, parent):
+        self.slots = list(entity.template)
+        self.parent = parent
+        self.names = None
+        self.result = None
+        self.output = None
+        self.clock = None
+        self.entity = entity
+
+    def field(self, name: str) -> Variable:
+        slot = self.entity.field_slots.get(name)
+        if slot is None:
+            raise Exception(f"[Semantic] Entidade {self.entity.name} não tem campo {name}")
+        return self.slots[slot]
+
+    def __str__(self):
+        fields = ", ".join(f"{name}={self.slots[slot].value}" for name, slot in self.entity.field_slots.items())
+        return f"{self.entity.name}({fields})"
+    __repr__ = __str__
+
+def instance_of(value, name: str) -> Instance:
+    if value.__class__ is not Instance:
+        raise Exception(f"[Semantic] Acesso a membro {name} de um valor que não é entidade")
+    return value
 
 class Node():
-    id_counter = 0
+    # next() de um itertools.count é atômico: árvores construídas em threads
+    # diferentes não repetem ids (usados em rótulos do .asm e pelo Compiler). É o
+    # único estado do módulo compartilhado entre análises, e só anda para frente.
+    ids = itertools.count(1)
+    ids_lock = threading.Lock()
     @staticmethod
     def newId():
-        Node.id_counter += 1
-        return Node.id_counter
+        return next(Node.ids)
+    @staticmethod
+    def reserve(last_id: int) -> None:
+        # os próximos ids ficam depois de last_id (árvore lida do cache); com o lock,
+        # dois loads simultâneos não fazem o contador voltar
+        with Node.ids_lock:
+            if next(Node.ids) <= last_id:
+                Node.ids = itertools.count(last_id + 1)
     def __init__(self, value):
         self.value = value
         self.children = []
         self.id = Node.newId()
-    def evaluate(self, st): pass
-    def generate(self, st): pass
+        # preenchidos pelo TypeChecker
+        self.static_type = None
+        self.static_ok = False
+    def evaluate(self, frame): pass
+    def evaluate_raw(self, frame):
+        # valor Python sem o Variable; nós com tipo estático conhecido evitam a caixa
+        return self.evaluate(frame).value
+    def generate(self, asm):
+        # backend NASM (x86, 32 bits): cada expressão deixa o valor em eax
+        raise CodegenUnsupported(f"[Codegen] {type(self).__name__} não suportado na geração de código")
 
-class ReturnException(Exception):
-    def __init__(self, var: Variable):
-        self.var = var
+# Sinal devolvido por evaluate quando um return foi executado: Block, If e Until
+# repassam-no até a chamada, que lê o valor em frame.result. Comandos comuns
+# devolvem None (ou um Variable, no caso de chamadas usadas como comando).
+RETURN = object()
+
+def level_div(left, right):
+    if right == 0:
+        raise Exception("[Semantic] Divisão por zero")
+    return left // right
+
+BINOP_FUNCS = {
+    "+": operator.add, "-": operator.sub, "*": operator.mul, "/": level_div,
+    "==": operator.eq, "!=": operator.ne, "<": operator.lt, ">": operator.gt,
+    "<=": operator.le, ">=": operator.ge, "&&": operator.and_, "||": operator.or_,
+}
+
+X86_ARITHMETIC = {"+": "add", "-": "sub", "*": "imul", "&&": "and", "||": "or"}
+X86_SETCC = {"==": "sete", "!=": "setne", "<": "setl", ">": "setg", "<=": "setle", ">=": "setge"}
+
+def has_call(node) -> bool:
+    return isinstance(node, FuncCall) or any(has_call(c) for c in node.children)
 
 class BinOp(Node):
     def __init__(self, value, left, right):
         super().__init__(value)
         self.children = [left, right]
-    def evaluate(self, st):
-        left_var = self.children[0].evaluate(st)
-        right_var = self.children[1].evaluate(st)
+    def evaluate(self, frame):
+        left_var = self.children[0].evaluate(frame)
+        right_var = self.children[1].evaluate(frame)
         if not isinstance(left_var, Variable) or not isinstance(right_var, Variable):
             raise Exception("[Semantic] Operandos inválidos")
         if self.value in ("+", "-", "*", "/"):
@@ -139,34 +736,82 @@ class BinOp(Node):
             if left_var.type != right_var.type:
                 raise Exception(f"[Semantic] Operação {self.value} requer tipos iguais")
             if self.value == "==":
-                return Variable(left_var.value == right_var.value, "boolean")
+                return boolean(left_var.value == right_var.value)
             elif self.value == "!=":
-                return Variable(left_var.value != right_var.value, "boolean")
+                return boolean(left_var.value != right_var.value)
             elif self.value == "<":
-                return Variable(left_var.value < right_var.value, "boolean")
+                return boolean(left_var.value < right_var.value)
             elif self.value == ">":
-                return Variable(left_var.value > right_var.value, "boolean")
+                return boolean(left_var.value > right_var.value)
             elif self.value == "<=":
-                return Variable(left_var.value <= right_var.value, "boolean")
+                return boolean(left_var.value <= right_var.value)
             elif self.value == ">=":
-                return Variable(left_var.value >= right_var.value, "boolean")
+                return boolean(left_var.value >= right_var.value)
         elif self.value == "&&":
             if left_var.type != "boolean" or right_var.type != "boolean":
                 raise Exception(f"[Semantic] Operação AND requer booleanos")
-            return Variable(left_var.value and right_var.value, "boolean")
+            return boolean(left_var.value and right_var.value)
         elif self.value == "||":
             if left_var.type != "boolean" or right_var.type != "boolean":
                 raise Exception(f"[Semantic] Operação OR requer booleanos")
-            return Variable(left_var.value or right_var.value, "boolean")
+            return boolean(left_var.value or right_var.value)
         else:
             raise Exception(f"[Semantic] Operador binário desconhecido: {self.value}")
+    def evaluate_trusted(self, frame):
+        value = self.evaluate_raw(frame)
+        if self.static_type == "boolean":
+            return TRUE if value else FALSE
+        return Variable(value, "number")
+    def evaluate_raw_trusted(self, frame):
+        # tipos já provados pelo TypeChecker: só resta a checagem de divisão por zero
+        return BINOP_FUNCS[self.value](self.children[0].evaluate_raw(frame), self.children[1].evaluate_raw(frame))
+    def generate(self, asm):
+        if self.children[0].static_type not in ("number", "boolean"):
+            raise CodegenUnsupported(f"[Codegen] Operação {self.value} com {self.children[0].static_type} não suportada")
+        # esquerda antes da direita, como na execução; o valor da esquerda espera
+        # num registrador livre, ou na pilha se a direita chama uma função
+        # (operandos simples à direita ficam para o peephole)
+        right = self.children[1]
+        self.children[0].generate(asm)
+        register = None
+        if asm.optimize and right.children and asm.registers and not has_call(right):
+            register = asm.registers.pop()
+            asm.append(f"  mov {register}, eax")
+        else:
+            asm.append("  push eax")
+        right.generate(asm)
+        asm.append("  mov ecx, eax")
+        if register is None:
+            asm.append("  pop eax")
+        else:
+            asm.append(f"  mov eax, {register}")
+            asm.registers.append(register)
+        op = self.value
+        if op in X86_ARITHMETIC:
+            asm.append(f"  {X86_ARITHMETIC[op]} eax, ecx")
+        elif op == "/":
+            # idiv trunca; a Level arredonda para baixo (// do Python)
+            asm.append("  cmp ecx, 0")
+            asm.append("  je level_div_zero")
+            asm.append("  cdq")
+            asm.append("  idiv ecx")
+            asm.append("  test edx, edx")
+            asm.append(f"  jz div_{self.id}")
+            asm.append("  xor edx, ecx")
+            asm.append(f"  jns div_{self.id}")
+            asm.append("  dec eax")
+            asm.append(f"div_{self.id}:")
+        else:
+            asm.append("  cmp eax, ecx")
+            asm.append(f"  {X86_SETCC[op]} al")
+            asm.append("  movzx eax, al")
 
 class UnOp(Node):
     def __init__(self, value, filho):
         super().__init__(value)
         self.children = [filho]
-    def evaluate(self, st):
-        var = self.children[0].evaluate(st)
+    def evaluate(self, frame):
+        var = self.children[0].evaluate(frame)
         if not isinstance(var, Variable):
             raise Exception("[Semantic] Operando inválido no unário")
         if self.value == "-":
@@ -176,46 +821,122 @@ class UnOp(Node):
         elif self.value == "!":
             if var.type != "boolean":
                 raise Exception(f"[Semantic] Operador '!' requer booleano")
-            return Variable(not var.value, "boolean")
+            return boolean(not var.value)
         return var
+    def evaluate_trusted(self, frame):
+        var = self.children[0].evaluate(frame)
+        if self.value == "-":
+            return Variable(-var.value, "number")
+        elif self.value == "!":
+            return FALSE if var.value else TRUE
+        return var
+    def evaluate_raw_trusted(self, frame):
+        value = self.children[0].evaluate_raw(frame)
+        if self.value == "-":
+            return -value
+        elif self.value == "!":
+            return not value
+        return value
+    def generate(self, asm):
+        self.children[0].generate(asm)
+        if self.value == "-":
+            asm.append("  neg eax")
+        elif self.value == "!":
+            asm.append("  xor eax, 1")
 
 class NumberVal(Node):
     def __init__(self, value):
         super().__init__(value)
-    def evaluate(self, st):
-        return Variable(self.value, "number")
+        # literais são constantes: o mesmo resultado serve para toda avaliação
+        self.result = Variable(value, "number")
+    def evaluate(self, frame):
+        return self.result
+    def evaluate_raw(self, frame):
+        return self.value
+    def generate(self, asm):
+        asm.append(f"  mov eax, {self.value}")
 
 class BooleanVal(Node):
     def __init__(self, value):
         super().__init__(value)
-    def evaluate(self, st):
-        return Variable(bool(self.value), "boolean")
+    def evaluate(self, frame):
+        return TRUE if self.value else FALSE
+    def evaluate_raw(self, frame):
+        return bool(self.value)
+    def generate(self, asm):
+        asm.append(f"  mov eax, {1 if self.value else 0}")
 
 class StringVal(Node):
     def __init__(self, value):
         super().__init__(value)
-    def evaluate(self, st):
-        return Variable(self.value, "text")
+        self.result = Variable(value, "text")
+    def evaluate(self, frame):
+        return self.result
+    def evaluate_raw(self, frame):
+        return self.value
+    def generate(self, asm):
+        # textos são constantes em .data; o valor é o endereço
+        asm.string(f"str_{self.id}", self.value)
+        asm.append(f"  mov eax, str_{self.id}")
+
+# tipos com representação nativa de 32 bits: number e boolean no próprio valor,
+# text como endereço de um literal em .data
+NATIVE_TYPES = ("number", "boolean", "text")
 
 class Identifier(Node):
     def __init__(self, name):
         super().__init__(name)
         self.name = name
-    def evaluate(self, st):
-        return st.get(self.name)
+        # preenchidos pelo Resolver
+        self.depth = None
+        self.slot = None
+        self.decl = None
+    def evaluate(self, frame):
+        return frame.load(self.depth, self.slot, self.name)
+    def evaluate_raw(self, frame):
+        return frame.load(self.depth, self.slot, self.name).value
+    def evaluate_owned(self, frame):
+        # array da variável pronto para escrita no lugar (ver IndexAssign)
+        var = frame.load(self.depth, self.slot, self.name)
+        if var.is_function or not is_array_type(var.type):
+            raise Exception("[Semantic] Tentativa de acessar não-array")
+        return owned(var)
+    def generate(self, asm):
+        if self.decl.is_function or self.decl.type not in NATIVE_TYPES:
+            raise CodegenUnsupported(f"[Codegen] Variável {self.name} do tipo {self.decl.type} não suportada")
+        asm.append(f"  mov eax, {asm.address(self)}")
 
 class Assignment(Node):
     def __init__(self, left_identifier, right_expr):
         super().__init__("=")
         self.children = [left_identifier, right_expr]
-    def evaluate(self, st):
+    def evaluate(self, frame):
         if not isinstance(self.children[0], Identifier):
             raise Exception("[Semantic] Lado esquerdo da atribuição deve ser um identificador")
         name = self.children[0].name
-        value_var = self.children[1].evaluate(st)
+        value_var = self.children[1].evaluate(frame)
         if not isinstance(value_var, Variable):
             raise Exception("[Semantic] Atribuição com valor inválido")
-        st.set(name, value_var)
+        target = self.children[0].evaluate(frame)
+        if target.is_function:
+            raise Exception(f"[Semantic] Não é possível atribuir a função {name}")
+        value = value_var.value
+        if target.type != value_var.type:
+            if not compatible(target.type, value_var.type):
+                raise Exception(f"[Semantic] Tipo incompatível para variável {name}: esperado {target.type}, obtido {value_var.type}")
+            value = coerce(value, target.type)
+        target.value = share(value)
+    def evaluate_trusted(self, frame):
+        value = self.children[1].evaluate_raw(frame)
+        if value.__class__ in ARRAY_CLASSES:
+            value.shared = True
+        self.children[0].evaluate(frame).value = value
+    def generate(self, asm):
+        target = self.children[0]
+        if target.decl.type not in NATIVE_TYPES:
+            raise CodegenUnsupported(f"[Codegen] Variável {target.name} do tipo {target.decl.type} não suportada")
+        self.children[1].generate(asm)
+        asm.append(f"  mov {asm.address(target)}, eax")
 
 class VarDec(Node):
     def __init__(self, v_type, identifier, expr=None):
@@ -223,19 +944,51 @@ class VarDec(Node):
         self.children = [identifier]
         if expr is not None:
             self.children.append(expr)
-    def evaluate(self, st):
+    def evaluate(self, frame):
         name = self.children[0].name
         if self.value is None:
             raise Exception(f"[Semantic] Tipo não especificado na declaração de {name}")
         if len(self.children) == 2:
-            value_var = self.children[1].evaluate(st)
+            value_var = self.children[1].evaluate(frame)
             if not isinstance(value_var, Variable):
                 raise Exception("[Semantic] Inicializador inválido")
+            value = value_var.value
             if self.value != value_var.type:
-                raise Exception(f"[Semantic] Tipo incompatível na declaração de {name}: esperado {self.value}, obtido {value_var.type}")
-            st.create_variable(name, self.value, value_var.value, is_function=False)
+                if not compatible(self.value, value_var.type):
+                    raise Exception(f"[Semantic] Tipo incompatível na declaração de {name}: esperado {self.value}, obtido {value_var.type}")
+                value = coerce(value, self.value)
         else:
-            st.create_variable(name, self.value, is_function=False)
+            value = default_value(self.value)
+        slot = self.children[0].slot
+        frame.slots[slot] = Variable(share(value), self.value, (slot + 1) * 4)
+    def evaluate_trusted(self, frame):
+        slot = self.children[0].slot
+        frame.slots[slot] = Variable(share(self.children[1].evaluate_raw(frame)), self.value, (slot + 1) * 4)
+    def generate(self, asm):
+        if self.value not in NATIVE_TYPES:
+            raise CodegenUnsupported(f"[Codegen] Variável {self.children[0].name} do tipo {self.value} não suportada")
+        self.children[1].generate(asm)
+        asm.append(f"  mov {asm.address(self.children[0])}, eax")
+
+class GlobalInput(Node):
+    # Inicializador de uma global que pode receber valor de fora (Program.run): usa
+    # o valor em frame.inputs, se houver, e senão o inicializador original. Só
+    # aparece em VarDecs do nível do topo, avaliados no quadro global.
+    def __init__(self, name, default):
+        super().__init__(name)
+        self.children = [default]
+    def evaluate(self, frame):
+        inputs = frame.inputs
+        if inputs is not None and self.value in inputs:
+            return Variable(inputs[self.value], self.static_type)
+        return self.children[0].evaluate(frame)
+    def evaluate_raw(self, frame):
+        inputs = frame.inputs
+        if inputs is not None and self.value in inputs:
+            return inputs[self.value]
+        return self.children[0].evaluate_raw(frame)
+    def generate(self, asm):
+        self.children[0].generate(asm)
 
 class Block(Node):
     def __init__(self, children=None):
@@ -247,30 +1000,25 @@ class Block(Node):
             # fazer uma cópia defensiva para evitar aliasing inesperado
             self.children = list(children)
 
-    def evaluate(self, st):
+    def evaluate(self, frame):
+        # escopos são resolvidos estaticamente: o bloco usa slots do quadro atual
         for c in self.children:
-            # se o filho for um bloco (escopo), criamos uma tabela encadeada
-            if isinstance(c, Block):
-                new_st = SymbolTable(parent=st)
-                try:
-                    c.evaluate(new_st)
-                except ReturnException:
-                    # propaga o return para o chamador
-                    raise
-            else:
-                try:
-                    c.evaluate(st)
-                except ReturnException:
-                    raise
+            if c.evaluate(frame) is RETURN:
+                return RETURN
         return None
+    def generate(self, asm):
+        for c in self.children:
+            c.generate(asm)
 
 
 class NoOp(Node):
     def __init__(self):
         super().__init__("noop")
         self.children = []
-    def evaluate(self, st):
+    def evaluate(self, frame):
         return None
+    def generate(self, asm):
+        pass
 
 class If(Node):
     def __init__(self, cond, then_branch, else_branch=None):
@@ -278,38 +1026,65 @@ class If(Node):
         self.children = [cond, then_branch]
         if else_branch is not None:
             self.children.append(else_branch)
-    def evaluate(self, st):
-        cond_var = self.children[0].evaluate(st)
+    def evaluate(self, frame):
+        cond_var = self.children[0].evaluate(frame)
         if not isinstance(cond_var, Variable) or cond_var.type != "boolean":
             raise Exception("[Semantic] Condição do if deve ser booleana")
         if cond_var.value:
-            try:
-                return self.children[1].evaluate(st)
-            except ReturnException:
-                raise
+            return self.children[1].evaluate(frame)
         elif len(self.children) == 3:
-            try:
-                return self.children[2].evaluate(st)
-            except ReturnException:
-                raise
+            return self.children[2].evaluate(frame)
         return None
+    def evaluate_trusted(self, frame):
+        if self.children[0].evaluate_raw(frame):
+            return self.children[1].evaluate(frame)
+        elif len(self.children) == 3:
+            return self.children[2].evaluate(frame)
+        return None
+    def generate(self, asm):
+        self.children[0].generate(asm)
+        asm.append("  cmp eax, 0")
+        if len(self.children) == 2:
+            asm.append(f"  je endif_{self.id}")
+            self.children[1].generate(asm)
+            asm.append(f"endif_{self.id}:")
+            return
+        asm.append(f"  je else_{self.id}")
+        self.children[1].generate(asm)
+        asm.append(f"  jmp endif_{self.id}")
+        asm.append(f"else_{self.id}:")
+        self.children[2].generate(asm)
+        asm.append(f"endif_{self.id}:")
 
 class Until(Node):
     def __init__(self, cond, body):
         super().__init__("until")
         self.children = [cond, body]
-    def evaluate(self, st):
+    def evaluate(self, frame):
         while True:
-            cond_var = self.children[0].evaluate(st)
+            cond_var = self.children[0].evaluate(frame)
             if not isinstance(cond_var, Variable) or cond_var.type != "boolean":
                 raise Exception("[Semantic] Condição do until deve ser booleana")
             if not cond_var.value:
                 break
-            try:
-                self.children[1].evaluate(st)
-            except ReturnException:
-                raise
+            if self.children[1].evaluate(frame) is RETURN:
+                return RETURN
+        return None
+    def evaluate_trusted(self, frame):
+        cond, body = self.children
+        while cond.evaluate_raw(frame):
+            if body.evaluate(frame) is RETURN:
+                return RETURN
         return None
+    def generate(self, asm):
+        # repete enquanto a condição vale, como na execução
+        asm.append(f"loop_{self.id}:")
+        self.children[0].generate(asm)
+        asm.append("  cmp eax, 0")
+        asm.append(f"  je exit_{self.id}")
+        self.children[1].generate(asm)
+        asm.append(f"  jmp loop_{self.id}")
+        asm.append(f"exit_{self.id}:")
 
 class Return(Node):
     def __init__(self, expr=None):
@@ -317,84 +1092,358 @@ class Return(Node):
         self.children = []
         if expr is not None:
             self.children.append(expr)
-    def evaluate(self, st):
+    def evaluate(self, frame):
         if len(self.children) == 0:
-            raise ReturnException(Variable(None, "void"))
-        val = self.children[0].evaluate(st)
+            frame.result = VOID
+            return RETURN
+        val = self.children[0].evaluate(frame)
         if not isinstance(val, Variable):
             raise Exception("[Semantic] Return com valor inválido")
-        raise ReturnException(val)
+        frame.result = val
+        return RETURN
+    def generate(self, asm):
+        if self.children:
+            self.children[0].generate(asm)
+        if not asm.functions:
+            # return fora de função encerra o programa
+            asm.append("  jmp level_end")
+            return
+        asm.append("  mov esp, ebp")
+        asm.append("  pop ebp")
+        asm.append("  ret")
 
 class FuncDec(Node):
     def __init__(self, name):
         super().__init__("func")
         self.name = name
-    def evaluate(self, st):
+        # preenchidos pelo Resolver: descritor da chamada, sem reler os filhos
+        self.slot = None
+        self.frame_size = 0
+        self.params = ()        # (slot, tipo) de cada parâmetro, em ordem
+        self.arity = 0
+        self.body = None
+    def evaluate(self, frame):
         ret_type = self.value
         vtype = ret_type if ret_type is not None else "void"
-        st.create_variable(self.name, vtype, value=self, is_function=True)
+        frame.slots[self.slot] = Variable(self, vtype, (self.slot + 1) * 4, is_function=True)
+    def label(self) -> str:
+        return f"func_{self.name}_{self.id}"
+    def generate(self, asm):
+        # cdecl: argumentos empilhados pelo chamador, copiados para os slots dos
+        # parâmetros; o corpo fica no meio do código e é saltado
+        for _, ptype in self.params:
+            if ptype not in NATIVE_TYPES:
+                raise CodegenUnsupported(f"[Codegen] Parâmetro do tipo {ptype} em {self.name} não suportado")
+        asm.append(f"  jmp end_{self.label()}")
+        asm.append(f"{self.label()}:")
+        asm.append("  push ebp")
+        asm.append("  mov ebp, esp")
+        asm.append(f"  sub esp, {self.frame_size * 4}")
+        for i, (pslot, _) in enumerate(self.params):
+            asm.append(f"  mov eax, [ebp + {8 + i * 4}]")
+            asm.append(f"  mov dword [ebp - {(pslot + 1) * 4}], eax")
+        asm.functions.append(self)
+        try:
+            self.body.generate(asm)
+        finally:
+            asm.functions.pop()
+        if self.value is None:
+            asm.append("  mov esp, ebp")
+            asm.append("  pop ebp")
+            asm.append("  ret")
+        else:
+            # fim do corpo sem return: o mesmo erro da execução
+            asm.string(f"noreturn_{self.id}", f"[Semantic] Função {self.name} espera retornar {self.value} mas não encontrou return")
+            asm.append(f"  push noreturn_{self.id}")
+            asm.append("  push format_str")
+            asm.append("  call printf")
+            asm.append("  mov ebx, 1")
+            asm.append("  jmp level_exit")
+        asm.append(f"end_{self.label()}:")
+
+class EntityDec(Node):
+    def __init__(self, name, members):
+        super().__init__("entity")
+        self.name = name
+        self.children = members
+        # preenchidos pelo Resolver: layout fixo das instâncias
+        self.slot = None
+        self.frame_size = 0
+        self.field_slots = {}   # nome -> slot, na ordem de declaração
+        self.field_types = {}
+        self.initializers = ()  # VarDecs dos campos, na mesma ordem
+        self.methods = {}       # nome -> FuncDec
+        self.template = []      # slots de uma instância nova: só os métodos preenchidos
+    def evaluate(self, frame):
+        # o layout é estático; não há nada a declarar em tempo de execução
+        return None
+    def instantiate(self, parent, values) -> Instance:
+        # argumentos posicionais substituem os primeiros campos; os demais usam
+        # o inicializador da declaração, avaliado no quadro da própria instância
+        if len(values) > len(self.initializers):
+            raise Exception(f"[Semantic] Entidade {self.name} tem {len(self.initializers)} campos, recebeu {len(values)} argumentos")
+        instance = Instance(self, parent)
+        slots = instance.slots
+        for value, decl in zip(values, self.initializers):
+            ident = decl.children[0]
+            f_type = decl.value
+            if type_of(value) != f_type:
+                if not compatible(f_type, type_of(value)):
+                    raise Exception(f"[Semantic] Tipo incompatível para campo {ident.name}: esperado {f_type}, obtido {type_of(value)}")
+                value = coerce(value, f_type)
+            slots[ident.slot] = Variable(share(value), f_type, (ident.slot + 1) * 4)
+        for decl in self.initializers[len(values):]:
+            decl.evaluate(instance)
+        return instance
 
 class FuncCall(Node):
     def __init__(self, name, args):
         super().__init__("funccall")
         self.name = name
         self.children = args
-    def evaluate(self, st):
-        var = st.get(self.name)
+        # preenchidos pelo Resolver
+        self.depth = None
+        self.slot = None
+        self.decl = None
+    def evaluate(self, frame):
+        def_frame = frame.up(self.depth)
+        var = def_frame.slots[self.slot]
+        if var is None:
+            raise Exception(f"[Semantic] Variável não declarada: {self.name}")
         if not isinstance(var, Variable) or not var.is_function:
             raise Exception(f"[Semantic] {self.name} não é uma função ou não foi declarada")
         func_node: FuncDec = var.value
-        params = []
-        if len(func_node.children) >= 2:
-            params = func_node.children[1:-1]
-        if len(params) != len(self.children):
+        if func_node.arity != len(self.children):
             raise Exception(f"[Semantic] Chamada a {self.name} com número incorreto de argumentos")
-        new_st = SymbolTable(parent=st)
-        for i, p in enumerate(params):
-            pname = p.children[0].name
-            ptype = p.value
-            argvar = self.children[i].evaluate(st)
+        new_frame = Frame(func_node.frame_size, parent=def_frame)
+        slots = new_frame.slots
+        for arg, (pslot, ptype) in zip(self.children, func_node.params):
+            argvar = arg.evaluate(frame)
             if not isinstance(argvar, Variable):
                 raise Exception("[Semantic] Argumento inválido")
+            value = argvar.value
             if argvar.type != ptype:
-                raise Exception(f"[Semantic] Tipo de argumento incompatível na chamada de {self.name}")
-            new_st.create_variable(pname, ptype, value=argvar.value, is_function=False)
-        body_block: Block = func_node.children[-1]
-        try:
-            body_block.evaluate(new_st)
-        except ReturnException as re:
-            returned_var = re.var
+                if not compatible(ptype, argvar.type):
+                    raise Exception(f"[Semantic] Tipo de argumento incompatível na chamada de {self.name}")
+                value = coerce(value, ptype)
+            slots[pslot] = Variable(lend(value, new_frame), ptype, (pslot + 1) * 4)
+        returned = func_node.body.evaluate(new_frame)
+        if new_frame.loans is not None:
+            release(new_frame)
+        if returned is RETURN:
             if func_node.value is None:
                 # função void: aceitar return; e retornar void
-                return Variable(None, "void")
+                return VOID
+            returned_var = new_frame.result
             if returned_var.type != func_node.value:
-                raise Exception(f"[Semantic] Tipo de retorno incompatível em {self.name}")
+                if not compatible(func_node.value, returned_var.type):
+                    raise Exception(f"[Semantic] Tipo de retorno incompatível em {self.name}")
+                return Variable(coerce(returned_var.value, func_node.value), func_node.value)
             return returned_var
         if func_node.value is None:
-            return Variable(None, "void")
+            return VOID
         else:
             raise Exception(f"[Semantic] Função {self.name} espera retornar {func_node.value} mas não encontrou return")
+    def evaluate_trusted(self, frame):
+        # aridade, tipos dos argumentos e dos returns já verificados estaticamente
+        def_frame = frame.up(self.depth)
+        var = def_frame.slots[self.slot]
+        if var is None:
+            raise Exception(f"[Semantic] Variável não declarada: {self.name}")
+        func_node: FuncDec = var.value
+        new_frame = Frame(func_node.frame_size, parent=def_frame)
+        slots = new_frame.slots
+        for arg, (pslot, ptype) in zip(self.children, func_node.params):
+            slots[pslot] = Variable(lend(arg.evaluate_raw(frame), new_frame), ptype, (pslot + 1) * 4)
+        returned = func_node.body.evaluate(new_frame)
+        if new_frame.loans is not None:
+            release(new_frame)
+        if returned is RETURN:
+            return new_frame.result if func_node.value is not None else VOID
+        if func_node.value is None:
+            return VOID
+        raise Exception(f"[Semantic] Função {self.name} espera retornar {func_node.value} mas não encontrou return")
+    def evaluate_raw_trusted(self, frame):
+        # mesma chamada, devolvendo o primitivo direto a quem consome (sem um quadro
+        # Python a mais por chamada Level)
+        def_frame = frame.up(self.depth)
+        var = def_frame.slots[self.slot]
+        if var is None:
+            raise Exception(f"[Semantic] Variável não declarada: {self.name}")
+        func_node: FuncDec = var.value
+        # quadros de chamadas já encerradas, da execução em curso (ver Frame.pools)
+        pools = def_frame.root().pools
+        frames = pools.get(func_node)
+        if frames:
+            # o valor é lido antes de o quadro voltar ao estoque, então nenhum
+            # Variable dele escapa: os dos parâmetros podem ser reaproveitados
+            new_frame = frames.pop()
+            new_frame.parent = def_frame
+            slots = new_frame.slots
+            for arg, (pslot, _) in zip(self.children, func_node.params):
+                slots[pslot].value = lend(arg.evaluate_raw(frame), new_frame)
+        else:
+            new_frame = Frame(func_node.frame_size, parent=def_frame)
+            slots = new_frame.slots
+            for arg, (pslot, ptype) in zip(self.children, func_node.params):
+                slots[pslot] = Variable(lend(arg.evaluate_raw(frame), new_frame), ptype, (pslot + 1) * 4)
+        returned = func_node.body.evaluate(new_frame)
+        if new_frame.loans is not None:
+            release(new_frame)
+        if returned is RETURN and func_node.value is not None:
+            result = new_frame.result.value
+            new_frame.result = None
+            if frames is None:
+                pools[func_node] = [new_frame]
+            else:
+                frames.append(new_frame)
+            return result
+        raise Exception(f"[Semantic] Função {self.name} espera retornar {func_node.value} mas não encontrou return")
+    def generate(self, asm):
+        func_node: FuncDec = self.decl.value
+        # argumentos avaliados na ordem do fonte, como na execução: o espaço da
+        # pilha é reservado antes e cada valor vai para o seu lugar (o primeiro
+        # em [esp], como no cdecl); as chamadas dentro deles devolvem esp como estava
+        if len(self.children) > 1:
+            asm.append(f"  sub esp, {len(self.children) * 4}")
+            for i, arg in enumerate(self.children):
+                arg.generate(asm)
+                asm.append(f"  mov dword [esp + {i * 4}], eax")
+        elif self.children:
+            self.children[0].generate(asm)
+            asm.append("  push eax")
+        asm.append(f"  call {func_node.label()}")
+        if self.children:
+            asm.append(f"  add esp, {len(self.children) * 4}")
+
+class Construct(Node):
+    # Monster(...): o Resolver troca a classe do FuncCall quando o nome é uma entity
+    def evaluate(self, frame):
+        entity: EntityDec = self.decl.value
+        values = []
+        for arg in self.children:
+            argvar = arg.evaluate(frame)
+            if not isinstance(argvar, Variable):
+                raise Exception("[Semantic] Argumento inválido")
+            values.append(argvar.value)
+        return Variable(entity.instantiate(frame.up(self.depth), values), entity.name)
+
+class FieldAccess(Node):
+    def __init__(self, obj, name):
+        super().__init__(name)
+        self.children = [obj]
+        # preenchido pelo TypeChecker quando o tipo de obj é conhecido
+        self.slot = None
+    def evaluate(self, frame):
+        # devolve o Variable do campo, como Identifier devolve o do slot
+        return instance_of(self.children[0].evaluate(frame).value, self.value).field(self.value)
+    def evaluate_trusted(self, frame):
+        return self.children[0].evaluate_raw(frame).slots[self.slot]
+
+class FieldAssign(Node):
+    def __init__(self, obj, name, expr):
+        super().__init__(name)
+        self.children = [obj, expr]
+        self.slot = None
+    def evaluate(self, frame):
+        value_var = self.children[1].evaluate(frame)
+        if not isinstance(value_var, Variable):
+            raise Exception("[Semantic] Atribuição com valor inválido")
+        target = instance_of(self.children[0].evaluate(frame).value, self.value).field(self.value)
+        store_field(target, value_var.value, value_var.type, self.value)
+    def evaluate_trusted(self, frame):
+        value = self.children[1].evaluate_raw(frame)
+        if value.__class__ in ARRAY_CLASSES:
+            value.shared = True
+        self.children[0].evaluate_raw(frame).slots[self.slot].value = value
+
+def store_field(target: Variable, value, v_type, name):
+    if target.type != v_type:
+        if not compatible(target.type, v_type):
+            raise Exception(f"[Semantic] Tipo incompatível para campo {name}: esperado {target.type}, obtido {v_type}")
+        value = coerce(value, target.type)
+    target.value = share(value)
+
+class MethodCall(Node):
+    def __init__(self, obj, name, args):
+        super().__init__(name)
+        self.name = name
+        self.children = [obj] + args
+        # FuncDec do método, preenchido pelo TypeChecker quando o tipo de obj é conhecido
+        self.method = None
+    def evaluate(self, frame):
+        instance = instance_of(self.children[0].evaluate(frame).value, self.name)
+        method = instance.entity.methods.get(self.name)
+        if method is None:
+            raise Exception(f"[Semantic] Entidade {instance.entity.name} não tem método {self.name}")
+        args = self.children[1:]
+        if method.arity != len(args):
+            raise Exception(f"[Semantic] Chamada a {self.name} com número incorreto de argumentos")
+        # o quadro do método fica dentro da instância: campos a uma profundidade
+        new_frame = Frame(method.frame_size, parent=instance)
+        slots = new_frame.slots
+        for arg, (pslot, ptype) in zip(args, method.params):
+            argvar = arg.evaluate(frame)
+            if not isinstance(argvar, Variable):
+                raise Exception("[Semantic] Argumento inválido")
+            value = argvar.value
+            if argvar.type != ptype:
+                if not compatible(ptype, argvar.type):
+                    raise Exception(f"[Semantic] Tipo de argumento incompatível na chamada de {self.name}")
+                value = coerce(value, ptype)
+            slots[pslot] = Variable(lend(value, new_frame), ptype, (pslot + 1) * 4)
+        returned = method.body.evaluate(new_frame)
+        if new_frame.loans is not None:
+            release(new_frame)
+        if returned is RETURN:
+            if method.value is None:
+                return VOID
+            returned_var = new_frame.result
+            if returned_var.type != method.value:
+                if not compatible(method.value, returned_var.type):
+                    raise Exception(f"[Semantic] Tipo de retorno incompatível em {self.name}")
+                return Variable(coerce(returned_var.value, method.value), method.value)
+            return returned_var
+        if method.value is None:
+            return VOID
+        raise Exception(f"[Semantic] Função {self.name} espera retornar {method.value} mas não encontrou return")
+    def evaluate_trusted(self, frame):
+        instance = self.children[0].evaluate_raw(frame)
+        method = self.method
+        new_frame = Frame(method.frame_size, parent=instance)
+        slots = new_frame.slots
+        for arg, (pslot, ptype) in zip(self.children[1:], method.params):
+            slots[pslot] = Variable(lend(arg.evaluate_raw(frame), new_frame), ptype, (pslot + 1) * 4)
+        returned = method.body.evaluate(new_frame)
+        if new_frame.loans is not None:
+            release(new_frame)
+        if returned is RETURN:
+            return new_frame.result if method.value is not None else VOID
+        if method.value is None:
+            return VOID
+        raise Exception(f"[Semantic] Função {self.name} espera retornar {method.value} mas não encontrou return")
 
 class Action(Node):
     def __init__(self, action_type, args):
         super().__init__(action_type)
         self.children = args
-    def evaluate(self, st):
+    def evaluate(self, frame):
         action_type = self.value
+        output = frame.root().output
 
         # Avalia um nó (Identifier ou expressão)
         def eval_node(node):
             if isinstance(node, Identifier):
-                return node.evaluate(st)
+                return node.evaluate(frame)
             else:
-                return node.evaluate(st)
+                return node.evaluate(frame)
 
         # SAY: imprime valor (aceita text ou number)
         if action_type == "say":
             if len(self.children) != 1:
                 raise Exception("[Semantic] Ação 'say' requer exatamente 1 argumento")
             arg = eval_node(self.children[0])
-            print(arg.value)
+            output.line(str(arg.value))
             return
 
         # WAIT: pausa (number)
@@ -404,8 +1453,9 @@ class Action(Node):
             arg = eval_node(self.children[0])
             if arg.type != "number":
                 raise Exception("[Semantic] Ação 'wait' requer number")
-            import time
-            time.sleep(arg.value)
+            # o texto já produzido sai antes da pausa, com relógio real ou virtual
+            output.flush()
+            frame.root().clock.wait(arg.value)
             return
 
         # MOVE: apenas narrativa (number)
@@ -415,7 +1465,7 @@ class Action(Node):
             arg = eval_node(self.children[0])
             if arg.type != "number":
                 raise Exception("[Semantic] Ação 'move' requer number")
-            print(f"Movendo {arg.value} unidades")
+            output.line(f"Movendo {arg.value} unidades")
             return
 
         # ATTACK: reduz vida de target (identifier) ou de enemy_hp global
@@ -423,16 +1473,16 @@ class Action(Node):
             # attack() -> decrementa enemy_hp em 1
             if len(self.children) == 0:
                 try:
-                    target = st.get("enemy_hp")
+                    target = frame.get("enemy_hp")
                 except Exception:
                     raise Exception("[Semantic] 'attack()' sem alvo requer variável global 'enemy_hp'")
                 if target.type != "number":
                     raise Exception("[Semantic] 'enemy_hp' deve ser number")
                 new_val = target.value - 1
-                st.set("enemy_hp", Variable(new_val, "number"))
-                print(f"Atacado! enemy_hp agora = {new_val}")
+                frame.set("enemy_hp", Variable(new_val, "number"))
+                output.line(f"Atacado! enemy_hp agora = {new_val}")
                 if new_val <= 0:
-                    print("Inimigo derrotado!")
+                    output.line("Inimigo derrotado!")
                 return
 
             # attack(target) -> decrementa target em 1 (target deve ser Identifier)
@@ -440,14 +1490,14 @@ class Action(Node):
                 targ_node = self.children[0]
                 if not isinstance(targ_node, Identifier):
                     raise Exception("[Semantic] attack(target) requer Identifier como primeiro argumento")
-                targ_var = targ_node.evaluate(st)
-                if targ_var.type != "number":
+                targ_var = targ_node.evaluate(frame)
+                if targ_var.type != "number" or targ_var.is_function:
                     raise Exception("[Semantic] target deve ser number")
                 new_val = targ_var.value - 1
-                st.set(targ_node.name, Variable(new_val, "number"))
-                print(f"Atacado! {targ_node.name} agora = {new_val}")
+                targ_var.value = new_val
+                output.line(f"Atacado! {targ_node.name} agora = {new_val}")
                 if new_val <= 0:
-                    print("Inimigo derrotado!")
+                    output.line("Inimigo derrotado!")
                 return
 
             # attack(target, damage) -> decrementa target por damage
@@ -456,15 +1506,15 @@ class Action(Node):
                 dmg_node = self.children[1]
                 if not isinstance(targ_node, Identifier):
                     raise Exception("[Semantic] Primeiro argumento de attack deve ser Identifier")
-                targ_var = targ_node.evaluate(st)
+                targ_var = targ_node.evaluate(frame)
                 dmg_var = eval_node(dmg_node)
-                if targ_var.type != "number" or dmg_var.type != "number":
+                if targ_var.type != "number" or targ_var.is_function or dmg_var.type != "number":
                     raise Exception("[Semantic] attack(target,damage) requer números")
                 new_val = targ_var.value - dmg_var.value
-                st.set(targ_node.name, Variable(new_val, "number"))
-                print(f"Atacado com {dmg_var.value}! {targ_node.name} agora = {new_val}")
+                targ_var.value = new_val
+                output.line(f"Atacado com {dmg_var.value}! {targ_node.name} agora = {new_val}")
                 if new_val <= 0:
-                    print("Inimigo derrotado!")
+                    output.line("Inimigo derrotado!")
                 return
 
             raise Exception("[Semantic] attack aceita 0, 1 ou 2 argumentos")
@@ -483,18 +1533,7 @@ class Action(Node):
                 else:
                     item_name = str(item_var.value)
 
-            # tenta adicionar em inventory se existir
-            try:
-                inv = st.get("inventory")
-                if inv.type != "array":
-                    raise Exception("[Semantic] 'inventory' deve ser array se existir")
-                new_list = list(inv.value)
-                new_list.append(item_name)
-                st.set("inventory", Variable(new_list, "array"))
-                print(f"Item '{item_name}' adicionado ao inventory")
-            except Exception:
-                # se não existe inventory, apenas printa
-                print(f"Item coletado: {item_name}")
+            Action.gather(frame, item_name)
             return
 
         # USE: usar item — comportamento especial para 'potion'
@@ -509,57 +1548,83 @@ class Action(Node):
                 item_var = eval_node(arg_node)
                 item_name = item_var.value
 
-            # Se for 'potion' (string), cura o player (health) usando potion_heal se existir
-            if str(item_name) == "potion":
-                try:
-                    health_var = st.get("health")
-                except Exception:
-                    raise Exception("[Semantic] Variável 'health' não encontrada para usar potion")
-                if health_var.type != "number":
-                    raise Exception("[Semantic] 'health' deve ser number")
+            Action.use(frame, item_name)
+            return
 
-                # procurar potion_heal na tabela; se não existir, usar 50
-                try:
-                    potion_heal_var = st.get("potion_heal")
-                    if potion_heal_var.type != "number":
-                        heal_amount = 50
-                    else:
-                        heal_amount = potion_heal_var.value
-                except Exception:
-                    heal_amount = 50
+        raise Exception(f"[Semantic] Ação desconhecida: {action_type}")
 
-                # checar max_health se houver
-                try:
-                    max_h = st.get("max_health")
-                    if max_h.type == "number":
-                        cap = max_h.value
-                    else:
-                        cap = health_var.value + heal_amount
-                except Exception:
-                    cap = health_var.value + heal_amount
+    def generate(self, asm):
+        if self.value != "say":
+            raise CodegenUnsupported(f"[Codegen] Ação '{self.value}' não suportada")
+        arg = self.children[0]
+        kind = arg.static_type
+        if kind not in NATIVE_TYPES:
+            raise CodegenUnsupported(f"[Codegen] say de {kind} não suportado")
+        arg.generate(asm)
+        if kind == "boolean":
+            # imprime True/False, como str() do Python na execução
+            asm.append("  cmp eax, 0")
+            asm.append("  mov eax, level_false")
+            asm.append(f"  je say_{self.id}")
+            asm.append("  mov eax, level_true")
+            asm.append(f"say_{self.id}:")
+        asm.append("  push eax")
+        asm.append(f"  push {'format_out' if kind == 'number' else 'format_str'}")
+        asm.append("  call printf")
+        asm.append("  add esp, 8")
 
-                new_health = min(health_var.value + heal_amount, cap)
-                st.set("health", Variable(new_health, "number"))
+    # ações com efeito no estado global, compartilhadas pelo tree-walker e pela GameVM
+    @staticmethod
+    def gather(frame, item_name):
+        output = frame.root().output
+        inv = frame.find("inventory")
+        if inv is None:
+            # se não existe inventory, apenas printa
+            output.line(f"Item coletado: {item_name}")
+            return
+        if inv.type != "array" and (inv.type != "text[]" or type(item_name) is not str):
+            raise Exception(f"[Semantic] 'inventory' deve ser array ou text[], obtido {inv.type}")
+        # in-place: só copia se o array também estiver ligado a outro lugar
+        owned(inv).append(item_name)
+        output.line(f"Item '{item_name}' adicionado ao inventory")
 
-                # remover potion do inventory se presente
-                try:
-                    inv = st.get("inventory")
-                    if inv.type == "array":
-                        new_list = list(inv.value)
-                        if "potion" in new_list:
-                            new_list.remove("potion")
-                            st.set("inventory", Variable(new_list, "array"))
-                except Exception:
-                    pass
+    @staticmethod
+    def use(frame, item_name):
+        output = frame.root().output
+        # Se for 'potion' (string), cura o player (health) usando potion_heal se existir
+        if str(item_name) == "potion":
+            health_var = frame.find("health")
+            if health_var is None:
+                raise Exception("[Semantic] Variável 'health' não encontrada para usar potion")
+            if health_var.type != "number":
+                raise Exception("[Semantic] 'health' deve ser number")
 
-                print(f"Você usou uma potion. Vida agora = {new_health}")
-                return
+            # procurar potion_heal na tabela; se não existir, usar 50
+            potion_heal_var = frame.find("potion_heal")
+            if potion_heal_var is None or potion_heal_var.type != "number":
+                heal_amount = 50
             else:
-                # comportamento genérico: apenas print
-                print(f"Usando {item_name}")
-                return
+                heal_amount = potion_heal_var.value
 
-        raise Exception(f"[Semantic] Ação desconhecida: {action_type}")
+            # checar max_health se houver
+            max_h = frame.find("max_health")
+            if max_h is not None and max_h.type == "number":
+                cap = max_h.value
+            else:
+                cap = health_var.value + heal_amount
+
+            new_health = min(health_var.value + heal_amount, cap)
+            frame.set("health", Variable(new_health, "number"))
+
+            # remover potion do inventory se presente (só array e text[] guardam text)
+            inv = frame.find("inventory")
+            if inv is not None and inv.type in ("array", "text[]") and "potion" in inv.value:
+                owned(inv).remove("potion")
+
+            output.line(f"Você usou uma potion. Vida agora = {new_health}")
+        else:
+            # comportamento genérico: apenas print
+            output.line(f"Usando {item_name}")
 
 
 
@@ -568,15 +1633,15 @@ class ArrayAccess(Node):
         super().__init__("array_access")
         self.children = [identifier, index]
 
-    def evaluate(self, st):
+    def evaluate(self, frame):
         # Primeiro avalia a referência ao array
-        array_var = self.children[0].evaluate(st)
+        array_var = self.children[0].evaluate(frame)
         if not isinstance(array_var, Variable):
             raise Exception("[Semantic] Acesso a array: operando esquerdo não é variável")
-        if array_var.type != "array":
+        if not is_array_type(array_var.type):
             raise Exception("[Semantic] Tentativa de acessar não-array")
         # Avalia o índice
-        index_var = self.children[1].evaluate(st)
+        index_var = self.children[1].evaluate(frame)
         if not isinstance(index_var, Variable):
             raise Exception("[Semantic] Índice inválido no acesso a array")
         if index_var.type != "number":
@@ -584,170 +1649,368 @@ class ArrayAccess(Node):
         idx = index_var.value
         if idx < 0 or idx >= len(array_var.value):
             raise Exception("[Semantic] Índice fora do intervalo")
-        elem = array_var.value[idx]
-
+        array = array_var.value
+        if array.__class__ is BoolArray:
+            return boolean(array[idx])
         # Converte o elemento Python em Variable com tipo apropriado
-        if isinstance(elem, bool):
-            return Variable(elem, "boolean")
-        elif isinstance(elem, int):
-            return Variable(elem, "number")
-        elif isinstance(elem, str):
-            return Variable(elem, "text")
-        elif isinstance(elem, list):
-            return Variable(list(elem), "array")
-        else:
-            # fallback: stringify
-            return Variable(elem, "text")
+        return box(array[idx])
+    def evaluate_trusted(self, frame):
+        return box(self.evaluate_raw(frame))
+    def evaluate_raw_trusted(self, frame):
+        array = self.children[0].evaluate_raw(frame)
+        idx = self.children[1].evaluate_raw(frame)
+        if idx < 0 or idx >= len(array):
+            raise Exception("[Semantic] Índice fora do intervalo")
+        if array.__class__ is BoolArray:
+            return array[idx] == 1
+        return array[idx]
+    def evaluate_owned(self, frame):
+        # grid[i] como alvo de grid[i][j] = x: copia só os níveis compartilhados
+        outer = self.children[0].evaluate_owned(frame)
+        idx = self.children[1].evaluate_raw(frame)
+        if type(idx) is not int:
+            raise Exception("[Semantic] Índice de array deve ser number")
+        if idx < 0 or idx >= len(outer):
+            raise Exception("[Semantic] Índice fora do intervalo")
+        inner = outer[idx]
+        if inner.__class__ not in ARRAY_CLASSES:
+            raise Exception("[Semantic] Tentativa de acessar não-array")
+        if inner.shared or inner.borrowed:
+            inner = outer[idx] = inner.copy()
+        return inner
+
+class IndexAssign(Node):
+    # arr[i] = x (ou grid[i][j] = x): escreve um elemento no lugar, em O(1).
+    # children = [alvo (Identifier ou ArrayAccess), índice, valor]
+    def __init__(self, target, index, expr):
+        super().__init__("[]=")
+        self.children = [target, index, expr]
+    def evaluate(self, frame):
+        target, index, expr = self.children
+        # o valor vem primeiro e é marcado como compartilhado: em a[0] = a, o
+        # alvo é copiado antes da escrita e o elemento guarda o array antigo
+        value = share(expr.evaluate_raw(frame))
+        idx = index.evaluate_raw(frame)
+        array = target.evaluate_owned(frame)
+        if type(idx) is not int:
+            raise Exception("[Semantic] Índice de array deve ser number")
+        if idx < 0 or idx >= len(array):
+            raise Exception("[Semantic] Índice fora do intervalo")
+        store_element(array, idx, value, expr_source(target))
 
 
 class ArrayLiteral(Node):
     def __init__(self, elements):
         super().__init__("array_literal")
         self.children = elements
-    def evaluate(self, st):
-        evaluated_elements = []
+    def evaluate(self, frame):
+        evaluated_elements = Array()
         for element in self.children:
-            eval_element = element.evaluate(st)
-            evaluated_elements.append(eval_element.value)
+            eval_element = element.evaluate(frame)
+            evaluated_elements.append(share(eval_element.value))
         return Variable(evaluated_elements, "array")
 
 class LenCall(Node):
     def __init__(self, identifier):
         super().__init__("len")
         self.children = [identifier]
-    def evaluate(self, st):
-        array_var = self.children[0].evaluate(st)
-        if array_var.type != "array":
+    def evaluate(self, frame):
+        array_var = self.children[0].evaluate(frame)
+        if not is_array_type(array_var.type):
             raise Exception("[Semantic] 'len' só pode ser aplicado a arrays")
         return Variable(len(array_var.value), "number")
 
-class Prepro:
-    def filter(code: str) -> str:
-        code = re.sub(r'//[^\n]*', '', code)
-        code = re.sub(r'/\*.*?\*/', '', code, flags=re.DOTALL)
-        return code
+# ---------- Operações de array em lote, ao lado de len ----------
+# Cada uma percorre o array numa só operação em C (map/operator, count/index,
+# atribuição de fatia) em vez de um laço until interpretado; number[] e
+# boolean[] dispensam a conferência de tipo por elemento.
+
+def numeric(array, name):
+    if array.__class__ is NumberArray:
+        return
+    if array.__class__ is BoolArray or not set(map(type, array)) <= {int}:
+        raise Exception(f"[Semantic] '{name}' requer array de number")
+
+def confusable(array, value) -> bool:
+    # True == 1 no Python: num array sem tipo que mistura boolean e number,
+    # count e index_of comparam também o tipo, elemento a elemento
+    t = type(value)
+    if t is not int and t is not bool:
+        return False
+    return (bool if t is int else int) in set(map(type, array))
+
+def element_value(array, value, name):
+    # valor que pode ocupar qualquer posição do array (ver store_element)
+    actual = type_of(value)
+    expected = array.element
+    if expected is None:
+        classes = set(map(type, array))
+        if not (classes <= ARRAY_CLASSES if is_array_type(actual) else classes <= {type(value)}):
+            raise Exception(f"[Semantic] '{name}' requer valor do tipo dos elementos, obtido {actual}")
+        return value
+    if actual != expected:
+        if not compatible(expected, actual):
+            raise Exception(f"[Semantic] '{name}' requer valor do tipo {expected}, obtido {actual}")
+        value = share(coerce(value, expected))
+    return value
+
+def store_numbers(array, values):
+    try:
+        if array.__class__ is NumberArray:
+            array[:] = NumberArray("q", values)
+        else:
+            array[:] = values
+    except OverflowError:
+        raise Exception("[Semantic] Número fora do intervalo de number[]")
+
+def array_sum(array):
+    numeric(array, "sum")
+    return sum(array)
+
+def array_count(array, value):
+    cls = array.__class__
+    if cls is NumberArray:
+        return array.count(value) if type(value) is int else 0
+    if cls is BoolArray:
+        return array.count(value) if type(value) is bool else 0
+    if confusable(array, value):
+        return sum(1 for e in array if e == value and type(e) is type(value))
+    return array.count(value)
+
+def array_index_of(array, value):
+    cls = array.__class__
+    if cls is BoolArray:
+        return array.find(value) if type(value) is bool else -1
+    if cls is NumberArray:
+        if type(value) is not int:
+            return -1
+    elif confusable(array, value):
+        return next((i for i, e in enumerate(array) if e == value and type(e) is type(value)), -1)
+    try:
+        return array.index(value)
+    except ValueError:
+        return -1
+
+def array_fill(array, value):
+    value = element_value(array, value, "fill")
+    n = len(array)
+    if array.__class__ is NumberArray:
+        store_numbers(array, NumberArray("q", (value,)) * n)
+    elif array.__class__ is BoolArray:
+        array[:] = bytes((value,)) * n
+    else:
+        array[:] = [value] * n
+
+def array_add(array, other):
+    # soma um number a cada elemento, ou outro array elemento a elemento
+    numeric(array, "add")
+    if type(other) is int:
+        store_numbers(array, map(operator.add, array, itertools.repeat(other, len(array))))
+    elif other.__class__ in ARRAY_CLASSES:
+        numeric(other, "add")
+        if len(other) != len(array):
+            raise Exception("[Semantic] 'add' requer arrays do mesmo tamanho")
+        store_numbers(array, map(operator.add, array, other))
+    else:
+        raise Exception("[Semantic] 'add' requer number ou array de number")
+
+def array_scale(array, factor):
+    numeric(array, "scale")
+    if type(factor) is not int:
+        raise Exception("[Semantic] 'scale' requer fator number")
+    store_numbers(array, map(operator.mul, array, itertools.repeat(factor, len(array))))
+
+# nome: (função, aridade, altera o primeiro argumento no lugar)
+ARRAY_BUILTINS = {
+    "sum": (array_sum, 1, False),
+    "count": (array_count, 2, False),
+    "index_of": (array_index_of, 2, False),
+    "fill": (array_fill, 2, True),
+    "add": (array_add, 2, True),
+    "scale": (array_scale, 2, True),
+}
+
+def call_array_builtin(name, args):
+    # comum ao tree-walker e à GameVM; o alvo das escritas já vem de owned
+    if args[0].__class__ not in ARRAY_CLASSES:
+        raise Exception(f"[Semantic] '{name}' só pode ser aplicado a arrays")
+    return ARRAY_BUILTINS[name][0](*args)
+
+class ArrayBuiltin(Node):
+    # sum(a), count(a, v), index_of(a, v): consultas que devolvem number;
+    # fill(a, v), add(a, b), scale(a, k): escritas no lugar, void
+    def __init__(self, name, args):
+        super().__init__(name)
+        self.children = args
+    def evaluate(self, frame):
+        name = self.value
+        if ARRAY_BUILTINS[name][2]:
+            target, arg = self.children
+            # como em IndexAssign, o valor vem antes da cópia do alvo
+            value = share(arg.evaluate_raw(frame))
+            call_array_builtin(name, (target.evaluate_owned(frame), value))
+            return VOID
+        return Variable(call_array_builtin(name, [c.evaluate_raw(frame) for c in self.children]), "number")
+
+KEYWORDS = {
+    "text": "TEXT_TYPE", "number": "NUMBER_TYPE", "boolean": "BOOLEAN_TYPE",
+    "array": "ARRAY_TYPE", "func": "FUNC", "entity": "ENTITY", "if": "IF",
+    "else": "ELSE", "until": "UNTIL", "during": "DURING", "return": "RETURN",
+    "move": "MOVE", "attack": "ATTACK", "gather": "GATHER", "use": "USE",
+    "say": "SAY", "wait": "WAIT", "true": "TRUE", "false": "FALSE", "len": "LEN"
+}
+
+PUNCTUATION = {
+    "&&": "AND", "||": "OR", "==": "EQ", "!=": "NE", "<=": "LE", ">=": "GE",
+    "<": "LT", ">": "GT", "=": "ASSIGN", "+": "PLUS", "-": "MINUS",
+    "*": "TIMES", "/": "DIVIDE", "(": "LPAREN", ")": "RPAREN",
+    "{": "LBRACE", "}": "RBRACE", "[": "LBRACKET", "]": "RBRACKET",
+    ":": "COLON", ";": "SEMICOLON", ",": "COMMA", ".": "DOT",
+}
+
+# uma única regex com um grupo por classe de token; espaços e tabs antes do
+# token são consumidos no mesmo match, e as alternativas mais frequentes vêm primeiro.
+# Comentários são reconhecidos aqui mesmo, então '//' dentro de strings é preservado.
+TOKEN_RE = re.compile(
+    r'[ \t\r]*(?:(?P<IDENTIFIER>[^\W\d]\w*)'
+    r'|(?P<COMMENT>//[^\n]*|/\*.*?\*/)'
+    r'|(?P<PUNCT>&&|\|\||[=!<>]=|[<>=+\-*/(){}\[\]:;,.])'
+    r'|(?P<NEWLINE>\n)'
+    r'|(?P<NUMBER>\d+)'
+    r'|(?P<STRING>"[^"]*")'
+    r'|(?P<END>\Z)'
+    r'|(?P<ERROR>.))',
+    re.DOTALL,
+)
+
+def tokenize(source: str) -> list:
+    tokens = []
+    append = tokens.append
+    keywords = KEYWORDS
+    punctuation = PUNCTUATION
+    line = 1
+    line_start = 0
+    for m in TOKEN_RE.finditer(source):
+        kind = m.lastgroup
+        if kind == "IDENTIFIER":
+            text = m.group(kind)
+            append(Token(keywords.get(text, "IDENTIFIER"), text, line, m.start(kind) - line_start + 1))
+        elif kind == "PUNCT":
+            text = m.group(kind)
+            append(Token(punctuation[text], text, line, m.start(kind) - line_start + 1))
+        elif kind == "NEWLINE":
+            line += 1
+            line_start = m.end()
+        elif kind == "COMMENT":
+            text = m.group(kind)
+            newlines = text.count("\n")
+            if newlines:
+                line += newlines
+                line_start = m.start(kind) + text.rindex("\n") + 1
+        elif kind == "NUMBER":
+            append(Token("NUMBER", int(m.group(kind)), line, m.start(kind) - line_start + 1))
+        elif kind == "STRING":
+            text = m.group(kind)
+            start = m.start(kind)
+            append(Token("STRING", text[1:-1], line, start - line_start + 1))
+            newlines = text.count("\n")
+            if newlines:
+                line += newlines
+                line_start = start + text.rindex("\n") + 1
+        elif kind == "END":
+            append(Token("EOF", "", line, m.start(kind) - line_start + 1))
+            break
+        else:
+            char = m.group(kind)
+            where = position_text((line, m.start(kind) - line_start + 1))
+            if char == '"':
+                raise Exception(f"String não fechada{where}")
+            raise Exception(f"Caractere inválido: {char}{where}")
+    return tokens
 
 class Lexer():
+    # Tokeniza o arquivo inteiro de uma vez para um buffer; position é o índice
+    # de next no buffer e peek(k) olha k tokens adiante sem consumir.
     def __init__(self, source):
         self.source = source
-        self.position = 0
+        self.tokens = tokenize(source)
+        self.last = len(self.tokens) - 1
+        self.position = -1
         self.next = None
         self.selectNext()
     def selectNext(self):
-        while self.position < len(self.source) and self.source[self.position] in ' \t\r\n':
-            self.position += 1
-        if self.position >= len(self.source):
-            self.next = Token("EOF", "")
-            return
-        c_atual = self.source[self.position]
-        if c_atual.isalpha() or c_atual == '_':
-            ident = ''
-            while self.position < len(self.source) and (self.source[self.position].isalnum() or self.source[self.position] == '_'):
-                ident += self.source[self.position]
-                self.position += 1
-            keywords = {
-                "text": "TEXT_TYPE", "number": "NUMBER_TYPE", "boolean": "BOOLEAN_TYPE",
-                "array": "ARRAY_TYPE", "func": "FUNC", "entity": "ENTITY", "if": "IF",
-                "else": "ELSE", "until": "UNTIL", "during": "DURING", "return": "RETURN",
-                "move": "MOVE", "attack": "ATTACK", "gather": "GATHER", "use": "USE",
-                "say": "SAY", "wait": "WAIT", "true": "TRUE", "false": "FALSE", "len": "LEN"
-            }
-            if ident in keywords:
-                self.next = Token(keywords[ident], ident)
-            else:
-                self.next = Token("IDENTIFIER", ident)
-            return
-        elif c_atual.isdigit():
-            num = ''
-            while self.position < len(self.source) and self.source[self.position].isdigit():
-                num += self.source[self.position]
-                self.position += 1
-            self.next = Token("NUMBER", int(num))
-            return
-        elif c_atual == '"':
-            string_val = ''
+        # EOF é repetido indefinidamente
+        if self.position < self.last:
             self.position += 1
-            while self.position < len(self.source) and self.source[self.position] != '"':
-                string_val += self.source[self.position]
-                self.position += 1
-            if self.position >= len(self.source) or self.source[self.position] != '"':
-                raise Exception("String não fechada")
-            self.position += 1
-            self.next = Token("STRING", string_val)
+        self.next = self.tokens[self.position]
+    def peek(self, k=1):
+        index = self.position + k
+        return self.tokens[index if index < self.last else self.last]
+
+class Positions:
+    # Linha e coluna no fonte de cada nó do Parser, fora dos nós: dois arrays de
+    # 32 bits indexados por Node.id - base (0: sem posição). Os ids de um parse são
+    # consecutivos; nós criados depois (otimizador, GlobalInput) ficam sem posição
+    # e quem consulta usa a do nó de fora (ver locate).
+    def __init__(self, base: int):
+        self.base = base
+        self.lines = array.array("I")
+        self.columns = array.array("I")
+
+    def set(self, node, line: int, column: int) -> None:
+        # vale a primeira posição: v[i] fica com a do '[' mesmo dentro de um fator
+        index = node.id - self.base
+        size = len(self.lines)
+        if index >= size:
+            missing = max(index + 1, size * 2) - size
+            self.lines.frombytes(bytes(missing * 4))
+            self.columns.frombytes(bytes(missing * 4))
+        elif self.lines[index]:
             return
-        elif c_atual == '&' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '&':
-            self.next = Token("AND", "&&"); self.position += 2
-        elif c_atual == '|' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '|':
-            self.next = Token("OR", "||"); self.position += 2
-        elif c_atual == '=' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
-            self.next = Token("EQ", "=="); self.position += 2
-        elif c_atual == '!' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
-            self.next = Token("NE", "!="); self.position += 2
-        elif c_atual == '<' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
-            self.next = Token("LE", "<="); self.position += 2
-        elif c_atual == '>' and self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
-            self.next = Token("GE", ">="); self.position += 2
-        elif c_atual == '<':
-            self.next = Token("LT", "<"); self.position += 1
-        elif c_atual == '>':
-            self.next = Token("GT", ">"); self.position += 1
-        elif c_atual == '=':
-            self.next = Token("ASSIGN", "="); self.position += 1
-        elif c_atual == '+':
-            self.next = Token("PLUS", "+"); self.position += 1
-        elif c_atual == '-':
-            self.next = Token("MINUS", "-"); self.position += 1
-        elif c_atual == '*':
-            self.next = Token("TIMES", "*"); self.position += 1
-        elif c_atual == '/':
-            self.next = Token("DIVIDE", "/"); self.position += 1
-        elif c_atual == '(':
-            self.next = Token("LPAREN", "("); self.position += 1
-        elif c_atual == ')':
-            self.next = Token("RPAREN", ")"); self.position += 1
-        elif c_atual == '{':
-            self.next = Token("LBRACE", "{"); self.position += 1
-        elif c_atual == '}':
-            self.next = Token("RBRACE", "}"); self.position += 1
-        elif c_atual == '[':
-            self.next = Token("LBRACKET", "["); self.position += 1
-        elif c_atual == ']':
-            self.next = Token("RBRACKET", "]"); self.position += 1
-        elif c_atual == ':':
-            self.next = Token("COLON", ":"); self.position += 1
-        elif c_atual == ';':
-            self.next = Token("SEMICOLON", ";"); self.position += 1
-        elif c_atual == ',':
-            self.next = Token("COMMA", ","); self.position += 1
-        else:
-            raise Exception(f"Caractere inválido: {c_atual}")
+        self.lines[index] = line
+        self.columns[index] = column
+
+    def get(self, node_id: int):
+        index = node_id - self.base
+        if 0 <= index < len(self.lines) and self.lines[index]:
+            return self.lines[index], self.columns[index]
+        return None
+
+    def line(self, node_id: int):
+        index = node_id - self.base
+        if 0 <= index < len(self.lines) and self.lines[index]:
+            return self.lines[index]
+        return None
+
+def position_text(position) -> str:
+    return f" (linha {position[0]}, coluna {position[1]})"
 
 class Parser():
     def __init__(self, lexer):
         self.lexer = lexer
+        # os nós deste parse têm ids a partir daqui
+        self.positions = Positions(Node.newId() + 1)
     def _err(self, msg):
-        raise Exception(f"[Parser] {msg}")
+        token = self.lexer.next
+        raise Exception(f"[Parser] {msg}{position_text((token.line, token.column))}")
+    def mark(self, node, token):
+        self.positions.set(node, token.line, token.column)
+        return node
 
     # ---------- MODIFICADO: aceita IDENTIFIER: ... como declaração no topo ----------
     def parseProgram(self):
         declarations = []
         while self.lexer.next.kind != "EOF":
+            start = self.lexer.next
             # detecta declaração de variável iniciada por IDENTIFIER :
             if self.lexer.next.kind == "IDENTIFIER":
-                saved_pos = self.lexer.position
-                saved_next = self.lexer.next
-                self.lexer.selectNext()
-                next_kind = self.lexer.next.kind
-                # restaura
-                self.lexer.position = saved_pos
-                self.lexer.next = saved_next
-                if next_kind == "COLON":
-                    declarations.append(self.parseVariableDeclaration())
+                if self.lexer.peek().kind == "COLON":
+                    declarations.append(self.mark(self.parseVariableDeclaration(), start))
                     continue
             if self.lexer.next.kind == "FUNC":
-                declarations.append(self.parseFuncDeclaration())
+                declarations.append(self.mark(self.parseFuncDeclaration(), start))
             elif self.lexer.next.kind == "ENTITY":
-                declarations.append(self.parseEntityDeclaration())
+                declarations.append(self.mark(self.parseEntityDeclaration(), start))
             else:
                 declarations.append(self.parseCommand())
         return Block(declarations)
@@ -755,15 +2018,12 @@ class Parser():
     def parseVariableDeclaration(self):
         if self.lexer.next.kind != "IDENTIFIER":
             self._err("Esperado identificador")
-        identifier = Identifier(self.lexer.next.value)
+        identifier = self.mark(Identifier(self.lexer.next.value), self.lexer.next)
         self.lexer.selectNext()
         if self.lexer.next.kind != "COLON":
             self._err("Esperado ':'")
         self.lexer.selectNext()
-        if self.lexer.next.kind not in ["TEXT_TYPE", "NUMBER_TYPE", "BOOLEAN_TYPE", "ARRAY_TYPE"]:
-            self._err("Esperado tipo")
-        var_type = self.lexer.next.value
-        self.lexer.selectNext()
+        var_type = self.parseType("Esperado tipo")
         if self.lexer.next.kind != "ASSIGN":
             self._err("Esperado '='")
         self.lexer.selectNext()
@@ -773,6 +2033,21 @@ class Parser():
         self.lexer.selectNext()
         return VarDec(var_type, identifier, expr)
 
+    def parseType(self, message):
+        # base_type, { "[]" }: number[] e boolean[] ganham armazenamento compacto,
+        # T[][] é um array de T[]; um identificador é o nome de uma entity
+        if self.lexer.next.kind not in ["TEXT_TYPE", "NUMBER_TYPE", "BOOLEAN_TYPE", "ARRAY_TYPE", "IDENTIFIER"]:
+            self._err(message)
+        v_type = self.lexer.next.value
+        self.lexer.selectNext()
+        while self.lexer.next.kind == "LBRACKET":
+            self.lexer.selectNext()
+            if self.lexer.next.kind != "RBRACKET":
+                self._err("Esperado ']'")
+            self.lexer.selectNext()
+            v_type += "[]"
+        return v_type
+
     def parseFuncDeclaration(self):
         if self.lexer.next.kind != "FUNC":
             self._err("Esperado 'func'")
@@ -790,15 +2065,13 @@ class Parser():
                 if self.lexer.next.kind != "IDENTIFIER":
                     self._err("Esperado identificador de parâmetro")
                 param_name = self.lexer.next.value
+                param_start = self.lexer.next
                 self.lexer.selectNext()
                 if self.lexer.next.kind != "COLON":
                     self._err("Esperado ':'")
                 self.lexer.selectNext()
-                if self.lexer.next.kind not in ["TEXT_TYPE", "NUMBER_TYPE", "BOOLEAN_TYPE", "ARRAY_TYPE"]:
-                    self._err("Esperado tipo")
-                param_type = self.lexer.next.value
-                self.lexer.selectNext()
-                params.append(VarDec(param_type, Identifier(param_name)))
+                param_type = self.parseType("Esperado tipo")
+                params.append(self.mark(VarDec(param_type, Identifier(param_name)), param_start))
                 if self.lexer.next.kind == "COMMA":
                     self.lexer.selectNext()
                     continue
@@ -810,10 +2083,7 @@ class Parser():
         return_type = None
         if self.lexer.next.kind == "COLON":
             self.lexer.selectNext()
-            if self.lexer.next.kind not in ["TEXT_TYPE", "NUMBER_TYPE", "BOOLEAN_TYPE", "ARRAY_TYPE"]:
-                self._err("Esperado tipo de retorno")
-            return_type = self.lexer.next.value
-            self.lexer.selectNext()
+            return_type = self.parseType("Esperado tipo de retorno")
         if self.lexer.next.kind != "LBRACE":
             self._err("Esperado '{'")
         body = self.parseBlock()
@@ -839,31 +2109,29 @@ class Parser():
         self.lexer.selectNext()
         members = []
         while self.lexer.next.kind != "RBRACE" and self.lexer.next.kind != "EOF":
+            start = self.lexer.next
             if self.lexer.next.kind == "IDENTIFIER":
-                saved_pos = self.lexer.position
-                saved_next = self.lexer.next
-                self.lexer.selectNext()
-                next_kind = self.lexer.next.kind
-                self.lexer.position = saved_pos
-                self.lexer.next = saved_next
-                if next_kind == "COLON":
-                    members.append(self.parseVariableDeclaration())
+                if self.lexer.peek().kind == "COLON":
+                    members.append(self.mark(self.parseVariableDeclaration(), start))
                     continue
                 else:
                     self._err("Membro de entidade inválido: esperado ':' após identificador")
             elif self.lexer.next.kind == "FUNC":
-                members.append(self.parseFuncDeclaration())
+                members.append(self.mark(self.parseFuncDeclaration(), start))
                 continue
             else:
                 self._err("Membro de entidade inválido")
         if self.lexer.next.kind != "RBRACE":
             self._err("Esperado '}'")
         self.lexer.selectNext()
-        entity_block = Block()
-        entity_block.children = members
-        return entity_block
+        return EntityDec(entity_name, members)
 
     def parseCommand(self):
+        # cada comando fica com a posição do seu primeiro token
+        start = self.lexer.next
+        return self.mark(self.parseStatement(), start)
+
+    def parseStatement(self):
         # aceitar ';' solto como NoOp (declaração vazia)
         if self.lexer.next.kind == "SEMICOLON":
             self.lexer.selectNext()
@@ -871,16 +2139,8 @@ class Parser():
 
         # Se for uma possível declaração local: IDENTIFIER :
         if self.lexer.next.kind == "IDENTIFIER":
-            # lookahead: salva estado, avança e verifica se vem COLON
-            saved_pos = self.lexer.position
-            saved_next = self.lexer.next
-            self.lexer.selectNext()
-            next_kind = self.lexer.next.kind
-            # restaura estado
-            self.lexer.position = saved_pos
-            self.lexer.next = saved_next
-
-            if next_kind == "COLON":
+            # lookahead de um token no buffer, sem consumir
+            if self.lexer.peek().kind == "COLON":
                 # declaração local dentro de bloco/função
                 return self.parseVariableDeclaration()
 
@@ -926,6 +2186,10 @@ class Parser():
             if self.lexer.next.kind == "LBRACKET":
                 return self.parseArrayAssignment(lookahead)
 
+            # membro de entidade: ident.campo = expr ; ou ident.metodo(...) ;
+            if self.lexer.next.kind == "DOT":
+                return self.parseMemberCommand(Identifier(lookahead))
+
             self._err(f"Comando inválido: token após identificador = {self.lexer.next.kind}")
 
         # qualquer outro token inválido para começo de comando
@@ -937,6 +2201,7 @@ class Parser():
     def parseBlock(self):
         if self.lexer.next.kind != "LBRACE":
             self._err("Esperado '{'")
+        start = self.lexer.next
         self.lexer.selectNext()
 
         commands = []
@@ -954,7 +2219,7 @@ class Parser():
 
         block = Block()
         block.children = commands
-        return block
+        return self.mark(block, start)
 
 
     def parseIf(self):
@@ -1036,11 +2301,21 @@ class Parser():
     def parseArrayAssignment(self, identifier):
         if self.lexer.next.kind != "LBRACKET":
             self._err("Esperado '['")
-        self.lexer.selectNext()
-        index = self.parseExpression()
-        if self.lexer.next.kind != "RBRACKET":
-            self._err("Esperado ']'")
-        self.lexer.selectNext()
+        # ident[a][b]...[z] = expr: os índices antes do último escolhem o array alvo
+        target = Identifier(identifier)
+        index = None
+        while self.lexer.next.kind == "LBRACKET":
+            if index is not None:
+                target = self.mark(ArrayAccess(target, index), bracket)
+            bracket = self.lexer.next
+            self.lexer.selectNext()
+            index = self.parseExpression()
+            if self.lexer.next.kind != "RBRACKET":
+                self._err("Esperado ']'")
+            self.lexer.selectNext()
+        if self.lexer.next.kind == "DOT":
+            # pack[i].hp = x; / pack[i].hit(1);
+            return self.parseMemberCommand(self.mark(ArrayAccess(target, index), bracket))
         if self.lexer.next.kind != "ASSIGN":
             self._err("Esperado '='")
         self.lexer.selectNext()
@@ -1048,7 +2323,46 @@ class Parser():
         if self.lexer.next.kind != "SEMICOLON":
             self._err("Esperado ';'")
         self.lexer.selectNext()
-        return Assignment(Identifier(identifier), expr)
+        return IndexAssign(target, index, expr)
+
+    def parseMemberCommand(self, node):
+        node = self.parseMembers(node)
+        if isinstance(node, FieldAccess) and self.lexer.next.kind == "ASSIGN":
+            self.lexer.selectNext()
+            expr = self.parseExpression()
+            if self.lexer.next.kind != "SEMICOLON":
+                self._err("Esperado ';'")
+            self.lexer.selectNext()
+            return FieldAssign(node.children[0], node.value, expr)
+        if isinstance(node, MethodCall) and self.lexer.next.kind == "SEMICOLON":
+            self.lexer.selectNext()
+            return node
+        self._err(f"Comando inválido: token após membro = {self.lexer.next.kind}")
+
+    def parseMembers(self, node):
+        # obj.campo, obj.metodo(...) e índices depois deles, encadeados
+        while self.lexer.next.kind in ("DOT", "LBRACKET"):
+            start = self.lexer.next
+            if self.lexer.next.kind == "LBRACKET":
+                self.lexer.selectNext()
+                index = self.parseExpression()
+                if self.lexer.next.kind != "RBRACKET":
+                    self._err("Esperado ']'")
+                self.lexer.selectNext()
+                node = self.mark(ArrayAccess(node, index), start)
+                continue
+            self.lexer.selectNext()
+            if self.lexer.next.kind != "IDENTIFIER":
+                self._err("Esperado nome de membro após '.'")
+            name = self.lexer.next.value
+            start = self.lexer.next
+            self.lexer.selectNext()
+            if self.lexer.next.kind == "LPAREN":
+                node = MethodCall(node, name, self.parseArguments())
+            else:
+                node = FieldAccess(node, name)
+            self.mark(node, start)
+        return node
 
     def parseExpression(self):
         return self.parseLogicalExpression()
@@ -1057,39 +2371,55 @@ class Parser():
         node = self.parseRelationalExpression()
         while self.lexer.next.kind in ["AND", "OR"]:
             op = self.lexer.next.value
+            start = self.lexer.next
             self.lexer.selectNext()
             right = self.parseRelationalExpression()
-            node = BinOp(op, node, right)
+            node = self.mark(BinOp(op, node, right), start)
         return node
 
     def parseRelationalExpression(self):
         node = self.parseArithmeticExpression()
         while self.lexer.next.kind in ["EQ", "NE", "LT", "GT", "LE", "GE"]:
             op = self.lexer.next.value
+            start = self.lexer.next
             self.lexer.selectNext()
             right = self.parseArithmeticExpression()
-            node = BinOp(op, node, right)
+            node = self.mark(BinOp(op, node, right), start)
         return node
 
     def parseArithmeticExpression(self):
         node = self.parseTerm()
         while self.lexer.next.kind in ["PLUS", "MINUS"]:
             op = self.lexer.next.value
+            start = self.lexer.next
             self.lexer.selectNext()
             right = self.parseTerm()
-            node = BinOp(op, node, right)
+            node = self.mark(BinOp(op, node, right), start)
         return node
 
     def parseTerm(self):
         node = self.parseFactor()
         while self.lexer.next.kind in ["TIMES", "DIVIDE"]:
             op = self.lexer.next.value
+            start = self.lexer.next
             self.lexer.selectNext()
             right = self.parseFactor()
-            node = BinOp(op, node, right)
+            node = self.mark(BinOp(op, node, right), start)
         return node
 
     def parseFactor(self):
+        # a posição do fator é a do seu primeiro token; ( expr ) fica com a de expr
+        start = self.lexer.next
+        if self.lexer.next.kind == "LPAREN":
+            self.lexer.selectNext()
+            node = self.parseExpression()
+            if self.lexer.next.kind != "RPAREN":
+                self._err("Esperado ')'")
+            self.lexer.selectNext()
+            return node
+        return self.mark(self.parseOperand(), start)
+
+    def parseOperand(self):
         if self.lexer.next.kind in ["PLUS", "MINUS", "NOT"]:
             op = self.lexer.next.value
             self.lexer.selectNext()
@@ -1109,24 +2439,20 @@ class Parser():
             val = self.lexer.next.value
             self.lexer.selectNext()
             return StringVal(val)
-        elif self.lexer.next.kind == "LPAREN":
-            self.lexer.selectNext()
-            node = self.parseExpression()
-            if self.lexer.next.kind != "RPAREN":
-                self._err("Esperado ')'")
-            self.lexer.selectNext()
-            return node
         elif self.lexer.next.kind == "LBRACKET":
             return self.parseArrayLiteral()
         elif self.lexer.next.kind == "IDENTIFIER":
             identifier = self.lexer.next.value
             self.lexer.selectNext()
             if self.lexer.next.kind == "LPAREN":
-                return self.parseFuncCall(identifier)
+                node = self.parseFuncCall(identifier)
             elif self.lexer.next.kind == "LBRACKET":
-                return self.parseArrayAccess(identifier)
+                node = self.parseArrayAccess(identifier)
             else:
-                return Identifier(identifier)
+                node = Identifier(identifier)
+            if self.lexer.next.kind == "DOT":
+                return self.parseMembers(node)
+            return node
         elif self.lexer.next.kind == "LEN":
             return self.parseLenCall()
         else:
@@ -1148,6 +2474,9 @@ class Parser():
         return ArrayLiteral(elements)
 
     def parseFuncCall(self, identifier):
+        return FuncCall(identifier, self.parseArguments())
+
+    def parseArguments(self):
         if self.lexer.next.kind != "LPAREN":
             self._err("Esperado '('")
         self.lexer.selectNext()
@@ -1160,17 +2489,22 @@ class Parser():
         if self.lexer.next.kind != "RPAREN":
             self._err("Esperado ')'")
         self.lexer.selectNext()
-        return FuncCall(identifier, args)
+        return args
 
     def parseArrayAccess(self, identifier):
         if self.lexer.next.kind != "LBRACKET":
             self._err("Esperado '['")
-        self.lexer.selectNext()
-        index = self.parseExpression()
-        if self.lexer.next.kind != "RBRACKET":
-            self._err("Esperado ']'")
-        self.lexer.selectNext()
-        return ArrayAccess(Identifier(identifier), index)
+        node = Identifier(identifier)
+        # grid[i][j]: acessos encadeados
+        while self.lexer.next.kind == "LBRACKET":
+            start = self.lexer.next
+            self.lexer.selectNext()
+            index = self.parseExpression()
+            if self.lexer.next.kind != "RBRACKET":
+                self._err("Esperado ']'")
+            self.lexer.selectNext()
+            node = self.mark(ArrayAccess(node, index), start)
+        return node
 
     def parseLenCall(self):
         if self.lexer.next.kind != "LEN":
@@ -1192,40 +2526,2035 @@ class Parser():
         node = self.parseProgram()
         if self.lexer.next.kind != "EOF":
             self._err("Tokens extras após programa")
+        node.positions = self.positions
+        return node
+
+class Resolver:
+    # Passo estático entre Parser.run() e a execução: associa cada uso de variável
+    # ao par (depth, slot) da sua declaração. Corpos de função são resolvidos ao
+    # fim do escopo que os declara, para enxergar globais/funções declaradas depois.
+    def __init__(self):
+        self.scope = None
+
+    def resolve(self, root: Block) -> SymbolTable:
+        self.scope = SymbolTable()
+        self.statements(root.children)
+        root.frame_size = self.scope.frame_size()
+        root.global_names = {name: var.slot for name, var in self.scope._table.items()}
+        return self.scope
+
+    def statements(self, nodes):
+        pending = []
+        for node in nodes:
+            self.stmt(node, pending)
+        for decl in pending:
+            if isinstance(decl, EntityDec):
+                self.entity(decl)
+            else:
+                self.function(decl)
+
+    def entity(self, entity: EntityDec):
+        # a entity tem o seu quadro (o da instância): campos e métodos ganham slots
+        # nele, e os métodos o enxergam a uma profundidade, como qualquer função aninhada
+        outer = self.scope
+        self.scope = SymbolTable(parent=outer)
+        pending = []
+        for member in entity.children:
+            self.stmt(member, pending)
+        for func in pending:
+            self.function(func)
+        entity.frame_size = self.scope.frame_size()
+        fields = [m for m in entity.children if isinstance(m, VarDec)]
+        entity.initializers = tuple(fields)
+        entity.field_slots = {f.children[0].name: f.children[0].slot for f in fields}
+        entity.field_types = {f.children[0].name: f.value for f in fields}
+        entity.methods = {f.name: f for f in pending}
+        # métodos ligados uma vez só, compartilhados por todas as instâncias
+        entity.template = [None] * entity.frame_size
+        for func in pending:
+            entity.template[func.slot] = Variable(func, func.value if func.value is not None else "void",
+                                                  (func.slot + 1) * 4, is_function=True)
+        self.scope = outer
+
+    def function(self, func: FuncDec):
+        outer = self.scope
+        self.scope = SymbolTable(parent=outer)
+        for p in func.children[1:-1]:
+            self.declare(p.children[0], p.value)
+        # parâmetros e corpo compartilham o mesmo escopo, como antes
+        self.statements(func.children[-1].children)
+        func.frame_size = self.scope.frame_size()
+        func.params = tuple((p.children[0].slot, p.value) for p in func.children[1:-1])
+        func.arity = len(func.params)
+        func.body = func.children[-1]
+        self.scope = outer
+
+    def declare(self, ident: Identifier, v_type: str):
+        ident.decl = self.scope.create_variable(ident.name, v_type)
+        ident.depth = 0
+        ident.slot = ident.decl.slot
+
+    def stmt(self, node, pending):
+        if isinstance(node, Block):
+            outer = self.scope
+            self.scope = SymbolTable(parent=outer, same_frame=True)
+            self.statements(node.children)
+            self.scope = outer
+        elif isinstance(node, VarDec):
+            # o inicializador é resolvido antes de a variável existir
+            if len(node.children) == 2:
+                self.expr(node.children[1])
+            self.declare(node.children[0], node.value)
+        elif isinstance(node, FuncDec):
+            vtype = node.value if node.value is not None else "void"
+            node.slot = self.scope.create_variable(node.name, vtype, value=node, is_function=True).slot
+            pending.append(node)
+        elif isinstance(node, EntityDec):
+            # resolvida ao fim do escopo, como as funções: os métodos enxergam
+            # globais declaradas depois
+            node.slot = self.scope.create_variable(node.name, "entity", value=node).slot
+            pending.append(node)
+        elif isinstance(node, If):
+            self.expr(node.children[0])
+            for branch in node.children[1:]:
+                self.stmt(branch, pending)
+        elif isinstance(node, Until):
+            self.expr(node.children[0])
+            self.stmt(node.children[1], pending)
+        elif isinstance(node, Action):
+            for arg in node.children:
+                # gather(x)/use(x): o identificador é o nome do item, não uma variável
+                if node.value in ("gather", "use") and isinstance(arg, Identifier):
+                    continue
+                self.expr(arg)
+        elif isinstance(node, NoOp):
+            pass
+        else:
+            # Assignment, Return e chamadas usadas como comando
+            self.expr(node)
+
+    def expr(self, node):
+        if isinstance(node, FuncCall) and self.builtin(node.name):
+            # mesma troca de classe do modo confiável (ver TypeChecker.trust)
+            node.__class__ = ArrayBuiltin
+            node.value = node.name
+        elif isinstance(node, (Identifier, FuncCall)):
+            node.depth, node.decl = self.scope.resolve(node.name)
+            node.slot = node.decl.slot
+            if isinstance(node, FuncCall) and isinstance(node.decl.value, EntityDec):
+                node.__class__ = Construct
+        for c in node.children:
+            self.expr(c)
+
+    def builtin(self, name) -> bool:
+        # sum, count, add...: operações de array, a menos que o programa declare
+        # uma função com o mesmo nome (variáveis não atrapalham: count(xs, 1)
+        # continua válido com uma variável count)
+        if name not in ARRAY_BUILTINS:
+            return False
+        try:
+            _, var = self.scope.resolve(name)
+        except Exception:
+            return True
+        return not var.is_function
+
+ANY = "any"
+
+class TypeChecker:
+    # Análise semântica feita uma única vez, antes da execução. Cada expressão
+    # recebe static_type ("any" quando o tipo só é conhecido em tempo de execução,
+    # como elementos de array) e static_ok indica que todas as checagens de tipo
+    # do nó foram provadas aqui, podendo ser omitidas no modo confiável (--trusted).
+    def __init__(self):
+        self.func = None
+        self.entities = {}
+
+    def check(self, root: Block):
+        # entities só são declaradas no topo; o nome de cada uma é um tipo
+        self.entities = {n.name: n for n in root.children if isinstance(n, EntityDec)}
+        self.stmt(root)
+
+    def check_type(self, t):
+        base = t
+        while base.endswith("[]"):
+            base = base[:-2]
+        if base not in ("number", "text", "boolean", "array") and base not in self.entities:
+            raise Exception(f"[Semantic] Tipo desconhecido: {t}")
+
+    def entity_of(self, t, member):
+        # EntityDec do tipo estático t; None se só a execução sabe
+        if t == ANY:
+            return None
+        entity = self.entities.get(t)
+        if entity is None:
+            raise Exception(f"[Semantic] Acesso a membro {member} de {t}, que não é entidade")
+        return entity
+
+    def stmt(self, node):
+        if isinstance(node, Block):
+            for c in node.children:
+                self.stmt(c)
+        elif isinstance(node, VarDec):
+            name = node.children[0].name
+            t = node.value
+            self.check_type(t)
+            if len(node.children) == 2:
+                t = self.expr(node.children[1])
+                if not self.assignable(node.value, t):
+                    raise Exception(f"[Semantic] Tipo incompatível na declaração de {name}: esperado {node.value}, obtido {t}")
+            node.static_ok = self.exact(node.value, t)
+        elif isinstance(node, Assignment):
+            target = node.children[0]
+            t = self.expr(node.children[1])
+            if target.decl.is_function:
+                raise Exception(f"[Semantic] Não é possível atribuir a função {target.name}")
+            if not self.assignable(target.decl.type, t):
+                raise Exception(f"[Semantic] Tipo incompatível para variável {target.name}: esperado {target.decl.type}, obtido {t}")
+            node.static_ok = self.exact(target.decl.type, t)
+        elif isinstance(node, IndexAssign):
+            target = node.children[0]
+            if isinstance(target, Identifier) and target.decl.is_function:
+                raise Exception(f"[Semantic] Não é possível atribuir a função {target.name}")
+            bt = self.expr(target)
+            it = self.expr(node.children[1])
+            vt = self.expr(node.children[2])
+            if bt != ANY and not is_array_type(bt):
+                raise Exception("[Semantic] Tentativa de acessar não-array")
+            if it not in ("number", ANY):
+                raise Exception("[Semantic] Índice de array deve ser number")
+            if vt == "void":
+                raise Exception("[Semantic] Atribuição com valor inválido")
+            if bt.endswith("[]") and not self.assignable(bt[:-2], vt):
+                raise Exception(f"[Semantic] Tipo incompatível para elemento de {expr_source(target)}: esperado {bt[:-2]}, obtido {vt}")
+            # o tipo do elemento de um array sem tipo só é conhecido na execução
+            node.static_ok = False
+        elif isinstance(node, FieldAssign):
+            obj, expr = node.children
+            entity = self.entity_of(self.expr(obj), node.value)
+            vt = self.expr(expr)
+            node.static_ok = False
+            if entity is not None:
+                if node.value not in entity.field_slots:
+                    raise Exception(f"[Semantic] Entidade {entity.name} não tem campo {node.value}")
+                ft = entity.field_types[node.value]
+                if not self.assignable(ft, vt):
+                    raise Exception(f"[Semantic] Tipo incompatível para campo {node.value}: esperado {ft}, obtido {vt}")
+                node.slot = entity.field_slots[node.value]
+                node.static_ok = self.exact(ft, vt)
+        elif isinstance(node, FuncDec):
+            outer = self.func
+            self.func = node
+            node.static_ok = True
+            for p in node.children[1:-1]:
+                self.check_type(p.value)
+            if node.value is not None:
+                self.check_type(node.value)
+            self.stmt(node.children[-1])
+            self.func = outer
+        elif isinstance(node, EntityDec):
+            for member in node.children:
+                self.stmt(member)
+        elif isinstance(node, If):
+            node.static_ok = self.condition(node.children[0], "if")
+            for branch in node.children[1:]:
+                self.stmt(branch)
+        elif isinstance(node, Until):
+            node.static_ok = self.condition(node.children[0], "until")
+            self.stmt(node.children[1])
+        elif isinstance(node, Return):
+            t = self.expr(node.children[0]) if node.children else "void"
+            func = self.func
+            if func is not None and func.value is not None:
+                if not self.assignable(func.value, t):
+                    raise Exception(f"[Semantic] Tipo de retorno incompatível em {func.name}")
+                if not self.exact(func.value, t):
+                    func.static_ok = False
+            node.static_ok = t != ANY
+        elif isinstance(node, Action):
+            self.action(node)
+        elif isinstance(node, NoOp):
+            pass
+        else:
+            self.expr(node)
+
+    @staticmethod
+    def assignable(expected, actual) -> bool:
+        # um array sem tipo pode ir para um T[] (conferido na execução, em coerce)
+        # e qualquer array cabe em array; fora isso, só o mesmo tipo
+        if actual == ANY or actual == expected:
+            return True
+        return is_array_type(expected) and is_array_type(actual) and "array" in (expected, actual)
+
+    @staticmethod
+    def exact(expected, actual) -> bool:
+        # nada resta a checar ou converter na execução
+        return actual == expected or (expected == "array" and is_array_type(actual))
+
+    def condition(self, cond, kind) -> bool:
+        t = self.expr(cond)
+        if t != ANY and t != "boolean":
+            raise Exception(f"[Semantic] Condição do {kind} deve ser booleana")
+        return t == "boolean"
+
+    def action(self, node):
+        kind = node.value
+        args = node.children
+        if kind in ("say", "move", "wait"):
+            if len(args) != 1:
+                raise Exception(f"[Semantic] Ação '{kind}' requer exatamente 1 argumento")
+            t = self.expr(args[0])
+            if kind != "say" and t != ANY and t != "number":
+                raise Exception(f"[Semantic] Ação '{kind}' requer number")
+        elif kind == "attack":
+            if len(args) > 2:
+                raise Exception("[Semantic] attack aceita 0, 1 ou 2 argumentos")
+            if args:
+                if not isinstance(args[0], Identifier):
+                    raise Exception("[Semantic] Primeiro argumento de attack deve ser Identifier")
+                target = args[0]
+                self.expr(target)
+                dmg = self.expr(args[1]) if len(args) == 2 else "number"
+                if target.decl.is_function or target.decl.type != "number" or dmg not in ("number", ANY):
+                    if len(args) == 1:
+                        raise Exception("[Semantic] target deve ser number")
+                    raise Exception("[Semantic] attack(target,damage) requer números")
+        elif kind in ("gather", "use"):
+            if len(args) != 1:
+                raise Exception(f"[Semantic] {kind} espera 1 argumento")
+            if not isinstance(args[0], Identifier):
+                self.expr(args[0])
+        else:
+            raise Exception(f"[Semantic] Ação desconhecida: {kind}")
+
+    def array_builtin(self, node) -> str:
+        name = node.value
+        _, arity, mutates = ARRAY_BUILTINS[name]
+        args = node.children
+        if len(args) != arity:
+            raise Exception(f"[Semantic] '{name}' requer {arity} argumento(s)")
+        types = [self.expr(a) for a in args]
+        bt = types[0]
+        if bt != ANY and not is_array_type(bt):
+            raise Exception(f"[Semantic] '{name}' só pode ser aplicado a arrays")
+        if mutates:
+            target = args[0]
+            if not isinstance(target, (Identifier, ArrayAccess)) or (isinstance(target, Identifier) and target.decl.is_function):
+                raise Exception(f"[Semantic] '{name}' altera o array no lugar e requer uma variável ou elemento de array")
+        element = bt[:-2] if bt.endswith("[]") else ANY
+        vt = types[1] if arity == 2 else None
+        if name in ("sum", "add", "scale") and element not in ("number", ANY):
+            raise Exception(f"[Semantic] '{name}' requer array de number")
+        if name in ("count", "index_of", "fill"):
+            if vt == "void" or (element != ANY and not self.assignable(element, vt)):
+                raise Exception(f"[Semantic] '{name}' requer valor do tipo {element if element != ANY else 'dos elementos'}, obtido {vt}")
+        elif name == "scale" and vt not in ("number", ANY):
+            raise Exception("[Semantic] 'scale' requer fator number")
+        elif name == "add" and vt not in ("number", "array", "number[]", ANY):
+            raise Exception("[Semantic] 'add' requer number ou array de number")
+        # os elementos de arrays sem tipo são conferidos na execução
+        node.static_ok = False
+        return "void" if mutates else "number"
+
+    def expr(self, node) -> str:
+        t = self._expr(node)
+        node.static_type = t
+        return t
+
+    def _expr(self, node) -> str:
+        if isinstance(node, NumberVal):
+            node.static_ok = True
+            return "number"
+        elif isinstance(node, BooleanVal):
+            node.static_ok = True
+            return "boolean"
+        elif isinstance(node, StringVal):
+            node.static_ok = True
+            return "text"
+        elif isinstance(node, Identifier):
+            if isinstance(node.decl.value, EntityDec):
+                raise Exception(f"[Semantic] Entidade {node.name} não é um valor; use {node.name}()")
+            node.static_ok = True
+            return node.decl.type
+        elif isinstance(node, BinOp):
+            op = node.value
+            lt = self.expr(node.children[0])
+            rt = self.expr(node.children[1])
+            known = lt != ANY and rt != ANY
+            node.static_ok = known
+            if op in ("+", "-", "*", "/"):
+                if lt not in ("number", ANY) or rt not in ("number", ANY):
+                    raise Exception(f"[Semantic] Operação {op} requer números")
+                return "number"
+            elif op in ("==", "!=", "<", ">", "<=", ">="):
+                if known and lt != rt:
+                    raise Exception(f"[Semantic] Operação {op} requer tipos iguais")
+                return "boolean"
+            elif op in ("&&", "||"):
+                if lt not in ("boolean", ANY) or rt not in ("boolean", ANY):
+                    raise Exception(f"[Semantic] Operação {'AND' if op == '&&' else 'OR'} requer booleanos")
+                return "boolean"
+            raise Exception(f"[Semantic] Operador binário desconhecido: {op}")
+        elif isinstance(node, UnOp):
+            t = self.expr(node.children[0])
+            node.static_ok = t != ANY
+            if node.value == "-":
+                if t not in ("number", ANY):
+                    raise Exception("[Semantic] Operador '-' requer número")
+                return "number"
+            elif node.value == "!":
+                if t not in ("boolean", ANY):
+                    raise Exception("[Semantic] Operador '!' requer booleano")
+                return "boolean"
+            return t
+        elif isinstance(node, FuncCall):
+            if not node.decl.is_function:
+                raise Exception(f"[Semantic] {node.name} não é uma função ou não foi declarada")
+            func = node.decl.value
+            params = func.children[1:-1]
+            if len(params) != len(node.children):
+                raise Exception(f"[Semantic] Chamada a {node.name} com número incorreto de argumentos")
+            node.static_ok = True
+            for arg, p in zip(node.children, params):
+                t = self.expr(arg)
+                if not self.assignable(p.value, t):
+                    raise Exception(f"[Semantic] Tipo de argumento incompatível na chamada de {node.name}")
+                if not self.exact(p.value, t):
+                    node.static_ok = False
+            return func.value if func.value is not None else "void"
+        elif isinstance(node, ArrayAccess):
+            bt = self.expr(node.children[0])
+            it = self.expr(node.children[1])
+            if bt != ANY and not is_array_type(bt):
+                raise Exception("[Semantic] Tentativa de acessar não-array")
+            if it not in ("number", ANY):
+                raise Exception("[Semantic] Índice de array deve ser number")
+            node.static_ok = bt != ANY and it == "number"
+            # só os elementos de T[] têm tipo declarado
+            return bt[:-2] if bt.endswith("[]") else ANY
+        elif isinstance(node, ArrayLiteral):
+            for element in node.children:
+                self.expr(element)
+            node.static_ok = True
+            return "array"
+        elif isinstance(node, LenCall):
+            t = self.expr(node.children[0])
+            if t != ANY and not is_array_type(t):
+                raise Exception("[Semantic] 'len' só pode ser aplicado a arrays")
+            node.static_ok = t != ANY
+            return "number"
+        elif isinstance(node, ArrayBuiltin):
+            return self.array_builtin(node)
+        elif isinstance(node, Construct):
+            entity = node.decl.value
+            fields = entity.initializers
+            if len(node.children) > len(fields):
+                raise Exception(f"[Semantic] Entidade {entity.name} tem {len(fields)} campos, recebeu {len(node.children)} argumentos")
+            node.static_ok = True
+            for arg, decl in zip(node.children, fields):
+                t = self.expr(arg)
+                if not self.assignable(decl.value, t):
+                    raise Exception(f"[Semantic] Tipo incompatível para campo {decl.children[0].name}: esperado {decl.value}, obtido {t}")
+                if not self.exact(decl.value, t):
+                    node.static_ok = False
+            return entity.name
+        elif isinstance(node, FieldAccess):
+            entity = self.entity_of(self.expr(node.children[0]), node.value)
+            if entity is None:
+                node.static_ok = False
+                return ANY
+            if node.value not in entity.field_slots:
+                raise Exception(f"[Semantic] Entidade {entity.name} não tem campo {node.value}")
+            node.slot = entity.field_slots[node.value]
+            node.static_ok = True
+            return entity.field_types[node.value]
+        elif isinstance(node, MethodCall):
+            entity = self.entity_of(self.expr(node.children[0]), node.name)
+            args = node.children[1:]
+            types = [self.expr(a) for a in args]
+            if entity is None:
+                node.static_ok = False
+                return ANY
+            method = entity.methods.get(node.name)
+            if method is None:
+                raise Exception(f"[Semantic] Entidade {entity.name} não tem método {node.name}")
+            params = method.children[1:-1]
+            if len(params) != len(args):
+                raise Exception(f"[Semantic] Chamada a {node.name} com número incorreto de argumentos")
+            node.method = method
+            node.static_ok = True
+            for t, p in zip(types, params):
+                if not self.assignable(p.value, t):
+                    raise Exception(f"[Semantic] Tipo de argumento incompatível na chamada de {node.name}")
+                if not self.exact(p.value, t):
+                    node.static_ok = False
+            return method.value if method.value is not None else "void"
+        raise Exception(f"[Semantic] Expressão desconhecida: {type(node).__name__}")
+
+    @staticmethod
+    def trust(node):
+        # modo confiável: troca a classe do nó pela variante sem checagens onde foi
+        # provado. Trocar a classe (e não node.evaluate) mantém os caches de método
+        # do interpretador Python valendo nas chamadas evaluate dos nós.
+        for c in node.children:
+            TypeChecker.trust(c)
+        if isinstance(node, FuncCall):
+            if node.static_ok and node.decl.value.static_ok:
+                node.__class__ = trusted_class(FuncCall)
+        elif isinstance(node, MethodCall):
+            if node.static_ok and node.method.static_ok:
+                node.__class__ = trusted_class(MethodCall)
+        elif node.static_ok and hasattr(node, "evaluate_trusted"):
+            node.__class__ = trusted_class(type(node))
+
+TRUSTED_CLASSES = {}
+
+def trusted_class(cls):
+    trusted = TRUSTED_CLASSES.get(cls)
+    if trusted is None:
+        attrs = {"evaluate": cls.evaluate_trusted}
+        if hasattr(cls, "evaluate_raw_trusted"):
+            # valor já provado: quem consome recebe o primitivo, sem Variable
+            attrs["evaluate_raw"] = cls.evaluate_raw_trusted
+        trusted = TRUSTED_CLASSES[cls] = type("Trusted" + cls.__name__, (cls,), attrs)
+    return trusted
+
+LITERALS = (NumberVal, BooleanVal, StringVal)
+
+def make_literal(value, v_type):
+    if v_type == "number":
+        node = NumberVal(value)
+    elif v_type == "boolean":
+        node = BooleanVal(value)
+    else:
+        node = StringVal(value)
+    node.static_type = v_type
+    node.static_ok = True
+    return node
+
+class Optimizer:
+    # Passo entre a análise semântica e a execução: dobra subárvores constantes,
+    # propaga globais escalares nunca reatribuídas e remove ramos de if/until
+    # inalcançáveis, NoOps e comandos após um return.
+    def __init__(self):
+        self.constants = {}
+        self.written = set()
+        self.folded = 0
+        self.propagated = 0
+        self.removed = 0
+
+    def optimize(self, root: Block, st: SymbolTable):
+        self.collect_writes(root, st)
+        root.children = self.block(root.children, top_level=True)
+        return root
+
+    def collect_writes(self, node, st):
+        if isinstance(node, Assignment):
+            self.written.add(node.children[0].decl)
+        elif isinstance(node, IndexAssign) or (isinstance(node, ArrayBuiltin) and ARRAY_BUILTINS[node.value][2]):
+            base = node.children[0]
+            while isinstance(base, ArrayAccess):
+                base = base.children[0]
+            self.written.add(base.decl)
+        elif isinstance(node, Action) and node.value == "attack":
+            if node.children:
+                self.written.add(node.children[0].decl)
+            elif "enemy_hp" in st._table:
+                self.written.add(st._table["enemy_hp"])
+        elif isinstance(node, Action) and node.value == "use" and "health" in st._table:
+            # use("potion") altera 'health' pelo nome
+            self.written.add(st._table["health"])
+        for c in node.children:
+            self.collect_writes(c, st)
+
+    def block(self, nodes, top_level=False):
+        result = []
+        for i, node in enumerate(nodes):
+            node = self.stmt(node)
+            if isinstance(node, NoOp) or (isinstance(node, Block) and not node.children):
+                self.removed += 1
+                continue
+            result.append(node)
+            if top_level and isinstance(node, VarDec):
+                self.register_constant(node)
+            if isinstance(node, Return):
+                self.removed += len(nodes) - i - 1
+                break
+        return result
+
+    def register_constant(self, node: VarDec):
+        ident = node.children[0]
+        if len(node.children) == 2 and isinstance(node.children[1], LITERALS) and ident.decl not in self.written:
+            self.constants[ident.decl] = node.children[1]
+
+    def stmt(self, node):
+        if isinstance(node, Block):
+            node.children = self.block(node.children)
+        elif isinstance(node, (VarDec, Assignment)):
+            if len(node.children) == 2:
+                node.children[1] = self.expr(node.children[1])
+        elif isinstance(node, IndexAssign):
+            if isinstance(node.children[0], ArrayAccess):
+                node.children[0] = self.expr(node.children[0])
+            node.children[1:] = [self.expr(c) for c in node.children[1:]]
+        elif isinstance(node, FuncDec):
+            body = node.children[-1]
+            body.children = self.block(body.children)
+        elif isinstance(node, EntityDec):
+            # campos não são constantes: só os inicializadores e métodos são otimizados
+            for member in node.children:
+                self.stmt(member)
+        elif isinstance(node, If):
+            cond = node.children[0] = self.expr(node.children[0])
+            if isinstance(cond, BooleanVal):
+                self.removed += 1
+                if cond.value:
+                    return self.stmt(node.children[1])
+                if len(node.children) == 3:
+                    return self.stmt(node.children[2])
+                return NoOp()
+            for i in range(1, len(node.children)):
+                node.children[i] = self.stmt(node.children[i])
+        elif isinstance(node, Until):
+            cond = node.children[0] = self.expr(node.children[0])
+            if isinstance(cond, BooleanVal) and not cond.value:
+                self.removed += 1
+                return NoOp()
+            node.children[1] = self.stmt(node.children[1])
+        elif isinstance(node, Return):
+            if node.children:
+                node.children[0] = self.expr(node.children[0])
+        elif isinstance(node, Action):
+            for i, arg in enumerate(node.children):
+                # alvo de attack e nomes de item em gather/use não são leituras
+                if isinstance(arg, Identifier) and (node.value in ("gather", "use") or (node.value == "attack" and i == 0)):
+                    continue
+                node.children[i] = self.expr(arg)
+        elif not isinstance(node, NoOp):
+            return self.expr(node)
         return node
 
+    def expr(self, node):
+        if isinstance(node, Identifier):
+            const = self.constants.get(node.decl)
+            if const is None:
+                return node
+            self.propagated += 1
+            return make_literal(const.value, const.static_type)
+        if isinstance(node, (ArrayAccess, LenCall)):
+            # a base é sempre um array, que nunca é propagado; em grid[i][j] ela é
+            # outro acesso, cujo índice ainda pode ser dobrado
+            if isinstance(node.children[0], ArrayAccess):
+                node.children[0] = self.expr(node.children[0])
+            node.children[1:] = [self.expr(c) for c in node.children[1:]]
+            return node
+        node.children = [self.expr(c) for c in node.children]
+        if not node.static_ok or not all(isinstance(c, LITERALS) for c in node.children):
+            return node
+        if isinstance(node, BinOp):
+            left, right = node.children
+            if node.value == "/" and right.value == 0:
+                # mantém o erro de divisão por zero para a execução
+                return node
+            self.folded += 1
+            return make_literal(BINOP_FUNCS[node.value](left.value, right.value), node.static_type)
+        if isinstance(node, UnOp) and node.value in ("-", "!"):
+            self.folded += 1
+            value = node.children[0].value
+            return make_literal(-value if node.value == "-" else not value, node.static_type)
+        return node
+
+    def report(self) -> str:
+        return f"// otimizador: {self.folded} expressões dobradas, {self.propagated} constantes propagadas, {self.removed} comandos removidos"
+
+def to_source(node, indent=0) -> str:
+    # reescreve a árvore como código Level (usado por --dump-optimized)
+    pad = "    " * indent
+    if isinstance(node, Block):
+        return "".join(to_source(c, indent) for c in node.children)
+    if isinstance(node, VarDec):
+        text = f"{node.children[0].name}: {node.value}"
+        if len(node.children) == 2:
+            text += f" = {expr_source(node.children[1])}"
+        return f"{pad}{text};\n"
+    if isinstance(node, Assignment):
+        return f"{pad}{node.children[0].name} = {expr_source(node.children[1])};\n"
+    if isinstance(node, IndexAssign):
+        target, index, expr = node.children
+        return f"{pad}{expr_source(target)}[{expr_source(index)}] = {expr_source(expr)};\n"
+    if isinstance(node, FieldAssign):
+        return f"{pad}{expr_source(node.children[0])}.{node.value} = {expr_source(node.children[1])};\n"
+    if isinstance(node, EntityDec):
+        members = "".join(to_source(m, indent + 1) for m in node.children)
+        return f"{pad}entity {node.name} {{\n{members}{pad}}}\n"
+    if isinstance(node, FuncDec):
+        params = ", ".join(f"{p.children[0].name}: {p.value}" for p in node.children[1:-1])
+        ret = f": {node.value}" if node.value is not None else ""
+        return f"{pad}func {node.name}({params}){ret} {{\n{to_source(node.children[-1], indent + 1)}{pad}}}\n"
+    if isinstance(node, If):
+        text = f"{pad}if ({expr_source(node.children[0])}) {{\n{to_source(node.children[1], indent + 1)}{pad}}}"
+        if len(node.children) == 3:
+            text += f" else {{\n{to_source(node.children[2], indent + 1)}{pad}}}"
+        return text + "\n"
+    if isinstance(node, Until):
+        return f"{pad}until ({expr_source(node.children[0])}) {{\n{to_source(node.children[1], indent + 1)}{pad}}}\n"
+    if isinstance(node, Return):
+        if node.children:
+            return f"{pad}return {expr_source(node.children[0])};\n"
+        return f"{pad}return;\n"
+    if isinstance(node, Action):
+        return f"{pad}{node.value}({', '.join(expr_source(c) for c in node.children)});\n"
+    if isinstance(node, NoOp):
+        return f"{pad};\n"
+    return f"{pad}{expr_source(node)};\n"
+
+def expr_source(node) -> str:
+    if isinstance(node, NumberVal):
+        return str(node.value)
+    if isinstance(node, BooleanVal):
+        return "true" if node.value else "false"
+    if isinstance(node, StringVal):
+        return f'"{node.value}"'
+    if isinstance(node, Identifier):
+        return node.name
+    if isinstance(node, BinOp):
+        return f"({expr_source(node.children[0])} {node.value} {expr_source(node.children[1])})"
+    if isinstance(node, UnOp):
+        return f"{node.value}{expr_source(node.children[0])}"
+    if isinstance(node, (FuncCall, Construct)):
+        return f"{node.name}({', '.join(expr_source(c) for c in node.children)})"
+    if isinstance(node, FieldAccess):
+        return f"{expr_source(node.children[0])}.{node.value}"
+    if isinstance(node, MethodCall):
+        return f"{expr_source(node.children[0])}.{node.name}({', '.join(expr_source(c) for c in node.children[1:])})"
+    if isinstance(node, ArrayAccess):
+        return f"{expr_source(node.children[0])}[{expr_source(node.children[1])}]"
+    if isinstance(node, ArrayLiteral):
+        return f"[{', '.join(expr_source(c) for c in node.children)}]"
+    if isinstance(node, LenCall):
+        return f"len({expr_source(node.children[0])})"
+    if isinstance(node, GlobalInput):
+        return expr_source(node.children[0])
+    if isinstance(node, ArrayBuiltin):
+        return f"{node.value}({', '.join(expr_source(c) for c in node.children)})"
+    raise Exception(f"[Dump] Nó desconhecido: {type(node).__name__}")
+
+# ---------- Bytecode: compilação da árvore e execução na GameVM ----------
+
+(OP_CONST, OP_LOAD_LOCAL, OP_LOAD, OP_STORE_LOCAL, OP_STORE, OP_DECLARE,
+ OP_DECLARE_FUNC, OP_POP,
+ OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_EQ, OP_NE, OP_LT, OP_GT, OP_LE, OP_GE,
+ OP_AND, OP_OR, OP_NEG, OP_NOT, OP_JUMP, OP_JUMP_IF_FALSE,
+ OP_CALL, OP_RETURN, OP_ARRAY, OP_INDEX,
+ OP_LEN, OP_SAY, OP_MOVE, OP_WAIT, OP_ATTACK, OP_GATHER, OP_USE,
+ OP_HALT,
+ # variantes sem checagem de tipo, emitidas no modo confiável (--trusted)
+ OP_BINARY, OP_JUMP_UNLESS, OP_STORE_LOCAL_FAST, OP_DECLARE_FAST,
+ OP_INDEX_FAST, OP_CALL_FAST,
+ # escrita de elementos: arr[i] = x
+ OP_LOAD_OWNED, OP_INDEX_OWNED, OP_STORE_INDEX, OP_SHARE,
+ # sum, count, index_of, fill, add, scale
+ OP_ARRAY_BUILTIN,
+ # entities: Monster(...), m.campo, m.campo = x, m.metodo(...)
+ OP_NEW, OP_FIELD, OP_FIELD_FAST, OP_STORE_FIELD, OP_STORE_FIELD_FAST,
+ OP_CALL_METHOD,
+ # valor inicial de global vindo de Program.run
+ OP_INPUT,
+ # --profile: conta uma execução do corpo de função ou until
+ OP_COUNT) = range(55)
+
+OP_NAMES = [
+    "CONST", "LOAD_LOCAL", "LOAD", "STORE_LOCAL", "STORE", "DECLARE",
+    "DECLARE_FUNC", "POP",
+    "ADD", "SUB", "MUL", "DIV", "EQ", "NE", "LT", "GT", "LE", "GE",
+    "AND", "OR", "NEG", "NOT", "JUMP", "JUMP_IF_FALSE",
+    "CALL", "RETURN", "ARRAY", "INDEX",
+    "LEN", "SAY", "MOVE", "WAIT", "ATTACK", "GATHER", "USE",
+    "HALT",
+    "BINARY", "JUMP_UNLESS", "STORE_LOCAL_FAST", "DECLARE_FAST",
+    "INDEX_FAST", "CALL_FAST",
+    "LOAD_OWNED", "INDEX_OWNED", "STORE_INDEX", "SHARE",
+    "ARRAY_BUILTIN",
+    "NEW", "FIELD", "FIELD_FAST", "STORE_FIELD", "STORE_FIELD_FAST",
+    "CALL_METHOD",
+    "INPUT",
+    "COUNT",
+]
+
+BINOP_CODES = {
+    "+": OP_ADD, "-": OP_SUB, "*": OP_MUL, "/": OP_DIV,
+    "==": OP_EQ, "!=": OP_NE, "<": OP_LT, ">": OP_GT, "<=": OP_LE, ">=": OP_GE,
+    "&&": OP_AND, "||": OP_OR,
+}
+BINOP_SYMBOLS = {code: symbol for symbol, code in BINOP_CODES.items()}
+
+# modos do OP_RETURN
+RET_VOID, RET_VALUE, RET_END = 0, 1, 2
+
+def type_of(value):
+    # tipo Level de um valor Python cru (a GameVM não empacota em Variable)
+    if value is True or value is False:
+        return "boolean"
+    if type(value) is int:
+        return "number"
+    if type(value) is str:
+        return "text"
+    if value.__class__ in ARRAY_CLASSES:
+        return value.type
+    if value.__class__ is Instance:
+        return value.entity.name
+    if value is None:
+        return "void"
+    return "func"
+
+class CodeObject:
+    def __init__(self, name):
+        self.name = name
+        self.instructions = []
+        # nome do símbolo por instrução, só para mensagens de erro e dump
+        self.names = {}
+        # (início, fim, nó) das instruções de cada comando e expressão, para o
+        # Profiler e locate
+        self.sites = []
+    def emit(self, op, arg=None, name=None) -> int:
+        self.instructions.append((op, arg))
+        if name is not None:
+            self.names[len(self.instructions) - 1] = name
+        return len(self.instructions) - 1
+    def patch(self, index, arg) -> None:
+        self.instructions[index] = (self.instructions[index][0], arg)
+    def dump(self) -> str:
+        lines = [f"code {self.name}:"]
+        for i, (op, arg) in enumerate(self.instructions):
+            line = f"  {i:4d} {OP_NAMES[op]}"
+            if callable(arg):
+                line += f" {arg.__name__}"
+            elif arg is not None and not isinstance(arg, Node):
+                line += f" {arg!r}"
+            if i in self.names:
+                line += f"  ; {self.names[i]}"
+            lines.append(line)
+        return "\n".join(lines)
+
+class Compiler:
+    # Traduz a árvore de Parser.run() em CodeObjects; funções são compiladas sob demanda.
+    # Com trusted=True, nós com static_ok usam instruções sem checagem de tipo.
+    # Cada nó registra no CodeObject o trecho de instruções que gerou (ver
+    # CodeObject.sites); com um Profiler, corpos contados emitem OP_COUNT.
+    def __init__(self, trusted=False, profiler=None):
+        self.functions = {}
+        self.trusted = trusted
+        self.profiler = profiler
+        # um Program compartilha o Compiler entre threads: cada função é compilada uma vez
+        self.lock = threading.Lock()
+
+    def compile_program(self, root) -> CodeObject:
+        code = CodeObject("<program>")
+        self.stmt(root, code)
+        code.emit(OP_HALT)
+        return code
+
+    def compile_function(self, func_node) -> CodeObject:
+        code = self.functions.get(func_node.id)
+        if code is None:
+            with self.lock:
+                code = self.functions.get(func_node.id)
+                if code is None:
+                    code = CodeObject(func_node.name)
+                    self.stmt(func_node.children[-1], code)
+                    code.emit(OP_RETURN, RET_END)
+                    self.functions[func_node.id] = code
+        return code
+
+    def stmt(self, node, code):
+        start = len(code.instructions)
+        self.statement(node, code)
+        code.sites.append((start, len(code.instructions), node))
+
+    def statement(self, node, code):
+        if isinstance(node, Block):
+            # escopos já foram resolvidos em slots: o bloco não gera instruções próprias
+            if self.profiler is not None and hasattr(node, "count"):
+                code.emit(OP_COUNT, node)
+            for c in node.children:
+                self.stmt(c, code)
+        elif isinstance(node, VarDec):
+            if len(node.children) != 2:
+                raise Exception(f"[Semantic] Inicializador inválido")
+            self.expr(node.children[1], code)
+            ident = node.children[0]
+            op = OP_DECLARE_FAST if self.trusted and node.static_ok else OP_DECLARE
+            code.emit(op, (ident.slot, node.value), ident.name)
+        elif isinstance(node, Assignment):
+            ident = node.children[0]
+            if not isinstance(ident, Identifier):
+                raise Exception("[Semantic] Lado esquerdo da atribuição deve ser um identificador")
+            self.expr(node.children[1], code)
+            if ident.depth == 0 and self.trusted and node.static_ok:
+                code.emit(OP_STORE_LOCAL_FAST, ident.slot, ident.name)
+            elif ident.depth == 0:
+                code.emit(OP_STORE_LOCAL, ident.slot, ident.name)
+            else:
+                code.emit(OP_STORE, (ident.depth, ident.slot), ident.name)
+        elif isinstance(node, IndexAssign):
+            target, index, expr = node.children
+            self.expr(expr, code)
+            if expr.static_type == ANY or is_array_type(expr.static_type):
+                # marcado antes de o alvo ser copiado (ver IndexAssign.evaluate)
+                code.emit(OP_SHARE)
+            self.expr(index, code)
+            self.owned(target, code)
+            code.emit(OP_STORE_INDEX, None, expr_source(target))
+        elif isinstance(node, FieldAssign):
+            obj, expr = node.children
+            self.expr(expr, code)
+            self.expr(obj, code)
+            if self.trusted and node.static_ok:
+                code.emit(OP_STORE_FIELD_FAST, node.slot, node.value)
+            else:
+                code.emit(OP_STORE_FIELD, node.value)
+        elif isinstance(node, FuncDec):
+            code.emit(OP_DECLARE_FUNC, node)
+        elif isinstance(node, EntityDec):
+            # o layout é estático (ver EntityDec.evaluate); métodos são compilados sob demanda
+            pass
+        elif isinstance(node, If):
+            self.expr(node.children[0], code)
+            jump_else = self.cond_jump(node, code)
+            self.stmt(node.children[1], code)
+            if len(node.children) == 3:
+                jump_end = code.emit(OP_JUMP, None)
+                self.patch_cond(node, code, jump_else, "if")
+                self.stmt(node.children[2], code)
+                code.patch(jump_end, len(code.instructions))
+            else:
+                self.patch_cond(node, code, jump_else, "if")
+        elif isinstance(node, Until):
+            start = len(code.instructions)
+            self.expr(node.children[0], code)
+            jump_end = self.cond_jump(node, code)
+            self.stmt(node.children[1], code)
+            code.emit(OP_JUMP, start)
+            self.patch_cond(node, code, jump_end, "until")
+        elif isinstance(node, Return):
+            if len(node.children) == 0:
+                code.emit(OP_RETURN, RET_VOID)
+            else:
+                self.expr(node.children[0], code)
+                code.emit(OP_RETURN, RET_VALUE)
+        elif isinstance(node, Action):
+            self.action(node, code)
+        elif isinstance(node, NoOp):
+            pass
+        else:
+            # expressão usada como comando (ex.: chamada de função)
+            self.expr(node, code)
+            code.emit(OP_POP)
+
+    def cond_jump(self, node, code) -> int:
+        if self.trusted and node.static_ok:
+            return code.emit(OP_JUMP_UNLESS, None)
+        return code.emit(OP_JUMP_IF_FALSE, None)
+
+    def patch_cond(self, node, code, index, kind):
+        if self.trusted and node.static_ok:
+            code.patch(index, len(code.instructions))
+        else:
+            code.patch(index, (len(code.instructions), kind))
+
+    def action(self, node, code):
+        kind = node.value
+        args = node.children
+        if kind in ("say", "move", "wait"):
+            if len(args) != 1:
+                raise Exception(f"[Semantic] Ação '{kind}' requer exatamente 1 argumento")
+            self.expr(args[0], code)
+            code.emit({"say": OP_SAY, "move": OP_MOVE, "wait": OP_WAIT}[kind])
+        elif kind == "attack":
+            if len(args) > 2:
+                raise Exception("[Semantic] attack aceita 0, 1 ou 2 argumentos")
+            if len(args) == 0:
+                # attack() procura 'enemy_hp' global pelo nome, em tempo de execução
+                code.emit(OP_ATTACK, (None, None, 0), "enemy_hp")
+                return
+            if not isinstance(args[0], Identifier):
+                raise Exception("[Semantic] Primeiro argumento de attack deve ser Identifier")
+            if len(args) == 2:
+                self.expr(args[1], code)
+            code.emit(OP_ATTACK, (args[0].depth, args[0].slot, len(args)), args[0].name)
+        elif kind in ("gather", "use"):
+            if len(args) != 1:
+                raise Exception(f"[Semantic] {kind} espera 1 argumento")
+            op = OP_GATHER if kind == "gather" else OP_USE
+            # Identifier vira o próprio nome do item; outras expressões são avaliadas
+            if isinstance(args[0], Identifier):
+                code.emit(op, args[0].name)
+            else:
+                self.expr(args[0], code)
+                code.emit(op, None)
+        else:
+            raise Exception(f"[Semantic] Ação desconhecida: {kind}")
+
+    def owned(self, node, code):
+        # empilha o array alvo de uma escrita, já sem compartilhamento
+        if isinstance(node, Identifier):
+            code.emit(OP_LOAD_OWNED, (node.depth, node.slot), node.name)
+        elif isinstance(node, ArrayAccess):
+            self.owned(node.children[0], code)
+            self.expr(node.children[1], code)
+            code.emit(OP_INDEX_OWNED)
+        else:
+            raise Exception("[Semantic] Tentativa de acessar não-array")
+
+    def expr(self, node, code):
+        start = len(code.instructions)
+        self.expression(node, code)
+        code.sites.append((start, len(code.instructions), node))
+
+    def expression(self, node, code):
+        if isinstance(node, NumberVal):
+            code.emit(OP_CONST, node.value)
+        elif isinstance(node, BooleanVal):
+            code.emit(OP_CONST, bool(node.value))
+        elif isinstance(node, StringVal):
+            code.emit(OP_CONST, node.value)
+        elif isinstance(node, Identifier):
+            if node.depth == 0:
+                code.emit(OP_LOAD_LOCAL, node.slot, node.name)
+            else:
+                code.emit(OP_LOAD, (node.depth, node.slot), node.name)
+        elif isinstance(node, BinOp):
+            if node.value not in BINOP_CODES:
+                raise Exception(f"[Semantic] Operador binário desconhecido: {node.value}")
+            self.expr(node.children[0], code)
+            self.expr(node.children[1], code)
+            if self.trusted and node.static_ok:
+                code.emit(OP_BINARY, BINOP_FUNCS[node.value])
+            else:
+                code.emit(BINOP_CODES[node.value])
+        elif isinstance(node, UnOp):
+            self.expr(node.children[0], code)
+            if node.value == "-":
+                code.emit(OP_NEG)
+            elif node.value == "!":
+                code.emit(OP_NOT)
+        elif isinstance(node, FuncCall):
+            for arg in node.children:
+                self.expr(arg, code)
+            op = OP_CALL_FAST if self.trusted and node.static_ok and node.decl.value.static_ok else OP_CALL
+            code.emit(op, (node.depth, node.slot, len(node.children)), node.name)
+        elif isinstance(node, ArrayAccess):
+            self.expr(node.children[0], code)
+            self.expr(node.children[1], code)
+            code.emit(OP_INDEX_FAST if self.trusted and node.static_ok else OP_INDEX)
+        elif isinstance(node, ArrayLiteral):
+            for element in node.children:
+                self.expr(element, code)
+            code.emit(OP_ARRAY, len(node.children))
+        elif isinstance(node, LenCall):
+            self.expr(node.children[0], code)
+            code.emit(OP_LEN)
+        elif isinstance(node, ArrayBuiltin):
+            if ARRAY_BUILTINS[node.value][2]:
+                target, arg = node.children
+                self.expr(arg, code)
+                if arg.static_type == ANY or is_array_type(arg.static_type):
+                    code.emit(OP_SHARE)
+                self.owned(target, code)
+            else:
+                for arg in node.children:
+                    self.expr(arg, code)
+            code.emit(OP_ARRAY_BUILTIN, (node.value, len(node.children)))
+        elif isinstance(node, Construct):
+            for arg in node.children:
+                self.expr(arg, code)
+            code.emit(OP_NEW, (node.decl.value, node.depth, len(node.children)), node.name)
+        elif isinstance(node, FieldAccess):
+            self.expr(node.children[0], code)
+            if self.trusted and node.static_ok:
+                code.emit(OP_FIELD_FAST, node.slot, node.value)
+            else:
+                code.emit(OP_FIELD, node.value)
+        elif isinstance(node, MethodCall):
+            for arg in node.children:
+                self.expr(arg, code)
+            code.emit(OP_CALL_METHOD, len(node.children) - 1, node.name)
+        elif isinstance(node, GlobalInput):
+            # com o valor vindo de fora, salta o inicializador original
+            jump = code.emit(OP_INPUT, None, node.value)
+            self.expr(node.children[0], code)
+            code.patch(jump, (node.value, len(code.instructions)))
+        else:
+            raise Exception(f"[Semantic] Expressão não suportada pelo compilador: {type(node).__name__}")
+
+class GameVM:
+    # Laço de despacho único: chamadas empilham quadros em vez de recursão Python
+    def __init__(self, compiler):
+        self.compiler = compiler
+
+    def run(self, code: CodeObject, frame: Frame):
+        compiler = self.compiler
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        frames = []
+        instrs = code.instructions
+        slots = frame.slots
+        func_node = None
+        output = frame.root().output
+        line = output.line
+        clock = frame.root().clock
+        pc = 0
+        while True:
+            op, arg = instrs[pc]
+            pc += 1
+            if op == OP_LOAD_LOCAL:
+                var = slots[arg]
+                if var is None:
+                    raise Exception(f"[Semantic] Variável não declarada: {code.names[pc - 1]}")
+                push(var.value)
+            elif op == OP_CONST:
+                push(arg)
+            elif op == OP_BINARY:
+                right = pop()
+                stack[-1] = arg(stack[-1], right)
+            elif op == OP_JUMP_UNLESS:
+                if not pop():
+                    pc = arg
+            elif op == OP_STORE_LOCAL_FAST:
+                slots[arg].value = share(pop())
+            elif op == OP_STORE_LOCAL or op == OP_STORE:
+                value = pop()
+                if op == OP_STORE_LOCAL:
+                    target = slots[arg]
+                else:
+                    target = frame.up(arg[0]).slots[arg[1]]
+                name = code.names[pc - 1]
+                if target is None:
+                    raise Exception(f"[Semantic] Variável não declarada: {name}")
+                if target.is_function:
+                    raise Exception(f"[Semantic] Não é possível atribuir a função {name}")
+                if target.type != type_of(value):
+                    if not compatible(target.type, type_of(value)):
+                        raise Exception(f"[Semantic] Tipo incompatível para variável {name}: esperado {target.type}, obtido {type_of(value)}")
+                    value = coerce(value, target.type)
+                target.value = share(value)
+            elif op == OP_LOAD:
+                push(frame.load(arg[0], arg[1], code.names[pc - 1]).value)
+            elif op <= OP_DIV and op >= OP_ADD:
+                right = pop()
+                left = pop()
+                if type(left) is not int or type(right) is not int:
+                    raise Exception(f"[Semantic] Operação {BINOP_SYMBOLS[op]} requer números")
+                if op == OP_ADD:
+                    push(left + right)
+                elif op == OP_SUB:
+                    push(left - right)
+                elif op == OP_MUL:
+                    push(left * right)
+                else:
+                    if right == 0:
+                        raise Exception("[Semantic] Divisão por zero")
+                    push(left // right)
+            elif op <= OP_GE and op >= OP_EQ:
+                right = pop()
+                left = pop()
+                if type(left) is not type(right):
+                    raise Exception(f"[Semantic] Operação {BINOP_SYMBOLS[op]} requer tipos iguais")
+                if op == OP_LT:
+                    push(left < right)
+                elif op == OP_GT:
+                    push(left > right)
+                elif op == OP_LE:
+                    push(left <= right)
+                elif op == OP_GE:
+                    push(left >= right)
+                elif op == OP_EQ:
+                    push(left == right)
+                else:
+                    push(left != right)
+            elif op == OP_JUMP_IF_FALSE:
+                cond = pop()
+                if cond is not True and cond is not False:
+                    raise Exception(f"[Semantic] Condição do {arg[1]} deve ser booleana")
+                if not cond:
+                    pc = arg[0]
+            elif op == OP_JUMP:
+                pc = arg
+            elif op == OP_COUNT:
+                # --profile: roda a cada iteração de until, então fica perto do JUMP
+                arg.count += 1
+            elif op == OP_CALL:
+                depth, slot, argc = arg
+                name = code.names[pc - 1]
+                def_frame = frame.up(depth)
+                var = def_frame.slots[slot]
+                if var is None:
+                    raise Exception(f"[Semantic] Variável não declarada: {name}")
+                if not var.is_function:
+                    raise Exception(f"[Semantic] {name} não é uma função ou não foi declarada")
+                callee = var.value
+                if callee.arity != argc:
+                    raise Exception(f"[Semantic] Chamada a {name} com número incorreto de argumentos")
+                new_frame = Frame(callee.frame_size, parent=def_frame)
+                base = len(stack) - argc
+                for value, (pslot, ptype) in zip(stack[base:], callee.params):
+                    if type_of(value) != ptype:
+                        if not compatible(ptype, type_of(value)):
+                            raise Exception(f"[Semantic] Tipo de argumento incompatível na chamada de {name}")
+                        value = coerce(value, ptype)
+                    new_frame.slots[pslot] = Variable(lend(value, new_frame), ptype, (pslot + 1) * 4)
+                del stack[base:]
+                frames.append((code, pc, frame, func_node))
+                code = compiler.compile_function(callee)
+                instrs = code.instructions
+                pc = 0
+                frame = new_frame
+                slots = frame.slots
+                func_node = callee
+            elif op == OP_CALL_FAST:
+                # aridade e tipos dos argumentos já provados pelo TypeChecker
+                depth, slot, argc = arg
+                def_frame = frame.up(depth)
+                var = def_frame.slots[slot]
+                if var is None:
+                    raise Exception(f"[Semantic] Variável não declarada: {code.names[pc - 1]}")
+                callee = var.value
+                new_frame = Frame(callee.frame_size, parent=def_frame)
+                new_slots = new_frame.slots
+                base = len(stack) - argc
+                for value, (pslot, ptype) in zip(stack[base:], callee.params):
+                    new_slots[pslot] = Variable(lend(value, new_frame), ptype, (pslot + 1) * 4)
+                del stack[base:]
+                frames.append((code, pc, frame, func_node))
+                code = compiler.compile_function(callee)
+                instrs = code.instructions
+                pc = 0
+                frame = new_frame
+                slots = new_slots
+                func_node = callee
+            elif op == OP_RETURN:
+                if func_node is None:
+                    # return fora de função encerra o programa
+                    return None
+                if func_node.value is None:
+                    if arg == RET_VALUE:
+                        pop()
+                    result = None
+                elif arg == RET_END:
+                    raise Exception(f"[Semantic] Função {func_node.name} espera retornar {func_node.value} mas não encontrou return")
+                else:
+                    result = pop() if arg == RET_VALUE else None
+                    if type_of(result) != func_node.value:
+                        if not compatible(func_node.value, type_of(result)):
+                            raise Exception(f"[Semantic] Tipo de retorno incompatível em {func_node.name}")
+                        result = coerce(result, func_node.value)
+                if frame.loans is not None:
+                    release(frame)
+                code, pc, frame, func_node = frames.pop()
+                instrs = code.instructions
+                slots = frame.slots
+                push(result)
+            elif op == OP_POP:
+                pop()
+            elif op == OP_INDEX:
+                idx = pop()
+                array = pop()
+                if array.__class__ not in ARRAY_CLASSES:
+                    raise Exception("[Semantic] Tentativa de acessar não-array")
+                if type(idx) is not int:
+                    raise Exception("[Semantic] Índice de array deve ser number")
+                if idx < 0 or idx >= len(array):
+                    raise Exception("[Semantic] Índice fora do intervalo")
+                push(array[idx] == 1 if array.__class__ is BoolArray else array[idx])
+            elif op == OP_AND or op == OP_OR:
+                right = pop()
+                left = pop()
+                if type(left) is not bool or type(right) is not bool:
+                    raise Exception(f"[Semantic] Operação {'AND' if op == OP_AND else 'OR'} requer booleanos")
+                push((left and right) if op == OP_AND else (left or right))
+            elif op == OP_NEG:
+                value = pop()
+                if type(value) is not int:
+                    raise Exception("[Semantic] Operador '-' requer número")
+                push(-value)
+            elif op == OP_NOT:
+                value = pop()
+                if type(value) is not bool:
+                    raise Exception("[Semantic] Operador '!' requer booleano")
+                push(not value)
+            elif op == OP_SAY:
+                line(str(pop()))
+            elif op == OP_DECLARE:
+                slot, v_type = arg
+                value = pop()
+                if type_of(value) != v_type:
+                    if not compatible(v_type, type_of(value)):
+                        raise Exception(f"[Semantic] Tipo incompatível na declaração de {code.names[pc - 1]}: esperado {v_type}, obtido {type_of(value)}")
+                    value = coerce(value, v_type)
+                slots[slot] = Variable(share(value), v_type, (slot + 1) * 4)
+            elif op == OP_DECLARE_FAST:
+                slot, v_type = arg
+                slots[slot] = Variable(share(pop()), v_type, (slot + 1) * 4)
+            elif op == OP_INDEX_FAST:
+                idx = pop()
+                array = pop()
+                if idx < 0 or idx >= len(array):
+                    raise Exception("[Semantic] Índice fora do intervalo")
+                push(array[idx] == 1 if array.__class__ is BoolArray else array[idx])
+            elif op == OP_STORE_INDEX:
+                array = pop()
+                idx = pop()
+                value = pop()
+                if type(idx) is not int:
+                    raise Exception("[Semantic] Índice de array deve ser number")
+                if idx < 0 or idx >= len(array):
+                    raise Exception("[Semantic] Índice fora do intervalo")
+                store_element(array, idx, value, code.names[pc - 1])
+            elif op == OP_LOAD_OWNED:
+                var = frame.load(arg[0], arg[1], code.names[pc - 1])
+                if var.is_function or not is_array_type(var.type):
+                    raise Exception("[Semantic] Tentativa de acessar não-array")
+                push(owned(var))
+            elif op == OP_INDEX_OWNED:
+                idx = pop()
+                outer = stack[-1]
+                if type(idx) is not int:
+                    raise Exception("[Semantic] Índice de array deve ser number")
+                if idx < 0 or idx >= len(outer):
+                    raise Exception("[Semantic] Índice fora do intervalo")
+                inner = outer[idx]
+                if inner.__class__ not in ARRAY_CLASSES:
+                    raise Exception("[Semantic] Tentativa de acessar não-array")
+                if inner.shared or inner.borrowed:
+                    inner = outer[idx] = inner.copy()
+                stack[-1] = inner
+            elif op == OP_SHARE:
+                share(stack[-1])
+            elif op == OP_ARRAY_BUILTIN:
+                name, argc = arg
+                if ARRAY_BUILTINS[name][2]:
+                    # empilhados como valor e depois o alvo
+                    array = pop()
+                    stack[-1] = call_array_builtin(name, (array, stack[-1]))
+                else:
+                    args = stack[-argc:]
+                    del stack[-argc:]
+                    push(call_array_builtin(name, args))
+            elif op == OP_FIELD_FAST:
+                stack[-1] = stack[-1].slots[arg].value
+            elif op == OP_FIELD:
+                stack[-1] = instance_of(stack[-1], arg).field(arg).value
+            elif op == OP_STORE_FIELD_FAST:
+                instance = pop()
+                value = pop()
+                if value.__class__ in ARRAY_CLASSES:
+                    value.shared = True
+                instance.slots[arg].value = value
+            elif op == OP_STORE_FIELD:
+                instance = pop()
+                value = pop()
+                store_field(instance_of(instance, arg).field(arg), value, type_of(value), arg)
+            elif op == OP_NEW:
+                entity, depth, argc = arg
+                base = len(stack) - argc
+                instance = entity.instantiate(frame.up(depth), stack[base:])
+                del stack[base:]
+                push(instance)
+            elif op == OP_CALL_METHOD:
+                name = code.names[pc - 1]
+                base = len(stack) - arg
+                instance = instance_of(stack[base - 1], name)
+                callee = instance.entity.methods.get(name)
+                if callee is None:
+                    raise Exception(f"[Semantic] Entidade {instance.entity.name} não tem método {name}")
+                if callee.arity != arg:
+                    raise Exception(f"[Semantic] Chamada a {name} com número incorreto de argumentos")
+                new_frame = Frame(callee.frame_size, parent=instance)
+                for value, (pslot, ptype) in zip(stack[base:], callee.params):
+                    if type_of(value) != ptype:
+                        if not compatible(ptype, type_of(value)):
+                            raise Exception(f"[Semantic] Tipo de argumento incompatível na chamada de {name}")
+                        value = coerce(value, ptype)
+                    new_frame.slots[pslot] = Variable(lend(value, new_frame), ptype, (pslot + 1) * 4)
+                del stack[base - 1:]
+                frames.append((code, pc, frame, func_node))
+                code = compiler.compile_function(callee)
+                instrs = code.instructions
+                pc = 0
+                frame = new_frame
+                slots = frame.slots
+                func_node = callee
+            elif op == OP_INPUT:
+                name, target = arg
+                inputs = frame.inputs
+                if inputs is not None and name in inputs:
+                    push(inputs[name])
+                    pc = target
+            elif op == OP_DECLARE_FUNC:
+                slots[arg.slot] = Variable(arg, arg.value if arg.value is not None else "void", (arg.slot + 1) * 4, is_function=True)
+            elif op == OP_ARRAY:
+                if arg:
+                    elements = Array(map(share, stack[-arg:]))
+                    del stack[-arg:]
+                else:
+                    elements = Array()
+                push(elements)
+            elif op == OP_LEN:
+                array = pop()
+                if array.__class__ not in ARRAY_CLASSES:
+                    raise Exception("[Semantic] 'len' só pode ser aplicado a arrays")
+                push(len(array))
+            elif op == OP_ATTACK:
+                depth, slot, nargs = arg
+                name = code.names[pc - 1]
+                damage = pop() if nargs == 2 else 1
+                if nargs == 0:
+                    try:
+                        target = frame.get(name)
+                    except Exception:
+                        raise Exception("[Semantic] 'attack()' sem alvo requer variável global 'enemy_hp'")
+                else:
+                    target = frame.load(depth, slot, name)
+                if target.type != "number" or target.is_function or type(damage) is not int:
+                    if nargs == 0:
+                        raise Exception("[Semantic] 'enemy_hp' deve ser number")
+                    if nargs == 1:
+                        raise Exception("[Semantic] target deve ser number")
+                    raise Exception("[Semantic] attack(target,damage) requer números")
+                new_val = target.value - damage
+                target.value = new_val
+                if nargs == 2:
+                    line(f"Atacado com {damage}! {name} agora = {new_val}")
+                else:
+                    line(f"Atacado! {name} agora = {new_val}")
+                if new_val <= 0:
+                    line("Inimigo derrotado!")
+            elif op == OP_GATHER or op == OP_USE:
+                if arg is not None:
+                    item_name = arg
+                else:
+                    item_name = pop()
+                    if op == OP_GATHER and type(item_name) is not str:
+                        item_name = str(item_name)
+                if op == OP_GATHER:
+                    Action.gather(frame, item_name)
+                else:
+                    Action.use(frame, item_name)
+            elif op == OP_MOVE:
+                value = pop()
+                if type(value) is not int:
+                    raise Exception("[Semantic] Ação 'move' requer number")
+                line(f"Movendo {value} unidades")
+            elif op == OP_WAIT:
+                value = pop()
+                if type(value) is not int:
+                    raise Exception("[Semantic] Ação 'wait' requer number")
+                output.flush()
+                clock.wait(value)
+            elif op == OP_HALT:
+                return None
+            else:
+                raise Exception(f"[VM] Opcode desconhecido: {op}")
+
+# ---------- Cache em disco da árvore analisada ----------
+
+VERSION = "1.1"
+
+_interpreter_hash = None
+
+def interpreter_hash() -> str:
+    # muda sempre que o próprio interpretador muda, invalidando caches antigos
+    global _interpreter_hash
+    if _interpreter_hash is None:
+        with open(os.path.abspath(__file__), "rb") as f:
+            _interpreter_hash = hashlib.sha256(f.read()).hexdigest()
+    return _interpreter_hash
+
+COUNTED_CLASSES = {}
+
+def counted_class(cls):
+    # variante de um bloco que conta as próprias execuções (--profile); como em
+    # trusted_class, a troca é de classe, sem custo para os demais nós
+    counted = COUNTED_CLASSES.get(cls)
+    if counted is None:
+        base = cls.evaluate
+        def evaluate(self, frame):
+            self.count += 1
+            return base(self, frame)
+        counted = COUNTED_CLASSES[cls] = type("Counted" + cls.__name__, (cls,), {"evaluate": evaluate})
+    return counted
+
+# arquivo e código de GameVM.run, reconhecidos pelo Profiler na pilha Python
+MAIN_FILE = Node.evaluate.__code__.co_filename
+GAMEVM_RUN = GameVM.run.__code__
+
+class Profiler:
+    # --profile: profiler por amostragem. Uma thread acorda a cada `interval`
+    # segundos, lê a pilha Python da thread do programa e a traduz para a pilha
+    # Level: funções, laços until e o comando em execução (linhas de Parser.positions).
+    # O avaliador não é instrumentado; só os corpos de funções e de until contam
+    # execuções (chamadas e iterações), por troca de classe ou OP_COUNT.
+    # start() reduz o sys.setswitchinterval do processo inteiro até stop(): é uma
+    # ferramenta da linha de comando (main.run), não de Program em outras threads.
+    PROGRAM = ("função", "<programa>", None)
+
+    def __init__(self, tree, source: str, interval: float = 0.001):
+        self.positions = getattr(tree, "positions", None)
+        self.source = source.splitlines()
+        self.interval = interval
+        # Node.id -> entrada da pilha Level: (tipo, nome, linha)
+        self.sites = {}
+        self.bodies = []
+        self.stacks = {}
+        self.samples = 0
+        # amostras descartadas por erro ao ler a pilha da outra thread
+        self.lost = 0
+        self.elapsed = 0.0
+        self.code_sites = {}
+        self.instrument(tree)
+
+    def instrument(self, node, statement=False):
+        # depois de TypeChecker.trust: o bloco contado envolve a variante confiável.
+        # Só comandos (filhos de blocos) viram linhas; expressões ficam com a deles.
+        for c in node.children:
+            self.instrument(c, isinstance(node, Block))
+        line = self.positions.line(node.id) if self.positions is not None else None
+        if isinstance(node, FuncDec):
+            body = node.children[-1]
+            entry = ("função", node.name, line)
+            self.sites[body.id] = entry
+            self.count(body, entry)
+        if isinstance(node, Until):
+            entry = ("until", "until", line)
+            self.sites[node.id] = entry
+            if isinstance(node.children[1], Block):
+                self.count(node.children[1], entry)
+        elif statement and line is not None:
+            self.sites[node.id] = ("linha", "", line)
+
+    def count(self, block, entry):
+        block.count = 0
+        block.__class__ = counted_class(type(block))
+        self.bodies.append((entry, block))
+
+    def start(self):
+        self.target = threading.get_ident()
+        self.done = threading.Event()
+        # a thread de amostragem só roda quando o programa solta o GIL
+        self.switch = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.switch, self.interval))
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.done.set()
+        self.thread.join()
+        sys.setswitchinterval(self.switch)
+        self.elapsed = time.perf_counter() - self.started
+
+    def loop(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if frame is None:
+                continue
+            try:
+                self.sample(frame)
+            except Exception:
+                # a pilha muda enquanto é lida: perde esta amostra, não o perfil
+                self.lost += 1
+
+    def sample(self, frame):
+        # da pilha Python (de dentro para fora) para a pilha Level (de fora para dentro)
+        stack = []
+        sites = self.sites
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename == MAIN_FILE:
+                if code is GAMEVM_RUN:
+                    stack.extend(reversed(self.vm_stack(frame.f_locals)))
+                elif code.co_name.startswith("evaluate"):
+                    node = frame.f_locals.get("self")
+                    entry = sites.get(node.id) if isinstance(node, Node) else None
+                    if entry is not None and (not stack or stack[-1] is not entry):
+                        stack.append(entry)
+            frame = frame.f_back
+        stack.reverse()
+        key = tuple(stack)
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+    def vm_stack(self, local) -> list:
+        # GameVM: a pilha de chamadas está em `frames` e o comando, no pc de cada
+        # código. O laço avança pc logo ao ler a instrução, então a que está em
+        # execução é pc - 1; quem chamou guarda o pc de retorno, e a chamada também
+        # é pc - 1.
+        # O corpo da função também está em code.sites: como em sample, uma entrada
+        # igual à anterior não se repete.
+        entries = []
+        calls = [(code, pc - 1, func_node) for code, pc, _, func_node in local.get("frames", ())]
+        calls.append((local.get("code"), local.get("pc", 0) - 1, local.get("func_node")))
+        for code, pc, func_node in calls:
+            found = self.at(code, pc) if code is not None else ()
+            if func_node is not None:
+                found = (self.sites.get(func_node.children[-1].id),) + found
+            for entry in found:
+                if entry is not None and (not entries or entries[-1] is not entry):
+                    entries.append(entry)
+        return entries
+
+    def at(self, code, pc) -> tuple:
+        table = self.code_sites.get(code)
+        if table is None or len(table) < len(code.instructions):
+            # por instrução, as entradas que a contêm, da mais externa à mais interna
+            table = [[] for _ in code.instructions]
+            for start, end, node in sorted(code.sites, key=lambda s: (s[0], -s[1])):
+                entry = self.sites.get(node.id)
+                if entry is not None:
+                    for i in range(start, end):
+                        table[i].append(entry)
+            table = self.code_sites[code] = [tuple(t) for t in table]
+        return table[pc] if 0 <= pc < len(table) else ()
+
+    @staticmethod
+    def label(entry) -> str:
+        kind, name, line = entry
+        if kind == "função":
+            return name if line is None else f"{name}:{line}"
+        return f"{kind}:{line}"
+
+    def report(self) -> str:
+        total = max(self.samples, 1)
+        func_total, func_self, loop_total, line_self = {}, {}, {}, {}
+        for stack, n in self.stacks.items():
+            funcs = [self.PROGRAM] + [e for e in stack if e[0] == "função"]
+            for e in set(funcs):
+                func_total[e] = func_total.get(e, 0) + n
+            func_self[funcs[-1]] = func_self.get(funcs[-1], 0) + n
+            for e in set(e for e in stack if e[0] == "until"):
+                loop_total[e] = loop_total.get(e, 0) + n
+            lines = [e[2] for e in stack if e[2] is not None]
+            if lines:
+                line_self[lines[-1]] = line_self.get(lines[-1], 0) + n
+        counts = {entry: block.count for entry, block in self.bodies}
+        out = [f"Perfil: {self.samples} amostras em {self.elapsed:.3f} s (uma a cada {self.interval * 1000:g} ms)"]
+        if self.lost:
+            out.append(f"  {self.lost} amostras perdidas")
+        out.append("")
+        out.append(f"  {'total':>7} {'próprio':>8} {'chamadas':>10}  função")
+        # como nos until, funções chamadas aparecem mesmo sem amostras
+        funcs = set(func_total) | {e for e in counts if e[0] == "função"}
+        for e in sorted(funcs, key=lambda e: (-func_total.get(e, 0), -func_self.get(e, 0), e[2] or 0)):
+            calls = counts.get(e, "")
+            where = f" (linha {e[2]})" if e[2] is not None else ""
+            out.append(f"  {func_total.get(e, 0) / total:7.1%} {func_self.get(e, 0) / total:8.1%} {calls:>10}  {e[1]}{where}")
+        if loop_total or any(e[0] == "until" for e in counts):
+            out += ["", f"  {'total':>7} {'iterações':>10}  until"]
+            loops = set(loop_total) | {e for e in counts if e[0] == "until"}
+            for e in sorted(loops, key=lambda e: (-loop_total.get(e, 0), e[2] or 0)):
+                out.append(f"  {loop_total.get(e, 0) / total:7.1%} {counts.get(e, ''):>10}  linha {e[2]}")
+        if line_self:
+            out += ["", f"  {'próprio':>7}  linha"]
+            for line in sorted(line_self, key=lambda l: (-line_self[l], l))[:20]:
+                text = self.source[line - 1].strip() if 0 < line <= len(self.source) else ""
+                out.append(f"  {line_self[line] / total:7.1%}  {line:5d}  {text}")
+        return "\n".join(out)
+
+    def collapsed(self) -> str:
+        # formato "quadro;quadro;... amostras" do flamegraph.pl e do speedscope
+        lines = []
+        for stack, n in sorted(self.stacks.items(), key=lambda item: -item[1]):
+            frames = [self.label(self.PROGRAM)] + [self.label(e) for e in stack]
+            lines.append(f"{';'.join(frames)} {n}")
+        return "\n".join(lines) + "\n"
+
+def locate(exc, positions):
+    # Posição no fonte de um erro: o nó mais interno com posição na pilha Python
+    # do erro (self dos nós, `node` dos passos estáticos, pc da GameVM). Nada é
+    # guardado durante a execução; o traceback só é lido quando há erro.
+    found = None
+    tb = exc.__traceback__
+    while tb is not None:
+        frame = tb.tb_frame
+        code = frame.f_code
+        if code.co_filename == MAIN_FILE:
+            local = frame.f_locals
+            if code is GAMEVM_RUN:
+                # o comando mais interno (o menor trecho) que contém a instrução
+                # que falhou; um comando entra em sites antes do bloco que o contém
+                pc = local["pc"] - 1
+                best = None
+                for start, end, node in local["code"].sites:
+                    if start <= pc < end and (best is None or end - start < best[0]):
+                        position = positions.get(node.id)
+                        if position is not None:
+                            best = (end - start, position)
+                if best is not None:
+                    found = best[1]
+            else:
+                node = local.get("self")
+                if not isinstance(node, Node):
+                    node = local.get("node")
+                if isinstance(node, Node):
+                    found = positions.get(node.id) or found
+        tb = tb.tb_next
+    return found
+
+def with_position(exc, positions):
+    # acrescenta " (linha L, coluna C)" à mensagem de um erro do interpretador
+    if (type(exc) is Exception or isinstance(exc, CodegenUnsupported)) and getattr(exc, "position", None) is None:
+        position = locate(exc, positions)
+        if position is not None:
+            exc.position = position
+            exc.args = (f"{exc}{position_text(position)}",)
+    return exc
+
+# tipos de global que podem receber valor inicial de fora e o tipo Python esperado
+INPUT_TYPES = {"number": int, "boolean": bool, "text": str}
+
+def analyze(source: str, optimize: bool = True, inputs=()):
+    # Parser, Resolver, TypeChecker e Optimizer: a árvore pronta para executar.
+    # inputs são as globais do topo cujo valor inicial pode vir de fora (None:
+    # todas as number/boolean/text com inicializador); o otimizador não as
+    # propaga como constantes.
+    tree = Parser(Lexer(source)).run()
+    try:
+        return check(tree, optimize, inputs)
+    except Exception as e:
+        with_position(e, tree.positions)
+        raise
+
+def check(tree, optimize, inputs):
+    st = Resolver().resolve(tree)
+    TypeChecker().check(tree)
+    declared = {}
+    for decl in tree.children:
+        if isinstance(decl, VarDec) and len(decl.children) == 2 and decl.value in INPUT_TYPES:
+            declared.setdefault(decl.children[0].name, decl)
+    tree.inputs = {}
+    for name in (declared if inputs is None else inputs):
+        decl = declared.get(name)
+        if decl is None:
+            raise Exception(f"[Program] {name} não é uma global number, boolean ou text com valor inicial")
+        default = decl.children[1]
+        wrapped = decl.children[1] = GlobalInput(name, default)
+        wrapped.static_type = default.static_type
+        wrapped.static_ok = default.static_ok
+        tree.inputs[name] = decl.value
+    optimizer = None
+    if optimize:
+        optimizer = Optimizer()
+        optimizer.optimize(tree, st)
+    return tree, st, optimizer
+
+def plain_value(value):
+    # valor Level como dado Python comum: arrays viram listas e instâncias, dicts
+    if value.__class__ is BoolArray:
+        return [b == 1 for b in value]
+    if value.__class__ in ARRAY_CLASSES:
+        return [plain_value(v) for v in value]
+    if value.__class__ is Instance:
+        return {name: plain_value(value.slots[slot].value) for name, slot in value.entity.field_slots.items()}
+    return value
+
+class Program:
+    # Programa analisado uma vez e executável quantas vezes for preciso, de uma ou
+    # de várias threads. Cada execução tem o seu quadro global, Output, Clock e
+    # estoque de quadros (Frame.pools); a árvore não muda depois da construção e o
+    # bytecode de cada função é compilado uma vez, sob o lock do Compiler.
+    def __init__(self, tree, st, engine="tree", trusted=False):
+        if engine not in ("tree", "bytecode"):
+            raise ValueError(f"engine desconhecida: {engine}")
+        self.tree = tree
+        self.st = st
+        self.engine = engine
+        self.trusted = trusted
+        self.inputs = getattr(tree, "inputs", {})
+        self.compiler = None
+        if engine == "bytecode":
+            self.compiler = Compiler(trusted=trusted)
+            self.code = self.compiler.compile_program(tree)
+        elif trusted:
+            TypeChecker.trust(tree)
+
+    def check_globals(self, globals: dict) -> None:
+        for name, value in globals.items():
+            v_type = self.inputs.get(name)
+            if v_type is None:
+                raise Exception(f"[Program] {name} não é uma global de entrada do programa")
+            if type(value) is not INPUT_TYPES[v_type]:
+                raise Exception(f"[Program] Valor inválido para {name}: esperado {v_type}, obtido {value!r}")
+
+    def frame(self, globals=None, output=None, clock=None) -> Frame:
+        # quadro global de uma execução; output pode ser um Output ou um arquivo de texto
+        if globals:
+            self.check_globals(globals)
+            globals = dict(globals)
+        if output is not None and not isinstance(output, Output):
+            output = Output(output)
+        return Frame(self.tree.frame_size, names=self.tree.global_names, output=output, clock=clock, inputs=globals)
+
+    def execute(self, frame: Frame) -> None:
+        try:
+            if self.compiler is not None:
+                GameVM(self.compiler).run(self.code, frame)
+            else:
+                self.tree.evaluate(frame)
+        except Exception as e:
+            with_position(e, self.tree.positions)
+            raise
+
+    def globals_of(self, frame: Frame) -> dict:
+        # globais do programa (sem funções e entities) no fim ou no ponto de um erro
+        state = {}
+        for name, slot in self.tree.global_names.items():
+            var = frame.slots[slot]
+            if var is None or var.is_function or var.type == "entity":
+                continue
+            state[name] = plain_value(var.value)
+        return state
+
+    def run(self, globals=None, output=None, clock=None) -> dict:
+        frame = self.frame(globals, output, clock)
+        try:
+            self.execute(frame)
+        finally:
+            # o Output é do chamador: só esvazia o buffer, sem fechar
+            frame.output.flush()
+        return self.globals_of(frame)
+
+    def generate(self, filename: str, optimize: bool = True) -> None:
+        Code.generate(self.tree, filename, optimize)
+
+def compile_level(source: str, engine: str = "tree", trusted: bool = False,
+                  optimize: bool = True, inputs=None) -> Program:
+    # Ponto de entrada para embutir a GameVM: compila uma vez e devolve um
+    # Program; erros de análise são levantados como exceções, sem sys.exit.
+    tree, st, _ = analyze(source, optimize, inputs)
+    return Program(tree, st, engine, trusted)
+
+class ParseCache:
+    # No espírito do __pycache__: guarda em __levelcache__/<arquivo>.<chave>.pickle a
+    # árvore já passada por Parser, Resolver, TypeChecker e Optimizer.
+    # - Chave: sha256 do fonte, da versão da Level e do Python, do hash do próprio
+    #   main.py (interpreter_hash) e das opções que mudam a árvore; qualquer mudança
+    #   em um deles cai em outro arquivo.
+    # - Nome: <arquivo>.<8 hex das opções>.<24 hex da chave>.pickle.
+    # - Evicção: ao gravar, as outras entradas do mesmo arquivo com as mesmas
+    #   opções (fonte ou interpretador antigos) são apagadas; as de outras opções
+    #   (ex.: --no-optimize) ficam. O diretório guarda no máximo
+    #   max_entries entradas, descartando as usadas há mais tempo (mtime, que o
+    #   load atualiza).
+    # - Confiança: pickle.load executa o que estiver no arquivo. Como no
+    #   __pycache__, quem pode escrever em __levelcache__ pode executar código com
+    #   o interpretador; o diretório deve ter as mesmas permissões do fonte.
+    # O cache é só uma otimização: entrada ilegível, corrompida ou de formato
+    # inesperado conta como ausente e o fonte é analisado de novo.
+    dirname = "__levelcache__"
+    max_entries = 64
+    entry = re.compile(r"(.+)\.([0-9a-f]{8})\.[0-9a-f]{24}\.pickle")
+
+    def __init__(self, filename: str, source: str, options: str = ""):
+        self.directory = os.path.join(os.path.dirname(os.path.abspath(filename)), ParseCache.dirname)
+        self.stem = os.path.basename(filename)
+        self.options = hashlib.sha256(options.encode("utf-8")).hexdigest()[:8]
+        key = hashlib.sha256()
+        for part in (VERSION, sys.version, Node.__module__, interpreter_hash(), options, source):
+            key.update(part.encode("utf-8"))
+            key.update(b"\0")
+        self.path = os.path.join(self.directory, f"{self.stem}.{self.options}.{key.hexdigest()[:24]}.pickle")
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            # ausente ou ilegível (permissão, E/S): só reanalisa
+            return None
+        try:
+            tree, st, last_id = pickle.loads(data)
+            if not isinstance(tree, Block) or not isinstance(last_id, int):
+                raise ValueError("entrada de cache inesperada")
+        except Exception:
+            # entrada corrompida ou incompatível: descarta e reanalisa
+            self._remove(self.path)
+            return None
+        try:
+            # marca o uso para a política LRU da evicção
+            os.utime(self.path)
+        except OSError:
+            pass
+        # nós criados depois (ex.: pelo otimizador) não podem repetir ids da árvore salva
+        Node.reserve(last_id)
+        return tree, st
+
+    def store(self, tree, st) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, "wb") as f:
+                pickle.dump((tree, st, Node.newId()), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+            self.evict()
+        except (OSError, pickle.PicklingError, RecursionError):
+            # o cache é só uma otimização: falhas de escrita são ignoradas
+            self._remove(tmp)
+
+    def evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            match = ParseCache.entry.fullmatch(name)
+            if match is None:
+                continue
+            path = os.path.join(self.directory, name)
+            if match.groups() == (self.stem, self.options) and path != self.path:
+                # versão antiga do mesmo arquivo, com as mesmas opções: obsoleta
+                self._remove(path)
+            else:
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - ParseCache.max_entries)]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def report_time(clock, virtual):
+    # tempo de jogo (simulado ou dormido de verdade) e CPU, também quando há erro
+    kind = "virtual" if virtual else "de jogo"
+    print(f"Tempo {kind}: {clock.elapsed} s | CPU: {time.process_time():.3f} s", file=sys.stderr)
+
 def main():
-    if len(sys.argv) < 2:
-        print("Uso: python3 main.py <arquivo.level>")
-        sys.exit(1)
-    filename = sys.argv[1]
+    argp = argparse.ArgumentParser(prog="main.py", description="Interpretador da linguagem Level (GameVM)")
+    argp.add_argument("arquivo", help="arquivo .level")
+    argp.add_argument("--engine", choices=("tree", "bytecode"), default="tree",
+                      help="tree: avalia a árvore diretamente; bytecode: compila e executa na GameVM")
+    argp.add_argument("--trusted", action="store_true",
+                      help="omite as checagens de tipo em tempo de execução já provadas pela análise estática")
+    argp.add_argument("--no-optimize", action="store_true",
+                      help="executa a árvore sem dobra de constantes nem eliminação de ramos mortos e gera o .asm sem peephole")
+    argp.add_argument("--dump-optimized", action="store_true",
+                      help="imprime o programa após o otimizador e encerra sem executar")
+    argp.add_argument("--no-cache", action="store_true",
+                      help="não lê nem grava a árvore analisada em __levelcache__")
+    argp.add_argument("--output", choices=("terminal", "buffered", "null"),
+                      help="terminal: escreve cada linha na hora; buffered: escreve em lotes (em wait e no fim); null: descarta")
+    argp.add_argument("--output-file", metavar="ARQUIVO",
+                      help="grava a saída das ações em ARQUIVO (ou pipe) em vez do terminal")
+    argp.add_argument("--fast-forward", action="store_true",
+                      help="wait só avança um relógio virtual, sem dormir")
+    argp.add_argument("--headless", action="store_true",
+                      help="execução sem jogador: --fast-forward com saída em lotes (salvo --output)")
+    argp.add_argument("--compile-only", action="store_true",
+                      help="só analisa e gera o .asm, sem executar o programa")
+    argp.add_argument("--profile", action="store_true",
+                      help="mede por amostragem o tempo em cada função, until e linha; relatório na saída de erro e pilhas em ARQUIVO.folded")
+    argp.add_argument("--profile-interval", type=float, default=5.0, metavar="MS",
+                      help="intervalo entre amostras do --profile, em milissegundos")
+    args = argp.parse_args()
+    filename = args.arquivo
     try:
         with open(filename, "r", encoding="utf-8") as f:
             code = f.read()
     except Exception as e:
         print(f"Erro ao abrir arquivo {filename}: {e}")
         sys.exit(1)
-    code = Prepro.filter(code)
-    lexer = Lexer(code)
-    parser = Parser(lexer)
+    cache = None
+    if not args.no_cache and not args.dump_optimized:
+        cache = ParseCache(filename, code, "no-optimize" if args.no_optimize else "optimize")
+    cached = cache.load() if cache is not None else None
     try:
-        arvore = parser.run()
+        if cached is not None:
+            arvore, st = cached
+        else:
+            arvore, st, optimizer = analyze(code, not args.no_optimize)
+            if cache is not None:
+                cache.store(arvore, st)
     except Exception as e:
         print(e)
         sys.exit(1)
-    st = SymbolTable()
+    if args.dump_optimized:
+        if not args.no_optimize:
+            print(optimizer.report())
+        print(to_source(arvore), end="")
+        return
+    if not args.compile_only:
+        run(args, arvore, code)
+    outname = os.path.splitext(filename)[0] + ".asm"
     try:
-        arvore.evaluate(st)
+        try:
+            Code.generate(arvore, outname, optimize=not args.no_optimize)
+        except Exception as e:
+            with_position(e, arvore.positions)
+            raise
+    except CodegenUnsupported as e:
+        # o .asm só é tocado quando a tradução dá certo (ver Code.discard); numa
+        # execução comum ele é um extra, e o motivo só interessa a quem o pediu
+        if args.compile_only:
+            print(f"{e}: {outname} não gerado", file=sys.stderr)
+            sys.exit(1)
+        return
     except Exception as e:
-        print(e)
+        print("Erro durante geração de código:", e)
+        sys.exit(1)
+
+def run(args, arvore, source):
+    virtual = args.fast_forward or args.headless
+    if args.output is None:
+        args.output = "buffered" if args.headless else "terminal"
+    try:
+        output = make_output(args.output, args.output_file)
+    except OSError as e:
+        print(f"Erro ao abrir arquivo {args.output_file}: {e}")
         sys.exit(1)
+    clock = VirtualClock() if virtual else Clock()
+    frame = Frame(arvore.frame_size, names=arvore.global_names, output=output, clock=clock)
+    profiler = None
+    if args.trusted and args.engine == "tree":
+        TypeChecker.trust(arvore)
+    if args.profile:
+        profiler = Profiler(arvore, source, args.profile_interval / 1000)
     try:
-        arvore.generate(st)
+        if args.engine == "bytecode":
+            compiler = Compiler(trusted=args.trusted, profiler=profiler)
+            code = compiler.compile_program(arvore)
+            if profiler is not None:
+                profiler.start()
+            GameVM(compiler).run(code, frame)
+        else:
+            if profiler is not None:
+                profiler.start()
+            arvore.evaluate(frame)
     except Exception as e:
-        print("Erro durante geração de código:", e)
+        # o que o programa já disse aparece antes do erro
+        output.close()
+        print(with_position(e, arvore.positions))
+        if profiler is not None:
+            write_profile(profiler, args.arquivo)
+        report_time(clock, virtual)
         sys.exit(1)
-    outname = os.path.splitext(filename)[0] + ".asm"
-    Code.dump(outname)
+    output.close()
+    if profiler is not None:
+        write_profile(profiler, args.arquivo)
+    report_time(clock, virtual)
+
+def write_profile(profiler, filename):
+    profiler.stop()
+    stacks = os.path.splitext(filename)[0] + ".folded"
+    print(profiler.report(), file=sys.stderr)
+    try:
+        with open(stacks, "w", encoding="utf-8") as f:
+            f.write(profiler.collapsed())
+        print(f"Pilhas para flamegraph em {stacks}", file=sys.stderr)
+    except OSError as e:
+        print(f"Erro ao gravar {stacks}: {e}", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
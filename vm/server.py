@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# Servidor da GameVM: processo de longa duração que mantém programas compilados
+# em memória e os executa a pedido de vm/client.py por um socket Unix.
+# Uso: python3 vm/server.py [--socket CAMINHO] [--cache-size N]
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import socketserver
+from collections import OrderedDict
+
+import main as vm
+from client import default_socket
+
+class ProgramCache:
+    # LRU de Programs por (caminho, mtime, tamanho, opções): salvar o arquivo muda
+    # a chave, e a versão antiga sai do cache na próxima compilação dele
+    def __init__(self, size=64):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str, engine: str, trusted: bool, optimize: bool) -> vm.Program:
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size, engine, trusted, optimize)
+        with self.lock:
+            program = self.entries.get(key)
+            if program is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return program
+        # compila fora do lock: pedidos de outros arquivos não esperam
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        program = vm.compile_level(source, engine, trusted, optimize, inputs=())
+        with self.lock:
+            self.misses += 1
+            for old in [k for k in self.entries if k[0] == path and k[1:3] != key[1:3]]:
+                del self.entries[old]
+            self.entries[key] = program
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return program
+
+class SocketOutput(vm.Output):
+    # Linhas das ações vão ao cliente como {"out": texto}. No modo terminal cada
+    # linha segue na hora; no buffered, no wait e no fim (como BufferedOutput).
+    def __init__(self, stream, immediate=True):
+        super().__init__(stream)
+        self.immediate = immediate
+
+    def line(self, text: str):
+        self._stream.write(json.dumps({"out": text}, ensure_ascii=False).encode("utf-8") + b"\n")
+        if self.immediate:
+            self._stream.flush()
+
+    def close(self):
+        self.flush()
+
+class Handler(socketserver.StreamRequestHandler):
+    # um pedido por conexão; cada conexão tem a sua thread
+    wbufsize = 1 << 16
+
+    def reply(self, message: dict):
+        self.wfile.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        try:
+            line = self.rfile.readline()
+            if not line.strip():
+                # conexão sem pedido: a sondagem de outro servidor (ver listen)
+                return
+            request = json.loads(line)
+            cmd = request.get("cmd")
+            if cmd == "stop":
+                self.reply({"exit": 0, "error": None})
+                threading.Thread(target=self.server.shutdown).start()
+            elif cmd == "run":
+                self.run(request)
+            else:
+                self.reply({"exit": 1, "error": f"Comando desconhecido: {cmd}"})
+        except (BrokenPipeError, ConnectionResetError):
+            # o cliente desistiu (Ctrl-C): a execução dele é abandonada
+            pass
+
+    def run(self, request: dict):
+        path = request["path"]
+        try:
+            program = self.server.cache.get(path, request.get("engine", "tree"),
+                                            request.get("trusted", False), request.get("optimize", True))
+        except OSError as e:
+            self.reply({"exit": 1, "error": f"Erro ao abrir arquivo {path}: {e}"})
+            return
+        except Exception as e:
+            self.reply({"exit": 1, "error": str(e)})
+            return
+        mode = request.get("output", "terminal")
+        if mode == "null":
+            output = vm.NullOutput()
+        else:
+            output = SocketOutput(self.wfile, immediate=mode == "terminal")
+        clock = vm.VirtualClock() if request.get("fast_forward") else vm.Clock()
+        start = time.thread_time()
+        error = None
+        try:
+            program.run(output=output, clock=clock)
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            error = str(e)
+        self.reply({"exit": 1 if error else 0, "error": error,
+                    "time": clock.elapsed, "cpu": time.thread_time() - start})
+
+def listen(path: str, cache_size: int = 64) -> socketserver.ThreadingUnixStreamServer:
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            # socket de um servidor que caiu: pode ser reaproveitado
+            os.remove(path)
+        else:
+            probe.close()
+            raise OSError(f"já há um servidor em {path}")
+    # só o dono do servidor pode pedir execuções
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    finally:
+        os.umask(umask)
+    server.daemon_threads = True
+    server.cache = ProgramCache(cache_size)
+    return server
+
+def main():
+    argp = argparse.ArgumentParser(prog="server.py", description="Servidor da GameVM para vm/client.py")
+    argp.add_argument("--socket", default=default_socket(), help="socket Unix onde escutar")
+    argp.add_argument("--cache-size", type=int, default=64, help="programas compilados mantidos em memória")
+    args = argp.parse_args()
+    try:
+        server = listen(args.socket, args.cache_size)
+    except OSError as e:
+        print(f"Erro ao abrir o socket: {e}")
+        sys.exit(1)
+    print(f"GameVM escutando em {args.socket}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.remove(args.socket)
+        except OSError:
+            pass
+
+if __name__ == "__main__":
+    main()